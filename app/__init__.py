@@ -1,31 +1,225 @@
 from flask import Flask
+from jinja2 import FileSystemBytecodeCache
 from flask_session import Session
+from werkzeug.middleware.proxy_fix import ProxyFix
+import json
 import os
 from datetime import timedelta
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
+    root_dir = os.path.dirname(os.path.dirname(__file__))
 
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev')
     app.config['SESSION_TYPE'] = 'filesystem'
-    app.config['SESSION_FILE_DIR'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'flask_session')
+    app.config['SESSION_FILE_DIR'] = os.path.join(root_dir, 'flask_session')
     app.config['SESSION_FILE_THRESHOLD'] = 100
     app.config['SESSION_COOKIE_NAME'] = 'mindmoves_session'
     app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
     app.config['SESSION_COOKIE_SECURE'] = False
     app.config['SESSION_COOKIE_HTTPONLY'] = True
-    app.config['USERS_FILE'] = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app', 'data', 'users.json')
+    app.config['USERS_FILE'] = os.path.join(root_dir, 'app', 'data', 'users.json')
+    # 'file' keeps every user in USERS_FILE; 'sharded' stores one file per user under USERS_DIR;
+    # 'shared' is USERS_FILE read through one mmap'd directory shared by all worker processes
+    app.config['USERS_STORAGE'] = os.environ.get('USERS_STORAGE', 'file')
+    app.config['USERS_DIR'] = os.path.join(root_dir, 'app', 'data', 'users')
+    # 'json' (compact), 'orjson' or 'msgpack'; unavailable codecs fall back to json
+    app.config['USERS_SERIALIZER'] = os.environ.get('USERS_SERIALIZER', 'json')
     app.config['DEBUG'] = False  # Add this line
+    app.config['ADMIN_USERS'] = [name.strip() for name in os.environ.get('ADMIN_USERS', '').split(',') if name.strip()]
+
+    # Profiling (off unless PROFILING_ENABLED=1)
+    app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED') == '1'
+    app.config['PROFILING_SECRET'] = os.environ.get('PROFILING_SECRET')
+    app.config['PROFILING_HEADER'] = 'X-MindMoves-Profile'
+    app.config['PROFILING_SAMPLE_RATE'] = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+    app.config['PROFILING_TRACEMALLOC'] = os.environ.get('PROFILING_TRACEMALLOC') == '1'
+    app.config['PROFILING_DIR'] = os.path.join(root_dir, 'profiles')
+    app.config['PROFILING_MAX_FILES'] = 50
+
+    # Requests slower than this are logged as one JSON line; an empty or 'off' value (None) disables it
+    threshold = os.environ.get('SLOW_REQUEST_THRESHOLD_MS', '1000').strip()
+    app.config['SLOW_REQUEST_THRESHOLD_MS'] = None if threshold.lower() in ('', 'off') else float(threshold)
+
+    # Compiled templates survive restarts; warm-up runs on start when enabled, else on the first /healthz
+    app.config['JINJA_CACHE_DIR'] = os.path.join(root_dir, 'jinja_cache')
+    app.config['WARMUP_ON_START'] = os.environ.get('WARMUP_ON_START') == '1'
+
+    # Auth endpoint limits ('COUNT/SECONDS' token buckets) and the bcrypt concurrency cap.
+    # Point RATELIMIT_STORAGE at a SQLite file to share buckets between worker processes.
+    app.config['RATELIMIT_ENABLED'] = True
+    app.config['RATELIMIT_STORAGE'] = os.environ.get('RATELIMIT_STORAGE')
+    app.config['RATELIMIT_PER_IP'] = '30/60'
+    app.config['RATELIMIT_PER_USERNAME'] = '10/60'
+    # Reverse proxies in front of the app. Per-IP limits use the client address they append to
+    # X-Forwarded-For; with 0 the header is ignored, since any client can send one.
+    app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
+    app.config['HASH_CONCURRENCY'] = int(os.environ.get('HASH_CONCURRENCY', 2))
+    app.config['HASH_QUEUE_TIMEOUT'] = 2.0
+    app.config['HASH_RETRY_AFTER'] = 5
+
+    # Request capture for `flask replay` (off unless CAPTURE_FILE is set). Usernames are
+    # replaced by HMAC pseudonyms; only CAPTURE_BODIES endpoints have their JSON body kept.
+    app.config['CAPTURE_FILE'] = os.environ.get('CAPTURE_FILE')
+    app.config['CAPTURE_SAMPLE_RATE'] = float(os.environ.get('CAPTURE_SAMPLE_RATE', 1))
+    app.config['CAPTURE_BODIES'] = ['main.save_score', 'main.update_avatar']
+
+    # Stream logged-in game and profile pages so <head> reaches the browser before the body renders
+    app.config['STREAM_PAGES'] = os.environ.get('STREAM_PAGES', '1') == '1'
+
+    # Gzip/brotli for text responses above COMPRESS_MIN_SIZE bytes
+    app.config['COMPRESS_ENABLED'] = True
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+    app.config['COMPRESS_CACHE_SIZE'] = 64
+
+    # Rendered progress reports kept in memory, keyed by history version
+    app.config['REPORT_CACHE_SIZE'] = 128
+
+    # Live score streams: per-viewer queue length, viewer cap and heartbeat interval.
+    # Each viewer holds a request thread while it watches and sees only scores saved by its own
+    # process, so this serves a few supervising therapists per process, not hundreds of idle
+    # connections. Under `flask serve` the cap is further limited to half of SERVE_THREADS per worker.
+    app.config['LIVE_QUEUE_SIZE'] = 50
+    app.config['LIVE_MAX_SUBSCRIBERS'] = 20
+    app.config['LIVE_HEARTBEAT_SECONDS'] = 15
+
+    # Maintenance jobs on a background thread (off unless SCHEDULER_ENABLED=1).
+    # Intervals are in seconds; 0 disables a job. One process at a time holds the lock file and runs them,
+    # except the cache refresh, rate-limit pruning and sketch and metrics flushes, which every process
+    # runs for the state it holds.
+    app.config['SCHEDULER_ENABLED'] = os.environ.get('SCHEDULER_ENABLED') == '1'
+    app.config['SCHEDULER_LOCK_FILE'] = os.path.join(root_dir, 'app', 'data', 'scheduler.lock')
+    app.config['SCHEDULER_TICK'] = 5
+    app.config['SCHEDULER_JITTER'] = 0.1
+    app.config['SCHEDULER_INTERVALS'] = {
+        'prune_sessions': 3600,
+        'backup_users': 24 * 3600,
+        'snapshot_users': 3600,
+        'refresh_caches': 300,
+        'prune_rate_limits': 3600,
+        'flush_score_sketches': 60,
+        'flush_engagement_metrics': 60,
+    }
+    app.config['USERS_BACKUP_DIR'] = os.path.join(root_dir, 'backups')
+    app.config['USERS_BACKUP_KEEP'] = 14
+    # Deduplicated snapshots: the newest SNAPSHOT_KEEP_LAST, plus one per day and per week
+    app.config['SNAPSHOT_DIR'] = os.path.join(root_dir, 'snapshots')
+    app.config['SNAPSHOT_KEEP_LAST'] = 24
+    app.config['SNAPSHOT_KEEP_DAILY'] = 14
+    app.config['SNAPSHOT_KEEP_WEEKLY'] = 8
+
+    # `flask serve`: preforked worker processes, threads per worker, and requests before a worker is recycled
+    app.config['SERVE_WORKERS'] = int(os.environ.get('SERVE_WORKERS', os.cpu_count() or 1))
+    app.config['SERVE_THREADS'] = int(os.environ.get('SERVE_THREADS', 8))
+    app.config['SERVE_MAX_REQUESTS'] = int(os.environ.get('SERVE_MAX_REQUESTS', 1000))
+    app.config['SERVE_MAX_REQUESTS_JITTER'] = 50
+    # How long a stopping worker waits for in-flight requests before exiting anyway
+    app.config['SERVE_DRAIN_SECONDS'] = 30
+
+    # Work derived from saved scores and account changes runs on this many threads.
+    # A full queue makes publishers wait EVENT_PUBLISH_TIMEOUT seconds, then drops the event.
+    app.config['EVENT_WORKERS'] = 2
+    app.config['EVENT_QUEUE_SIZE'] = 1000
+    app.config['EVENT_PUBLISH_TIMEOUT'] = 0.05
+
+    # Per-game score distributions for percentile feedback, stored beside each tenant's users.
+    # Each process folds in its new scores after SKETCH_FLUSH_EVERY scores or SKETCH_FLUSH_SECONDS.
+    app.config['SKETCH_FLUSH_EVERY'] = 20
+    app.config['SKETCH_FLUSH_SECONDS'] = 60
+
+    # Engagement counters (daily distinct users, logins, plays), flushed like the sketches
+    app.config['METRICS_FLUSH_EVERY'] = 20
+    app.config['METRICS_FLUSH_SECONDS'] = 60
+    app.config['METRICS_KEEP_DAYS'] = 400
+
+    # Admin console: users per page and how often the search index is rebuilt from storage
+    app.config['ADMIN_PAGE_SIZE'] = 50
+    app.config['USER_INDEX_MAX_AGE'] = 300
+
+    # Clinics served from this process, e.g.
+    #   {'clinic-a': {'hosts': ['a.example.org'], 'USERS_FILE': '/srv/a/users.json'}}
+    # Requests for other hosts use the settings above. TENANTS_FILE names a JSON file of the same shape.
+    app.config['TENANTS'] = {}
+    if os.environ.get('TENANTS_FILE'):
+        with open(os.environ['TENANTS_FILE']) as f:
+            app.config['TENANTS'] = json.load(f)
+
+    if test_config:
+        app.config.update(test_config)
+
+    from app.serializers import init_json_provider
+    init_json_provider(app)
+
+    from app.tenants import init_tenants
+    init_tenants(app)
+
+    from app.events import init_events
+    init_events(app)
+
+    if app.config['TRUSTED_PROXIES']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'],
+                                x_proto=app.config['TRUSTED_PROXIES'])
 
     # Ensure session directory exists
     os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
 
+    if app.config['JINJA_CACHE_DIR']:
+        os.makedirs(app.config['JINJA_CACHE_DIR'], exist_ok=True)
+        app.jinja_options = dict(app.jinja_options,
+                                 bytecode_cache=FileSystemBytecodeCache(app.config['JINJA_CACHE_DIR']))
+
     # Initialize extensions
     Session(app)
+    # Views also read session['username'] directly, so check the tenant before any of them run
+    from app.auth import check_session_tenant
+    app.before_request(check_session_tenant)
+
+    from app.ratelimit import init_rate_limits
+    init_rate_limits(app)
+
+    from app.requestlog import init_request_log
+    init_request_log(app)
+
+    from app.capture import init_capture
+    init_capture(app)
+
+    from app.compression import init_compression
+    init_compression(app)
+
+    from app.profiling import init_profiling
+    init_profiling(app)
 
     # Register blueprints
     from app.main import bp as main_bp
     app.register_blueprint(main_bp)
 
-    return app
\ No newline at end of file
+    from app.reports import init_reports
+    init_reports(app)
+
+    from app.live import init_live
+    init_live(app)
+
+    from app.quantiles import init_quantiles
+    init_quantiles(app)
+
+    from app.metrics import init_metrics
+    init_metrics(app)
+
+    from app.userindex import init_user_index
+    init_user_index(app)
+
+    from app.admin import bp as admin_bp
+    app.register_blueprint(admin_bp)
+
+    from app.commands import register_commands
+    register_commands(app)
+
+    from app.scheduler import init_scheduler
+    init_scheduler(app)
+
+    if app.config['WARMUP_ON_START']:
+        from app.warmup import start_warm_up
+        start_warm_up(app)
+
+    return app
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+import time
+
+from flask import current_app
+
+from app.storage import atomic_write, file_lock
+from app.tenants import tenant_setting
+
+# Per-tenant counters that every worker process keeps in memory and folds
+# into one shared file. Each process only ever adds its own pending entries
+# to what is on disk, under the file's lock, so workers never overwrite one
+# another and need no coordination beyond that lock.
+
+
+def tenant_data_path(tenant, name):
+    """Keep a tenant's `name` file next to its user data"""
+    if tenant_setting('USERS_STORAGE', tenant) == 'sharded':
+        return os.path.join(tenant_setting('USERS_DIR', tenant), name + '.json')
+    return os.path.splitext(tenant_setting('USERS_FILE', tenant))[0] + f'-{name}.json'
+
+
+class TenantAccumulator:
+    """One tenant's merged file plus this process's unsaved entries.
+
+    Subclasses set `entry` to a class with merge(), to_stored() and
+    from_stored(), and record into `pending` while holding `lock`.
+    """
+    entry = None
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.saved = {}
+        self.pending = {}
+        self.pending_count = 0
+        self.flushed_at = time.time()
+
+    def _read(self):
+        with open(self.path) as f:
+            return {key: self.entry.from_stored(value) for key, value in json.load(f).items()}
+
+    def load(self):
+        """The entries on disk, or none if the file does not exist yet"""
+        try:
+            return self._read()
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, entries):
+        atomic_write(self.path, json.dumps({key: value.to_stored() for key, value in sorted(entries.items())},
+                                           separators=(',', ':')))
+
+    def _pending_entry(self, key):
+        self.pending_count += 1
+        return self.pending.setdefault(key, self.entry())
+
+    def _combined(self, key):
+        """Saved and pending entries for `key` merged into a new entry (caller holds `lock`)"""
+        combined = self.entry()
+        for source in (self.saved, self.pending):
+            if key in source:
+                combined.merge(source[key])
+        return combined
+
+    def trim(self, entries):
+        """Entries worth keeping on disk; everything by default"""
+        return entries
+
+    def changed(self):
+        """Called with `lock` held whenever `saved` or `pending` is replaced"""
+
+    def due(self, every, seconds):
+        return self.pending_count >= every or time.time() - self.flushed_at >= seconds
+
+    def flush(self):
+        """Merge this process's pending entries into the file and reload it"""
+        with self.lock, file_lock(self.path + '.lock'):
+            merged = self.load()
+            for key, value in self.pending.items():
+                merged.setdefault(key, self.entry()).merge(value)
+            merged = self.trim(merged)
+            if self.pending:
+                self._write(merged)
+            self.saved = merged
+            self.pending = {}
+            self.pending_count = 0
+            self.flushed_at = time.time()
+            self.changed()
+
+
+def init_accumulators(app, key):
+    app.extensions[key] = {'tenants': {}, 'lock': threading.Lock()}
+
+
+def tenant_accumulator(key, tenant, create):
+    """Return the tenant's accumulator under app.extensions[key], calling create(tenant) on first use"""
+    state = current_app.extensions[key]
+    with state['lock']:
+        accumulator = state['tenants'].get(tenant)
+        if accumulator is None:
+            accumulator = state['tenants'][tenant] = create(tenant)
+    return accumulator
+
+
+def flush_tenants(app, key):
+    """Save every tenant's pending entries held by this process"""
+    for accumulator in list(app.extensions[key]['tenants'].values()):
+        accumulator.flush()
@@ -0,0 +1,89 @@
+from datetime import datetime
+from operator import attrgetter
+from flask import Response, abort, current_app, jsonify, render_template, request, stream_with_context
+from app.admin import bp
+from app.auth import admin_required, get_user, iter_users
+from app.events import EXTENSION_KEY as EVENTS_KEY
+from app.metrics import summary
+from app.export import FORMATS, iter_export_users
+from app.scheduler import EXTENSION_KEY as SCHEDULER_KEY
+from app.tenants import current_tenant
+from app.userindex import FIELDS, get_index
+
+
+def _parse_date(value):
+    """Validate an optional YYYY-MM-DD query argument"""
+    if not value:
+        return None
+    datetime.strptime(value, '%Y-%m-%d')
+    return value
+
+
+@bp.route("/export")
+@admin_required
+def export():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({'error': f'Unknown format: {fmt}'}), 400
+    try:
+        since = _parse_date(request.args.get('since'))
+        until = _parse_date(request.args.get('until'))
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    game_type = request.args.get('game_type') or None
+
+    encode, mimetype = FORMATS[fmt]
+    records = iter_export_users(iter_users(), since, until, game_type)
+    return Response(stream_with_context(encode(records)), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=mindmoves-export.{fmt}',
+    })
+
+
+@bp.route("/scheduler")
+@admin_required
+def scheduler():
+    """Timings and failures of the background maintenance jobs"""
+    scheduler = current_app.extensions[SCHEDULER_KEY]
+    return jsonify(dict(scheduler.stats(), enabled=current_app.config['SCHEDULER_ENABLED']))
+
+
+@bp.route("/events")
+@admin_required
+def events():
+    """Event bus throughput, failures and queue depth"""
+    return jsonify(current_app.extensions[EVENTS_KEY].stats())
+
+
+@bp.route("/metrics")
+@admin_required
+def metrics():
+    """Active patients, plays per game and week-over-week retention"""
+    return jsonify(summary(current_tenant()))
+
+
+@bp.route("/users")
+@admin_required
+def users():
+    """Paginated user list with prefix search on username or first name"""
+    query = request.args.get('q', '').strip()
+    field = request.args.get('by', 'username')
+    if field not in FIELDS:
+        field = 'username'
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['ADMIN_PAGE_SIZE']
+    index = get_index()
+    total, results = index.search(query, field, (page - 1) * per_page, per_page)
+    pages = max((total + per_page - 1) // per_page, 1)
+    return render_template('admin/users.html', results=results, total=total, query=query,
+                           field=field, page=page, pages=pages, building=index.building)
+
+
+@bp.route("/users/<username>")
+@admin_required
+def user_detail(username):
+    """One patient's details and game history"""
+    patient = get_user(username)
+    if patient is None:
+        abort(404)
+    history = sorted(patient.get('game_history', []), key=attrgetter('timestamp'), reverse=True)
+    return render_template('admin/user.html', patient=patient, history=history)
@@ -1,41 +1,76 @@
-import json
-import os
+import threading
 import bcrypt
-from datetime import datetime
 from functools import wraps
-from flask import session, redirect, url_for, flash
+from flask import session, redirect, url_for, flash, abort, current_app, has_app_context
+from app.games import GameRecord
+from app.events import AvatarChanged, PasswordChanged, ScoreSaved, UserLoggedIn, UserRegistered, publish
+from app.ratelimit import hashing_slot
+from app.requestlog import phase
+from app.serializers import get_serializer
+from app.shm import SharedUserStore
+from app.storage import FileUserStore, ShardedUserStore
+from app.tenants import DEFAULT_TENANT, EXTENSION_KEY as TENANTS_KEY, current_tenant, tenant_setting, tenant_store
 
-# Path to users.json
+# Default users file, used outside an application context
 USERS_FILE = 'app/data/users.json'
 
+# Stores used without an app; apps keep theirs per tenant in app.extensions
+_stores = {}
+_stores_lock = threading.Lock()
+
+def _make_store(key):
+    store_class = {'sharded': ShardedUserStore, 'shared': SharedUserStore}.get(key[0], FileUserStore)
+    return store_class(key[1], get_serializer(key[2]))
+
+def get_store(tenant=None):
+    """Return the user store for `tenant` (default: the one serving this request)"""
+    if not has_app_context() or TENANTS_KEY not in current_app.extensions:
+        key = ('file', USERS_FILE, 'json')
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                store = _stores[key] = _make_store(key)
+        return store
+
+    tenant = current_tenant() if tenant is None else tenant
+    serializer = tenant_setting('USERS_SERIALIZER', tenant) or 'json'
+    if tenant_setting('USERS_STORAGE', tenant) == 'sharded':
+        key = ('sharded', tenant_setting('USERS_DIR', tenant), serializer)
+    else:
+        storage = 'shared' if tenant_setting('USERS_STORAGE', tenant) == 'shared' else 'file'
+        key = (storage, tenant_setting('USERS_FILE', tenant) or USERS_FILE, serializer)
+    return tenant_store(tenant, key, lambda: _make_store(key))
+
 def load_users():
     """Load users from JSON file"""
-    try:
-        with open(USERS_FILE, 'r') as f:
-            return json.load(f)['users']
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+    return get_store().load_all()
+
+def iter_users():
+    """Yield users one at a time without loading them all into memory"""
+    return get_store().iter_users()
 
 def save_users(users):
     """Save users to JSON file"""
-    os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
-    with open(USERS_FILE, 'w') as f:
-        json.dump({'users': users}, f, indent=4)
+    get_store().save_all(users)
+
+def prime_users_cache():
+    """Load user data ahead of the first request and return the user count"""
+    return get_store().prime()
 
 def hash_password(password):
     """Hash a password using bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    with hashing_slot(), phase('bcrypt'):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
 def verify_password(password, hashed):
     """Verify a password against its hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    with hashing_slot(), phase('bcrypt'):
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
 def register_user(first_name, username, password, secret_question, secret_answer):
     """Register a new user"""
-    users = load_users()
-    
     # Check if username already exists
-    if any(user['username'] == username for user in users):
+    if get_user(username):
         flash('Username already exists', 'error')
         return False
     
@@ -49,17 +84,20 @@ def register_user(first_name, username, password, secret_question, secret_answer
         'game_history': []
     }
     
-    users.append(new_user)
-    save_users(users)
+    if not get_store().add(new_user):
+        flash('Username already exists', 'error')
+        return False
+    publish(UserRegistered, username, first_name)
     return True
 
 def login_user(username, password):
     """Login a user"""
-    users = load_users()
-    user = next((user for user in users if user['username'] == username), None)
+    user = get_user(username)
     
     if user and verify_password(password, user['password']):
         session['username'] = username
+        session['tenant'] = current_tenant()
+        publish(UserLoggedIn, username)
         return True
     return False
 
@@ -69,17 +107,17 @@ def logout_user():
 
 def get_user(username):
     """Get user data by username"""
-    users = load_users()
-    return next((user for user in users if user['username'] == username), None)
+    return get_store().get(username)
 
 def update_user_password(username, new_password):
     """Update user's password"""
-    users = load_users()
-    user = next((user for user in users if user['username'] == username), None)
-    
-    if user:
-        user['password'] = hash_password(new_password)
-        save_users(users)
+    hashed = hash_password(new_password)
+
+    def apply(user):
+        user['password'] = hashed
+
+    if get_store().update(username, apply):
+        publish(PasswordChanged, username)
         return True, "Password updated successfully"
     
     return False, "User not found"
@@ -91,36 +129,49 @@ def verify_secret_answer(username, secret_answer):
         return True, "Secret answer verified"
     return False, "Invalid secret answer"
 
-def save_game_score(username, game_type, score, total=None):
-    """Save a game score for a user"""
-    users = load_users()
-    user = next((user for user in users if user['username'] == username), None)
-    
-    if user:
+def score_recorder(game_type, score, total=None):
+    """Build the update that appends a new game to a user's history"""
+    # Add new score with timestamp
+    new_game = GameRecord.create(game_type, score, total if total is not None else 100)  # Default to 100 if total not provided
+
+    def apply(user):
         if 'game_history' not in user:
             user['game_history'] = []
         
-        # Add new score with timestamp
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Add the new game
-        new_game = {
-            'game_type': game_type,
-            'score': score,
-            'total': total if total is not None else 100,  # Default to 100 if total not provided
-            'date': current_time
-        }
-        
         # Add the new game
         user['game_history'].append(new_game)
         
         # Keep only the last 10 games
         if len(user['game_history']) > 10:
             user['game_history'] = user['game_history'][-10:]
-        
-        save_users(users)
-        return True
-    return False
+
+        # Bumped on every new score so reports and charts can be cached
+        user['history_version'] = user.get('history_version', 0) + 1
+
+    apply.game = new_game
+    return apply
+
+def save_game_score(username, game_type, score, total=None):
+    """Save a game score for a user"""
+    recorder = score_recorder(game_type, score, total)
+    if not get_store().update(username, recorder):
+        return False
+    publish(ScoreSaved, username, recorder.game)
+    return True
+
+def avatar_setter(avatar_name):
+    """Build the update that sets a user's avatar"""
+    def apply(user):
+        user['avatar'] = avatar_name
+
+    return apply
+
+def update_user_avatar(username, avatar_name):
+    """Set a user's avatar"""
+    if not get_store().update(username, avatar_setter(avatar_name)):
+        return False
+    publish(AvatarChanged, username, avatar_name)
+    return True
 
 def get_user_game_history(username):
     """Get the last 10 games for a user"""
@@ -130,11 +181,40 @@ def get_user_game_history(username):
         return user['game_history']
     return []
 
+def session_tenant_matches():
+    """True if the session was issued by the tenant serving this request.
+
+    Sessions from before tenants were recorded belong to the default tenant.
+    """
+    return session.get('tenant', DEFAULT_TENANT) == current_tenant()
+
+def check_session_tenant():
+    """Drop a login carried over from another tenant's host (all tenants share one session store)"""
+    if 'username' in session and not session_tenant_matches():
+        session.clear()
+
 def login_required(f):
     """Decorator to require login for routes"""
     def decorated_function(*args, **kwargs):
+        check_session_tenant()
         if 'username' not in session:
             return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
-    return decorated_function 
\ No newline at end of file
+    return decorated_function
+
+def is_admin(username):
+    """Check whether a username is listed in the current tenant's ADMIN_USERS"""
+    return bool(username) and username in (tenant_setting('ADMIN_USERS') or ())
+
+def admin_required(f):
+    """Decorator to require an admin user for routes"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        check_session_tenant()
+        if 'username' not in session:
+            return redirect(url_for('main.login'))
+        if not is_admin(session['username']):
+            abort(403)
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,92 @@
+import hashlib
+import hmac
+import json
+import os
+import random
+import time
+from urllib.parse import quote, urlencode
+
+from flask import current_app, request, session
+
+EXTENSION_KEY = 'mindmoves_capture'
+
+_STARTED_KEY = 'mindmoves.capture_started'
+
+# Query arguments that can carry other people's names or search terms
+REDACTED_ARGS = ('q', 'username')
+
+
+def init_capture(app):
+    """Append a compact record of each request to CAPTURE_FILE for `flask replay`"""
+    if not app.config.get('CAPTURE_FILE'):
+        return
+    app.extensions[EXTENSION_KEY] = {'pid': None, 'fd': None}
+    app.before_request(_begin_capture)
+    app.after_request(_capture_response)
+
+
+def anonymize(username):
+    """Stable pseudonym for a username; the same user always maps to the same id"""
+    key = current_app.secret_key
+    key = key.encode('utf-8') if isinstance(key, str) else key
+    return hmac.new(key, username.encode('utf-8'), hashlib.sha256).hexdigest()[:12]
+
+
+def _begin_capture():
+    if random.random() < current_app.config['CAPTURE_SAMPLE_RATE']:
+        request.environ[_STARTED_KEY] = time.perf_counter()
+
+
+def _capture_path():
+    """The request path with usernames replaced by {u:<pseudonym>} and sensitive args dropped"""
+    path = request.path
+    view_args = request.view_args or {}
+    if request.url_rule is not None and 'username' in view_args:
+        # Rebuild from the rule so only the username segment changes, never a lookalike substring
+        placeholder = f'{{u:{anonymize(view_args["username"])}}}'
+        path = request.url_rule.build(dict(view_args, username=placeholder), append_unknown=False)[1]
+        path = path.replace(quote(placeholder, safe=':'), placeholder)
+    args = [(key, value) for key, value in request.args.items(multi=True) if key not in REDACTED_ARGS]
+    if args:
+        path += '?' + urlencode(args)
+    return path
+
+
+def _descriptor():
+    state = current_app.extensions[EXTENSION_KEY]
+    # Forked workers each open their own descriptor; O_APPEND keeps lines whole
+    if state['pid'] != os.getpid():
+        state['fd'] = os.open(current_app.config['CAPTURE_FILE'], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        state['pid'] = os.getpid()
+    return state['fd']
+
+
+def _capture_response(response):
+    started = request.environ.get(_STARTED_KEY)
+    if started is None or response.mimetype == 'text/event-stream':
+        return response
+    username = session.get('username')
+    record = {
+        't': round(time.time(), 3),
+        'm': request.method,
+        'p': _capture_path(),
+        'e': request.endpoint,
+        'u': anonymize(username) if username else None,
+        'rb': request.content_length or 0,
+        's': response.status_code,
+    }
+    if request.endpoint in current_app.config['CAPTURE_BODIES'] and request.is_json:
+        record['b'] = request.get_json(silent=True)
+    fd = _descriptor()
+    if response.is_streamed:
+        # A streamed body is timed once it has been sent, and never buffered to measure its size
+        response.call_on_close(lambda: _write_record(fd, record, started, None))
+    else:
+        _write_record(fd, record, started, response.calculate_content_length())
+    return response
+
+
+def _write_record(fd, record, started, response_bytes):
+    record['sb'] = response_bytes
+    record['ms'] = round((time.perf_counter() - started) * 1000, 2)
+    os.write(fd, (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8'))
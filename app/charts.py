@@ -0,0 +1,91 @@
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+
+def percent(game):
+    """Score as a percentage of the game's total (0 when total is 0)"""
+    return 100.0 * game.score / game.total if game.total else 0.0
+
+
+def downsample(points, max_points):
+    """Keep the lowest and highest point of each bucket so peaks survive thinning"""
+    if len(points) <= max_points:
+        return points
+    size = len(points) * 2 / max_points
+    kept = []
+    for start in range(0, len(points), max(int(size), 1)):
+        bucket = points[start:start + max(int(size), 1)]
+        low = min(bucket, key=lambda point: point[1])
+        high = max(bucket, key=lambda point: point[1])
+        kept.extend(sorted({low, high}))
+    return kept
+
+
+def _coords(games, left, top, width, height):
+    """Map games to (x, y) plot coordinates, oldest first, at most one pair per pixel"""
+    first, last = games[0].timestamp, games[-1].timestamp
+    span = (last - first) or 1
+    x_scale = width / span if last != first else 0
+    x_offset = left if last != first else left + width / 2
+    points = [(x_offset + (game.timestamp - first) * x_scale,
+               top + height * (1 - min(max(percent(game), 0), 100) / 100)) for game in games]
+    return downsample(points, max(int(width), 2))
+
+
+def _trend(games):
+    """Least-squares line through the percentages as (start, end) values, or None"""
+    if len(games) < 2:
+        return None
+    n = len(games)
+    xs = [game.timestamp - games[0].timestamp for game in games]
+    ys = [percent(game) for game in games]
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    if not spread:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+    return mean_y - slope * mean_x, mean_y + slope * (xs[-1] - mean_x)
+
+
+def line_chart(games, width=600, height=200, title=None, trend=False):
+    """Render an SVG line chart of percentage scores over time, optionally with a trend line"""
+    pad_left, pad_right, pad_top, pad_bottom = 40, 12, 24 if title else 10, 24
+    plot_width = width - pad_left - pad_right
+    plot_height = height - pad_top - pad_bottom
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+             f'width="{width}" height="{height}" role="img" font-family="sans-serif" font-size="11">']
+    if title:
+        parts.append(f'<text x="{pad_left}" y="14" font-weight="600">{escape(title)}</text>')
+    for value in (0, 50, 100):
+        y = pad_top + plot_height * (1 - value / 100)
+        parts.append(f'<line x1="{pad_left}" x2="{width - pad_right}" y1="{y:.1f}" y2="{y:.1f}" stroke="#E5E7EB"/>'
+                     f'<text x="{pad_left - 6}" y="{y + 4:.1f}" text-anchor="end" fill="#6B7280">{value}%</text>')
+
+    if games:
+        points = _coords(games, pad_left, pad_top, plot_width, plot_height)
+        coords = ' '.join(f'{x:.1f},{y:.1f}' for x, y in points)
+        parts.append(f'<polyline points="{coords}" fill="none" stroke="#7C3AED" stroke-width="2"/>')
+        parts.append(f'<circle cx="{points[-1][0]:.1f}" cy="{points[-1][1]:.1f}" r="3.5" fill="#F472B6"/>')
+        line = _trend(games) if trend else None
+        if line:
+            y1, y2 = (pad_top + plot_height * (1 - min(max(value, 0), 100) / 100) for value in line)
+            parts.append(f'<line x1="{pad_left}" x2="{width - pad_right}" y1="{y1:.1f}" y2="{y2:.1f}" '
+                         f'stroke="#F472B6" stroke-width="1.5" stroke-dasharray="4 3"/>')
+        for stamp, anchor, at in ((games[0].timestamp, 'start', pad_left), (games[-1].timestamp, 'end', width - pad_right)):
+            label = datetime.fromtimestamp(stamp).strftime('%Y-%m-%d')
+            parts.append(f'<text x="{at}" y="{height - 6}" text-anchor="{anchor}" fill="#6B7280">{label}</text>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def sparkline(games, width=120, height=32):
+    """Render a small axis-free SVG line of percentage scores"""
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+             f'width="{width}" height="{height}" role="img">']
+    if games:
+        points = _coords(games, 2, 2, width - 4, height - 4)
+        coords = ' '.join(f'{x:.1f},{y:.1f}' for x, y in points)
+        parts.append(f'<polyline points="{coords}" fill="none" stroke="#7C3AED" stroke-width="1.5"/>'
+                     f'<circle cx="{points[-1][0]:.1f}" cy="{points[-1][1]:.1f}" r="2" fill="#F472B6"/>')
+    parts.append('</svg>')
+    return ''.join(parts)
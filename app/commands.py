@@ -0,0 +1,179 @@
+import click
+from flask import current_app
+
+
+def register_commands(app):
+    """Attach the MindMoves CLI commands to `app`"""
+
+    @app.cli.command('warmup')
+    def warmup_command():
+        """Precompile templates and prime caches, then report timings."""
+        from app.warmup import warm_up
+
+        state = warm_up(current_app._get_current_object())
+        click.echo(f"Compiled {state['templates']} templates")
+        for name, ms in state['timings'].items():
+            click.echo(f"  {name}: {ms:.1f} ms")
+
+    @app.cli.command('serve')
+    @click.option('--host', default='127.0.0.1', show_default=True)
+    @click.option('--port', default=5002, show_default=True)
+    @click.option('--workers', type=int, help='Worker processes (default SERVE_WORKERS).')
+    @click.option('--threads', type=int, help='Threads per worker (default SERVE_THREADS).')
+    @click.option('--max-requests', type=int, help='Recycle a worker after this many requests; 0 never.')
+    def serve_command(host, port, workers, threads, max_requests):
+        """Warm the app once, then serve it from preforked workers.
+
+        Send SIGHUP to reload templates and user data without dropping
+        requests. Python code changes still need a full restart.
+        """
+        from app.server import serve
+
+        serve(current_app._get_current_object(), host, port, workers, threads, max_requests)
+
+    @app.cli.command('replay')
+    @click.argument('capture', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--target', default='http://127.0.0.1:5002', show_default=True, help='Instance to replay against.')
+    @click.option('--speed', type=float, default=1.0, show_default=True, help='Replay this many times faster.')
+    @click.option('--concurrency', type=int, default=16, show_default=True, help='Requests in flight at once.')
+    @click.option('--save', type=click.File('w'), help='Write the JSON report here.')
+    @click.option('--baseline', type=click.File('r'), help='Compare against a report saved by an earlier run.')
+    def replay_command(capture, target, speed, concurrency, save, baseline):
+        """Re-issue traffic recorded with CAPTURE_FILE and report latency and error deltas.
+
+        Point it at a local instance, never production: it registers replay-*
+        accounts and saves their scores.
+        """
+        import json
+        from app.replay import Replayer, format_report, load_capture
+
+        report = Replayer(target, speed, concurrency).run(load_capture(capture))
+        for line in format_report(report, json.load(baseline) if baseline else None):
+            click.echo(line)
+        if save:
+            json.dump(report, save, indent=2)
+
+    @app.cli.command('export')
+    @click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson')
+    @click.option('--since', type=click.DateTime(['%Y-%m-%d']), help='First day to include.')
+    @click.option('--until', type=click.DateTime(['%Y-%m-%d']), help='Last day to include.')
+    @click.option('--game-type', help='Only include this game type.')
+    @click.option('--output', type=click.File('w'), default='-', help='Output file (default stdout).')
+    def export_command(fmt, since, until, game_type, output):
+        """Stream users and game history as NDJSON or CSV."""
+        from app.auth import iter_users
+        from app.export import FORMATS, iter_export_users
+
+        encode, _ = FORMATS[fmt]
+        records = iter_export_users(
+            iter_users(),
+            since.strftime('%Y-%m-%d') if since else None,
+            until.strftime('%Y-%m-%d') if until else None,
+            game_type,
+        )
+        for chunk in encode(records):
+            output.write(chunk)
+
+    @app.cli.group('storage')
+    def storage_group():
+        """Manage the user data store."""
+
+    @storage_group.command('migrate')
+    @click.option('--to', 'target', type=click.Choice(['sharded', 'file']), required=True,
+                  help='Layout to convert the data into.')
+    def migrate_command(target):
+        """Convert users between USERS_FILE and the sharded USERS_DIR layout."""
+        from app.serializers import get_serializer
+        from app.storage import FileUserStore, ShardedUserStore, copy_users
+
+        serializer = get_serializer(current_app.config['USERS_SERIALIZER'])
+        file_store = FileUserStore(current_app.config['USERS_FILE'], serializer)
+        sharded_store = ShardedUserStore(current_app.config['USERS_DIR'], serializer)
+        if target == 'sharded':
+            count = copy_users(file_store, sharded_store)
+            click.echo(f"Copied {count} users into {sharded_store.root}")
+        else:
+            count = copy_users(sharded_store, file_store)
+            click.echo(f"Copied {count} users into {file_store.path}")
+        click.echo(f"Set USERS_STORAGE={target} to use it.")
+
+    @storage_group.command('rewrite')
+    def rewrite_command():
+        """Re-encode the current store with USERS_SERIALIZER."""
+        from app.auth import get_store
+
+        store = get_store()
+        users = store.load_all()
+        store.save_all(users)
+        click.echo(f"Rewrote {len(users)} users with {store.serializer.name}")
+
+    @app.cli.group('snapshot')
+    @click.option('--tenant', default='default', show_default=True, help='Tenant whose users to snapshot.')
+    @click.pass_context
+    def snapshot_group(ctx, tenant):
+        """Take, list, verify and restore deduplicated user snapshots."""
+        from app.snapshots import snapshot_root
+        from app.tenants import tenant_names
+
+        if tenant not in tenant_names():
+            raise click.BadParameter(f'Unknown tenant {tenant}', param_hint='--tenant')
+        ctx.obj = {'tenant': tenant, 'root': snapshot_root(current_app, tenant)}
+
+    @snapshot_group.command('create')
+    @click.pass_obj
+    def snapshot_create_command(obj):
+        """Snapshot the users now."""
+        from app.auth import get_store
+        from app.snapshots import create_snapshot
+
+        manifest = create_snapshot(obj['root'], get_store(obj['tenant']))
+        click.echo(f"Snapshot {manifest['id']}: {len(manifest['users'])} users, "
+                   f"{manifest['new_objects']} new records ({manifest['new_bytes']} bytes)")
+
+    @snapshot_group.command('list')
+    @click.pass_obj
+    def snapshot_list_command(obj):
+        """List snapshots, oldest first."""
+        from app.snapshots import list_snapshots, load_manifest
+
+        for snapshot_id in list_snapshots(obj['root']):
+            click.echo(f"{snapshot_id}  {len(load_manifest(obj['root'], snapshot_id)['users'])} users")
+
+    @snapshot_group.command('verify')
+    @click.argument('snapshot_id')
+    @click.pass_obj
+    def snapshot_verify_command(obj, snapshot_id):
+        """Check a snapshot's records against their checksums."""
+        from app.snapshots import SnapshotError, verify_snapshot
+
+        try:
+            users = verify_snapshot(obj['root'], snapshot_id)
+        except SnapshotError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Snapshot {snapshot_id} is intact ({len(users)} users)")
+
+    @snapshot_group.command('restore')
+    @click.argument('snapshot_id')
+    @click.confirmation_option(prompt='Replace the current users with this snapshot?')
+    @click.pass_obj
+    def snapshot_restore_command(obj, snapshot_id):
+        """Verify a snapshot, then replace the current users with it."""
+        from app.auth import get_store
+        from app.snapshots import SnapshotError, restore_snapshot
+
+        try:
+            count = restore_snapshot(obj['root'], snapshot_id, get_store(obj['tenant']))
+        except SnapshotError as e:
+            raise click.ClickException(str(e))
+        click.echo(f"Restored {count} users from {snapshot_id}")
+
+    @snapshot_group.command('prune')
+    @click.pass_obj
+    def snapshot_prune_command(obj):
+        """Apply the SNAPSHOT_KEEP_* retention schedule."""
+        from app.snapshots import prune_snapshots
+
+        config = current_app.config
+        removed, objects = prune_snapshots(obj['root'], config['SNAPSHOT_KEEP_LAST'],
+                                           config['SNAPSHOT_KEEP_DAILY'], config['SNAPSHOT_KEEP_WEEKLY'])
+        click.echo(f"Removed {removed} snapshots and {objects} unreferenced records")
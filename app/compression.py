@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import zlib
+
+from flask import current_app, request, session
+
+from app.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXTENSION_KEY = 'mindmoves_compression'
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+}
+
+
+def init_compression(app):
+    """Compress text responses over COMPRESS_MIN_SIZE when COMPRESS_ENABLED is set"""
+    if not app.config.get('COMPRESS_ENABLED'):
+        return
+    app.extensions[EXTENSION_KEY] = LRUCache(app.config['COMPRESS_CACHE_SIZE'])
+    app.after_request(_compress_response)
+
+
+def choose_encoding(accept_encodings):
+    """Pick 'br' or 'gzip' from the client's Accept-Encoding, or None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compress a streamed body chunk by chunk, flushing so each piece reaches the client"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+    try:
+        for chunk in chunks:
+            data = process(chunk.encode('utf-8') if isinstance(chunk, str) else chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def _compress_streamed(response):
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    response.response = compress_stream(response.response, encoding)
+    response.headers.pop('Content-Length', None)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _compress_response(response):
+    if (response.direct_passthrough
+            or not 200 <= response.status_code < 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    if response.is_streamed:
+        return _compress_streamed(response)
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    # Pages rendered for anonymous visitors are identical for everyone, so
+    # their compressed form is cached instead of recompressed per hit.
+    cache = current_app.extensions[EXTENSION_KEY] if not session.get('username') else None
+    key = (encoding, hashlib.sha1(data).digest()) if cache is not None else None
+    compressed = cache.get(key) if cache is not None else None
+    if compressed is None:
+        compressed = compress(data, encoding)
+        if cache is not None:
+            cache.put(key, compressed)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,116 @@
+import logging
+import os
+import queue
+import threading
+from collections import namedtuple
+
+from flask import current_app, has_app_context
+
+from app.tenants import current_tenant
+
+EXTENSION_KEY = 'mindmoves_events'
+
+logger = logging.getLogger(__name__)
+
+# Published after the primary write has been saved. Handlers run on worker
+# threads without a request, so events carry the tenant they belong to.
+ScoreSaved = namedtuple('ScoreSaved', ['tenant', 'username', 'game'])
+UserRegistered = namedtuple('UserRegistered', ['tenant', 'username', 'first_name'])
+UserLoggedIn = namedtuple('UserLoggedIn', ['tenant', 'username'])
+PasswordChanged = namedtuple('PasswordChanged', ['tenant', 'username'])
+AvatarChanged = namedtuple('AvatarChanged', ['tenant', 'username', 'avatar'])
+
+
+class EventBus:
+    """Runs event handlers on a small pool of threads.
+
+    Each (handler, event) pair is queued separately, so a slow or failing
+    handler never affects the others. When the queue is full, publish()
+    waits up to `publish_timeout` seconds and then drops the delivery
+    rather than holding up the request.
+    """
+
+    def __init__(self, app, workers=2, queue_size=1000, publish_timeout=0.05):
+        self.app = app
+        self.workers = workers
+        self.queue_size = queue_size
+        self.publish_timeout = publish_timeout
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self.counts = {'published': 0, 'delivered': 0, 'failed': 0, 'dropped': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def subscribe(self, event_type, handler):
+        """Call `handler(event)` for every published event of `event_type`"""
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so each worker process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.queue_size)
+            for n in range(self.workers):
+                threading.Thread(target=self._work, name=f'mindmoves-events-{n}', daemon=True).start()
+            self._pid = os.getpid()
+
+    def publish(self, event):
+        """Queue `event` for its handlers; returns how many deliveries were queued"""
+        handlers = self._handlers.get(type(event), ())
+        self._count('published')
+        if not handlers:
+            return 0
+        self._ensure_started()
+        queued = 0
+        for handler in handlers:
+            try:
+                self._queue.put((handler, event), timeout=self.publish_timeout)
+                queued += 1
+            except queue.Full:
+                self._count('dropped')
+                logger.warning('Event queue full, dropped %s for %s', type(event).__name__, handler.__name__)
+        return queued
+
+    def _work(self):
+        while True:
+            handler, event = self._queue.get()
+            try:
+                with self.app.app_context():
+                    handler(event)
+                self._count('delivered')
+            except Exception:
+                self._count('failed')
+                logger.exception('Event handler %s failed on %s', handler.__name__, type(event).__name__)
+            finally:
+                self._queue.task_done()
+
+    def drain(self):
+        """Block until every queued delivery has been handled"""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def stats(self):
+        pending = self._queue.qsize() if self._pid == os.getpid() else 0
+        return dict(self.counts, pending=pending, workers=self.workers, queue_size=self.queue_size)
+
+
+def init_events(app):
+    app.extensions[EXTENSION_KEY] = EventBus(app, app.config['EVENT_WORKERS'], app.config['EVENT_QUEUE_SIZE'],
+                                             app.config['EVENT_PUBLISH_TIMEOUT'])
+
+
+def subscribe(app, event_type, handler):
+    app.extensions[EXTENSION_KEY].subscribe(event_type, handler)
+
+
+def publish(event_type, *args):
+    """Publish `event_type(current tenant, *args)` on the current app's bus"""
+    if not has_app_context() or EXTENSION_KEY not in current_app.extensions:
+        return 0
+    return current_app.extensions[EXTENSION_KEY].publish(event_type(current_tenant(), *args))
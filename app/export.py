@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+
+from app.games import resolve_game_type
+
+# Columns written for each game in CSV exports. Password hashes and secret
+# answers are never exported.
+CSV_FIELDS = ['username', 'first_name', 'game_type', 'score', 'total', 'date']
+
+
+def filter_history(history, since=None, until=None, game_type=None):
+    """Return the games matching the date range (inclusive) and game type.
+
+    `since` and `until` are 'YYYY-MM-DD' strings; they compare directly with
+    the 'YYYY-MM-DD HH:MM:SS' game dates. `game_type` may be any registered
+    name or alias.
+    """
+    known = resolve_game_type(game_type) if game_type is not None else None
+    wanted = known.name if known else game_type
+    games = [game.to_dict() for game in history]
+    return [
+        game for game in games
+        if (since is None or game['date'][:10] >= since)
+        and (until is None or game['date'][:10] <= until)
+        and (wanted is None or game['game_type'] == wanted)
+    ]
+
+
+def iter_export_users(users, since=None, until=None, game_type=None):
+    """Yield exportable user records with their filtered game history"""
+    filtered = any(value is not None for value in (since, until, game_type))
+    for user in users:
+        history = filter_history(user.get('game_history', []), since, until, game_type)
+        if filtered and not history:
+            continue
+        yield {
+            'username': user['username'],
+            'first_name': user.get('first_name'),
+            'avatar': user.get('avatar'),
+            'game_history': history,
+        }
+
+
+def iter_ndjson(records):
+    """Encode records as newline-delimited JSON, one user per line"""
+    for record in records:
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+
+def iter_csv(records):
+    """Encode records as CSV with one row per game"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    for record in records:
+        for game in record['game_history']:
+            writer.writerow([record['username'], record['first_name'], game['game_type'],
+                             game['score'], game['total'], game['date']])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+    'csv': (iter_csv, 'text/csv'),
+}
@@ -0,0 +1,161 @@
+import time
+from collections import namedtuple
+from datetime import datetime
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+GameType = namedtuple('GameType', ['id', 'key', 'name', 'aliases'])
+
+# Known games. Ids are stored on disk, so never renumber or reuse them.
+GAME_TYPES = (
+    GameType(1, 'speed', 'Speed Game', ()),
+    GameType(2, 'memory', 'Memory Master', ()),
+    GameType(3, 'balance', 'Line Balance Master', ('Line Balance',)),
+    GameType(4, 'dexterity', 'Dexterity Game', ()),
+    GameType(5, 'typing-1', 'Typing Game - Level 1', ()),
+    GameType(6, 'typing-2', 'Typing Game - Level 2', ()),
+    GameType(7, 'typing-3', 'Typing Game - Level 3', ()),
+    GameType(8, 'precision', 'Precision Game', ()),
+)
+
+_BY_ID = {game.id: game for game in GAME_TYPES}
+_BY_NAME = {}
+for _game in GAME_TYPES:
+    for _name in (_game.key, _game.name) + _game.aliases:
+        _BY_NAME[_name.casefold()] = _game
+
+
+def resolve_game_type(name):
+    """Return the GameType for a name, key or alias, or None if unknown"""
+    if isinstance(name, int):
+        return _BY_ID.get(name)
+    if not isinstance(name, str):
+        return None
+    return _BY_NAME.get(name.strip().casefold())
+
+
+def score_error(score, total):
+    """Why `score` out of `total` cannot be recorded, or None if it can.
+
+    Scores may exceed the total: Speed Game posts points against the number
+    of clicks, and Line Balance Master adds a time bonus to a total of 100.
+    """
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in (score, total)):
+        return 'Score and total must be whole numbers'
+    if score < 0 or total <= 0:
+        return 'Score must not be negative and total must be positive'
+    return None
+
+
+def get_game_type(game_id):
+    """Return the GameType with this id, or None"""
+    return _BY_ID.get(game_id)
+
+
+def _parse_date(value):
+    for fmt in (DATE_FORMAT, DATE_FORMAT + '.%f'):
+        try:
+            return int(time.mktime(time.strptime(value, fmt)))
+        except ValueError:
+            continue
+    return 0
+
+
+class GameRecord:
+    """One played game.
+
+    Known game types are held as their interned integer id; names from
+    before the registry existed are kept as strings. The timestamp is epoch
+    seconds. Records are immutable, so copies share them.
+    """
+    __slots__ = ('game', 'score', 'total', 'timestamp')
+
+    def __init__(self, game, score, total, timestamp):
+        object.__setattr__(self, 'game', game)
+        object.__setattr__(self, 'score', score)
+        object.__setattr__(self, 'total', total)
+        object.__setattr__(self, 'timestamp', timestamp)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('GameRecord is immutable')
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, GameRecord) and self.to_stored() == other.to_stored()
+
+    def __hash__(self):
+        return hash(self.to_stored())
+
+    def __repr__(self):
+        return f'GameRecord({self.game_type!r}, {self.score!r}, {self.total!r}, {self.date!r})'
+
+    @classmethod
+    def create(cls, game_type, score, total, timestamp=None):
+        """Build a record, interning `game_type` when it is a known game"""
+        known = resolve_game_type(game_type)
+        return cls(known.id if known else game_type, score, total,
+                   int(time.time()) if timestamp is None else timestamp)
+
+    @classmethod
+    def from_stored(cls, value):
+        """Decode a stored record: [game, score, total, epoch] or a legacy dict"""
+        if isinstance(value, GameRecord):
+            return value
+        if isinstance(value, dict):
+            return cls.create(value.get('game_type'), value.get('score'), value.get('total', 100),
+                              _parse_date(value.get('date', '')))
+        game, score, total, timestamp = value
+        return cls(game, score, total, timestamp)
+
+    def to_stored(self):
+        """Encode as the compact on-disk form [game, score, total, epoch]"""
+        return (self.game, self.score, self.total, self.timestamp)
+
+    def to_dict(self):
+        """Expanded form with the display name and formatted date"""
+        return {'game_type': self.game_type, 'score': self.score, 'total': self.total, 'date': self.date}
+
+    @property
+    def game_type(self):
+        """Display name of the game"""
+        known = _BY_ID.get(self.game) if isinstance(self.game, int) else None
+        return known.name if known else self.game
+
+    @property
+    def date(self):
+        return datetime.fromtimestamp(self.timestamp).strftime(DATE_FORMAT)
+
+    def __getitem__(self, key):
+        # Lets templates and older code keep using game['score'] style access
+        if key in ('game_type', 'score', 'total', 'date', 'timestamp'):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def decode_user(user):
+    """Turn a stored user's game history into GameRecords (in place)"""
+    history = user.get('game_history')
+    if history:
+        user['game_history'] = [GameRecord.from_stored(game) for game in history]
+    return user
+
+
+def encode_user(user):
+    """Return a shallow copy of `user` with its history in compact stored form"""
+    history = user.get('game_history')
+    if not history:
+        return user
+    encoded = dict(user)
+    encoded['game_history'] = [list(GameRecord.from_stored(game).to_stored()) for game in history]
+    return encoded
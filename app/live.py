@@ -0,0 +1,124 @@
+import json
+import queue
+import threading
+
+from flask import current_app
+
+from app.events import ScoreSaved, subscribe
+
+EXTENSION_KEY = 'mindmoves_live'
+
+
+class TooManySubscribers(Exception):
+    """Raised when the hub already holds LIVE_MAX_SUBSCRIBERS streams, or is closed"""
+
+
+# Pushed to every subscription when the hub closes, so its stream ends
+CLOSED = ('closed', None)
+
+
+class Subscription:
+    """One listener's bounded queue of events on a channel"""
+
+    def __init__(self, channel, maxsize):
+        self.channel = channel
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+
+    def push(self, event):
+        """Queue an event without blocking; a full queue drops its oldest event"""
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        """Wait up to `timeout` seconds for the next event, or return None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LiveHub:
+    """In-process pub/sub; channels are (tenant, username) pairs"""
+
+    def __init__(self, queue_size, max_subscribers):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}
+        self._count = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        with self._lock:
+            if self._closed or self._count >= self.max_subscribers:
+                raise TooManySubscribers()
+            subscription = Subscription(channel, self.queue_size)
+            self._subscribers.setdefault(channel, set()).add(subscription)
+            self._count += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            listeners = self._subscribers.get(subscription.channel)
+            if listeners and subscription in listeners:
+                listeners.discard(subscription)
+                self._count -= 1
+                if not listeners:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channel, event):
+        """Fan an event out to every subscriber of `channel`"""
+        with self._lock:
+            listeners = list(self._subscribers.get(channel, ()))
+        for subscription in listeners:
+            subscription.push(event)
+        return len(listeners)
+
+    def close(self):
+        """End every open stream and refuse new ones; used when a worker stops"""
+        with self._lock:
+            self._closed = True
+            listeners = [subscription for channel in self._subscribers.values() for subscription in channel]
+        for subscription in listeners:
+            subscription.push(CLOSED)
+
+    def subscriber_count(self):
+        return self._count
+
+
+def init_live(app):
+    app.extensions[EXTENSION_KEY] = LiveHub(app.config['LIVE_QUEUE_SIZE'], app.config['LIVE_MAX_SUBSCRIBERS'])
+    subscribe(app, ScoreSaved, publish_score)
+
+
+def publish_score(event):
+    """Announce a newly saved game to anyone watching its player"""
+    data = dict(event.game.to_dict(), username=event.username)
+    current_app.extensions[EXTENSION_KEY].publish((event.tenant, event.username), ('score', data))
+
+
+def event_stream(hub, subscription, heartbeat):
+    """Yield Server-Sent Events for a subscription, with heartbeat comments"""
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            event = subscription.get(timeout=heartbeat)
+            if event is None:
+                yield ': heartbeat\n\n'
+                continue
+            if event is CLOSED:
+                # The browser reconnects after `retry`, reaching a worker that is still serving
+                return
+            name, data = event
+            yield f'event: {name}\ndata: {json.dumps(data)}\n\n'
+    finally:
+        hub.unsubscribe(subscription)
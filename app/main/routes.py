@@ -1,8 +1,35 @@
-from flask import render_template, request, redirect, url_for, flash, session, jsonify, current_app
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, current_app, abort, Response, has_request_context
 from app.main import bp
-from app.auth import register_user, login_user, logout_user, verify_secret_answer, update_user_password, get_user, login_required, get_user_game_history, verify_password, save_game_score
+from app.auth import is_admin, register_user, login_user, logout_user, verify_secret_answer, update_user_password, get_user, login_required, get_user_game_history, verify_password, save_game_score, update_user_avatar
+from app.warmup import is_ready, start_warm_up
+from app.ratelimit import rate_limited
+from app.games import get_game_type, resolve_game_type, score_error
+from app.reports import CHART_KINDS, chart_response, report_response
+from app.live import EXTENSION_KEY as LIVE_HUB, TooManySubscribers, event_stream
+from app.tenants import current_tenant
+from app.quantiles import percentile
+from app.streaming import stream_page
 import json
+import math
 from datetime import datetime
+from operator import attrgetter
+
+# Pages the client shell (static/js/shell.js) may swap in without a full reload
+SHELL_VIEWS = ('main.index', 'main.about', 'main.history', 'main.profile', 'main.typing', 'main.speed',
+               'main.memory', 'main.dexterity', 'main.movement', 'main.precision', 'main.balance')
+
+@bp.app_context_processor
+def shell_context():
+    return {
+        'shell_fragment': has_request_context() and request.headers.get('X-MindMoves-Shell') == '1',
+        'shell_views': [url_for(endpoint) for endpoint in SHELL_VIEWS],
+    }
+
+@bp.after_app_request
+def vary_on_shell(response):
+    if response.mimetype == 'text/html':
+        response.vary.add('X-MindMoves-Shell')
+    return response
 
 @bp.route("/")
 def index():
@@ -43,7 +70,7 @@ def typing():
         user = get_user(session['username'])
         if user:
             user['avatar'] = user.get('avatar', 'wordNinja.jpg')
-    return render_template("typing.html", user=user)
+    return stream_page("typing.html", user=user)
 
 @bp.route("/speed")
 def speed():
@@ -52,7 +79,7 @@ def speed():
         user = get_user(session['username'])
         if user:
             user['avatar'] = user.get('avatar', 'wordNinja.jpg')
-    return render_template("speed.html", user=user)
+    return stream_page("speed.html", user=user)
 
 @bp.route("/dexterity")
 def dexterity():
@@ -61,7 +88,7 @@ def dexterity():
         user = get_user(session['username'])
         if user:
             user['avatar'] = user.get('avatar', 'wordNinja.jpg')
-    return render_template("dexterity.html", user=user)
+    return stream_page("dexterity.html", user=user)
 
 @bp.route("/movement")
 def movement():
@@ -70,7 +97,7 @@ def movement():
         user = get_user(session['username'])
         if user:
             user['avatar'] = user.get('avatar', 'WordNinja.jpg')
-    return render_template("movement.html", user=user)
+    return stream_page("movement.html", user=user)
 
 @bp.route("/precision")
 def precision():
@@ -79,7 +106,7 @@ def precision():
         user = get_user(session['username'])
         if user:
             user['avatar'] = user.get('avatar', 'wordNinja.jpg')
-    return render_template("precision.html", user=user)
+    return stream_page("precision.html", user=user)
 
 @bp.route("/balance")
 def balance():
@@ -88,9 +115,10 @@ def balance():
         user = get_user(session['username'])
         if user:
             user['avatar'] = user.get('avatar', 'wordNinja.jpg')
-    return render_template("balance.html", user=user)
+    return stream_page("balance.html", user=user)
 
 @bp.route("/login", methods=['GET', 'POST'])
+@rate_limited('login')
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -105,6 +133,7 @@ def login():
     return render_template('auth/login.html')
 
 @bp.route("/register", methods=['GET', 'POST'])
+@rate_limited('register')
 def register():
     if request.method == 'POST':
         first_name = request.form.get('first_name')
@@ -148,6 +177,7 @@ def logout():
     return redirect(url_for('main.index'))
 
 @bp.route("/forgot-password", methods=['GET', 'POST'])
+@rate_limited('forgot_password')
 def forgot_password():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -205,13 +235,64 @@ def profile():
     user = get_user(username)
     if user:
         game_history = user.get('game_history', [])
-        sorted_game_history = sorted(game_history, key=lambda x: x['date'], reverse=True)[:20]  # Limit to 20 most recent games
+        sorted_game_history = sorted(game_history, key=attrgetter('timestamp'), reverse=True)[:20]  # Limit to 20 most recent games
         user['avatar'] = user.get('avatar', 'WordNinja.jpg')  # Default to WordNinja if no avatar set
-        return render_template('profile.html', user=user, game_history=sorted_game_history)
+        played = {game.game for game in game_history}
+        chart_games = [get_game_type(game_id) for game_id in sorted(g for g in played if isinstance(g, int))]
+        return stream_page('profile.html', user=user, game_history=sorted_game_history,
+                           chart_games=[game for game in chart_games if game])
     else:
         flash('User not found', 'error')
         return redirect(url_for('main.index'))
 
+def _report_for(username, fmt):
+    """Serve a progress report to the patient themselves or an admin"""
+    if session.get('username') != username and not is_admin(session.get('username')):
+        abort(403)
+    user = get_user(username)
+    if not user:
+        abort(404)
+    return report_response(user, fmt)
+
+@bp.route("/reports/<username>/progress")
+@login_required
+def progress_report(username):
+    return _report_for(username, 'html')
+
+@bp.route("/reports/<username>/progress.csv")
+@login_required
+def progress_report_csv(username):
+    return _report_for(username, 'csv')
+
+@bp.route("/charts/<username>/<game_key>/<kind>.svg")
+@login_required
+def progress_chart(username, game_key, kind):
+    """SVG sparkline or trend chart of one game's scores"""
+    if session.get('username') != username and not is_admin(session.get('username')):
+        abort(403)
+    game_type = resolve_game_type(game_key)
+    if game_type is None or kind not in CHART_KINDS:
+        abort(404)
+    user = get_user(username)
+    if not user:
+        abort(404)
+    return chart_response(user, game_type, kind)
+
+@bp.route("/live/<username>")
+@login_required
+def live(username):
+    """Server-Sent Events stream of a patient's scores as they are saved"""
+    if session.get('username') != username and not is_admin(session.get('username')):
+        abort(403)
+    hub = current_app.extensions[LIVE_HUB]
+    try:
+        subscription = hub.subscribe((current_tenant(), username))
+    except TooManySubscribers:
+        return jsonify({'error': 'Too many live viewers'}), 503, {'Retry-After': '30'}
+    return Response(event_stream(hub, subscription, current_app.config['LIVE_HEARTBEAT_SECONDS']),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @bp.route("/save_score", methods=['POST'])
 def save_score():
     if not session.get('username'):
@@ -225,12 +306,39 @@ def save_score():
     if not all([game_type, score is not None, total is not None]):
         return jsonify({'error': 'Missing required fields'}), 400
 
+    if resolve_game_type(game_type) is None:
+        return jsonify({'error': 'Unknown game type'}), 400
+
+    error = score_error(score, total)
+    if error:
+        return jsonify({'error': error}), 400
+
     username = session.get('username')
     if save_game_score(username, game_type, score, total):
         return jsonify({'message': 'Score saved successfully'}), 200
     else:
         return jsonify({'error': 'Failed to save score'}), 500
 
+@bp.route("/percentile")
+def score_percentile():
+    """Where a score ranks among everyone's scores for the same game"""
+    if not session.get('username'):
+        return jsonify({'error': 'User not logged in'}), 401
+
+    game = resolve_game_type(request.args.get('game_type'))
+    score = request.args.get('score', type=float)
+    total = request.args.get('total', type=float)
+    if game is None:
+        return jsonify({'error': 'Unknown game type'}), 400
+    if score is None or not total:
+        return jsonify({'error': 'score and a non-zero total are required'}), 400
+    value = 100.0 * score / total
+    if not all(map(math.isfinite, (score, total, value))):
+        return jsonify({'error': 'score and total must be finite numbers'}), 400
+
+    rank, count = percentile(current_tenant(), game.name, value)
+    return jsonify({'game_type': game.name, 'percent': value, 'percentile': rank, 'count': count})
+
 @bp.route("/update_avatar", methods=['POST'])
 def update_avatar():
     if not session.get('username'):
@@ -243,27 +351,9 @@ def update_avatar():
         return jsonify({'error': 'Avatar name is required'}), 400
 
     username = session.get('username')
-    user = get_user(username)
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-
-    # Update avatar using auth module's save_users function
-    from app.auth import load_users, save_users
-    users = load_users()
-    user_found = False
-    
-    # Find and update the user in the array
-    for u in users:
-        if u['username'] == username:
-            u['avatar'] = avatar_name
-            user_found = True
-            break
-
-    if not user_found:
-        return jsonify({'error': 'User not found'}), 404
-
     try:
-        save_users(users)
+        if not update_user_avatar(username, avatar_name):
+            return jsonify({'error': 'User not found'}), 404
         return jsonify({'message': 'Avatar updated successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -275,4 +365,16 @@ def memory():
         user = get_user(session['username'])
         if user:
             user['avatar'] = user.get('avatar', 'wordNinja.jpg')
-    return render_template("memory.html", user=user) 
\ No newline at end of file
+    return stream_page("memory.html", user=user)
+
+@bp.route("/healthz")
+def healthz():
+    """Readiness check: 200 once warm-up has finished, 503 before that.
+
+    Without WARMUP_ON_START nothing else warms this process, so the first
+    check starts warm-up in the background.
+    """
+    if is_ready(current_app):
+        return jsonify({'status': 'ok'}), 200
+    start_warm_up(current_app._get_current_object())
+    return jsonify({'status': 'warming up'}), 503
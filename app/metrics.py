@@ -0,0 +1,175 @@
+import base64
+import hashlib
+import math
+import zlib
+from datetime import date, timedelta
+
+from flask import current_app
+
+from app.accumulators import TenantAccumulator, flush_tenants, init_accumulators, tenant_accumulator, tenant_data_path
+from app.events import ScoreSaved, UserLoggedIn, subscribe
+
+EXTENSION_KEY = 'mindmoves_metrics'
+
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+
+class HyperLogLog:
+    """Approximate distinct count in 2**P one-byte registers (about 1.6% error)"""
+    P = 12
+    M = 1 << P
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers else bytearray(self.M)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.sha1(value.encode('utf-8')).digest()[:8], 'big')
+        index = x >> (64 - self.P)
+        rest = x & ((1 << (64 - self.P)) - 1)
+        rank = 64 - self.P - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def union(self, other):
+        merged = HyperLogLog(self.registers)
+        merged.merge(other)
+        return merged
+
+    def count(self):
+        m = self.M
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(map(_INVERSE_POWERS.__getitem__, self.registers))
+        zeros = self.registers.count(0)
+        if zeros and estimate <= 2.5 * m:
+            # Linear counting is more accurate while many registers are empty
+            return round(m * math.log(m / zeros))
+        return round(estimate)
+
+    def to_stored(self):
+        return base64.b64encode(zlib.compress(bytes(self.registers))).decode('ascii')
+
+    @classmethod
+    def from_stored(cls, value):
+        return cls(zlib.decompress(base64.b64decode(value)))
+
+
+class DayStats:
+    """One day's distinct active users, logins and plays per game"""
+
+    def __init__(self, users=None, logins=0, plays=None):
+        self.users = users or HyperLogLog()
+        self.logins = logins
+        self.plays = dict(plays or {})
+
+    def merge(self, other):
+        self.users.merge(other.users)
+        self.logins += other.logins
+        for game_type, count in other.plays.items():
+            self.plays[game_type] = self.plays.get(game_type, 0) + count
+
+    def to_stored(self):
+        return {'users': self.users.to_stored(), 'logins': self.logins, 'plays': self.plays}
+
+    @classmethod
+    def from_stored(cls, value):
+        return cls(HyperLogLog.from_stored(value['users']), value['logins'], value['plays'])
+
+
+class TenantMetrics(TenantAccumulator):
+    """Daily stats for one tenant: the merged file plus this process's unsaved activity"""
+    entry = DayStats
+
+    def __init__(self, path, keep_days):
+        super().__init__(path)
+        self.keep_days = keep_days
+        self.saved = self.load()
+
+    def record(self, day, username, game_type=None):
+        """Note activity by `username`: a play of `game_type`, or a login when None"""
+        with self.lock:
+            stats = self._pending_entry(day)
+            stats.users.add(username)
+            if game_type is None:
+                stats.logins += 1
+            else:
+                stats.plays[game_type] = stats.plays.get(game_type, 0) + 1
+
+    def trim(self, entries):
+        """Drop days older than `keep_days`"""
+        oldest = (date.today() - timedelta(days=self.keep_days)).isoformat()
+        return {day: stats for day, stats in entries.items() if day >= oldest}
+
+    def days(self, last, count):
+        """Merged stats for the `count` days ending on `last`, oldest first"""
+        result = []
+        with self.lock:
+            for n in range(count - 1, -1, -1):
+                day = (last - timedelta(days=n)).isoformat()
+                result.append((day, self._combined(day)))
+        return result
+
+
+def metrics_path(tenant):
+    return tenant_data_path(tenant, 'engagement')
+
+
+def init_metrics(app):
+    init_accumulators(app, EXTENSION_KEY)
+    subscribe(app, ScoreSaved, record_event)
+    subscribe(app, UserLoggedIn, record_event)
+
+
+def _load_metrics(tenant):
+    return TenantMetrics(metrics_path(tenant), current_app.config['METRICS_KEEP_DAYS'])
+
+
+def get_metrics(tenant):
+    return tenant_accumulator(EXTENSION_KEY, tenant, _load_metrics)
+
+
+def record_event(event):
+    """Event handler for plays and logins; flushes like the score sketches do"""
+    metrics = get_metrics(event.tenant)
+    game = getattr(event, 'game', None)
+    day = date.fromtimestamp(game.timestamp) if game else date.today()
+    metrics.record(day.isoformat(), event.username, game.game_type if game else None)
+    if metrics.due(current_app.config['METRICS_FLUSH_EVERY'], current_app.config['METRICS_FLUSH_SECONDS']):
+        metrics.flush()
+
+
+def flush_all(app):
+    """Save every tenant's pending activity held by this process"""
+    flush_tenants(app, EXTENSION_KEY)
+
+
+def _union(stats):
+    users = HyperLogLog()
+    for _, day in stats:
+        users.merge(day.users)
+    return users
+
+
+def summary(tenant, today=None):
+    """Active users, plays and week-over-week retention for the last two weeks"""
+    today = today or date.today()
+    days = get_metrics(tenant).days(today, 14)
+    previous_week, this_week = days[:7], days[7:]
+    this_users, previous_users = _union(this_week), _union(previous_week)
+    this_count, previous_count = this_users.count(), previous_users.count()
+    # |A and B| = |A| + |B| - |A or B|
+    retained = max(0, this_count + previous_count - this_users.union(previous_users).count())
+    plays = {}
+    for _, stats in this_week:
+        for game_type, count in stats.plays.items():
+            plays[game_type] = plays.get(game_type, 0) + count
+    return {
+        'date': today.isoformat(),
+        'dau': this_week[-1][1].users.count(),
+        'wau': this_count,
+        'daily': [{'date': day, 'active': stats.users.count(), 'logins': stats.logins,
+                   'plays': sum(stats.plays.values())} for day, stats in this_week],
+        'plays_per_game': plays,
+        'retention': round(min(retained, previous_count) / previous_count, 3) if previous_count else None,
+    }
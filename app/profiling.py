@@ -0,0 +1,147 @@
+import cProfile
+import hmac
+import os
+import random
+import re
+import time
+import tracemalloc
+
+from flask import Blueprint, abort, current_app, g, render_template, request, send_from_directory
+
+from app.auth import admin_required
+
+bp = Blueprint('profiling', __name__, url_prefix='/_profiles')
+
+_SAFE_NAME = re.compile(r'[^A-Za-z0-9_.]+')
+
+
+def init_profiling(app):
+    """Install the per-request profiler when PROFILING_ENABLED is set.
+
+    Nothing is registered when profiling is disabled, so normal requests
+    pay no cost at all.
+    """
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+    os.makedirs(app.config['PROFILING_DIR'], exist_ok=True)
+    app.before_request(_start_profile)
+    app.teardown_request(_stop_profile)
+    app.register_blueprint(bp)
+
+
+def _secret_matches():
+    """Check the profiling header for the configured secret.
+
+    Only a header is accepted: a query string ends up in access logs,
+    browser history and Referer headers.
+    """
+    secret = current_app.config.get('PROFILING_SECRET')
+    supplied = request.headers.get(current_app.config['PROFILING_HEADER'])
+    if not secret or not supplied:
+        return False
+    return hmac.compare_digest(supplied.encode('utf-8'), secret.encode('utf-8'))
+
+
+def _should_profile():
+    """Decide whether the current request gets profiled"""
+    if request.blueprint == bp.name:
+        return False
+    if _secret_matches():
+        return True
+    rate = current_app.config.get('PROFILING_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() < rate
+
+
+def _start_profile():
+    if not _should_profile():
+        return
+    g._profile_traced = False
+    if current_app.config.get('PROFILING_TRACEMALLOC') and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        g._profile_traced = True
+    profiler = cProfile.Profile()
+    g._profile_started = time.perf_counter()
+    g._profiler = profiler
+    profiler.enable()
+
+
+def _stop_profile(exc=None):
+    profiler = g.pop('_profiler', None)
+    if profiler is None:
+        return
+    profiler.disable()
+    duration_ms = (time.perf_counter() - g.pop('_profile_started')) * 1000
+    snapshot = None
+    if g.pop('_profile_traced', False):
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    directory = current_app.config['PROFILING_DIR']
+    endpoint = _SAFE_NAME.sub('_', request.endpoint or 'unknown')
+    stem = f"{time.time_ns() // 1000}-{endpoint}-{int(duration_ms)}ms"
+    profiler.dump_stats(os.path.join(directory, stem + '.prof'))
+    if snapshot is not None:
+        snapshot.dump(os.path.join(directory, stem + '.malloc'))
+    _rotate(directory, current_app.config['PROFILING_MAX_FILES'])
+
+
+def _rotate(directory, keep):
+    """Delete the oldest captures so at most `keep` remain"""
+    stems = sorted({name.rsplit('.', 1)[0] for name in os.listdir(directory)
+                    if name.endswith(('.prof', '.malloc'))})
+    for stem in stems[:-keep] if keep > 0 else stems:
+        for ext in ('.prof', '.malloc'):
+            try:
+                os.remove(os.path.join(directory, stem + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory):
+    """Return captured profiles, newest first"""
+    profiles = []
+    for name in os.listdir(directory):
+        if not name.endswith('.prof'):
+            continue
+        stem = name[:-len('.prof')]
+        try:
+            started, endpoint, duration = stem.split('-', 2)
+            captured_at = int(started) / 1_000_000
+            duration_ms = int(duration[:-2])
+        except ValueError:
+            continue
+        malloc = stem + '.malloc'
+        profiles.append({
+            'name': name,
+            'endpoint': endpoint,
+            'duration_ms': duration_ms,
+            'captured_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(captured_at)),
+            'malloc': malloc if os.path.exists(os.path.join(directory, malloc)) else None,
+        })
+    profiles.sort(key=lambda p: p['name'], reverse=True)
+    return profiles
+
+
+@bp.before_request
+def _require_access():
+    """Admins browse captures in their session; scripts may send the profiling header instead"""
+    if not _secret_matches():
+        return admin_required(lambda: None)()
+
+
+@bp.route('/')
+def index():
+    profiles = list_profiles(current_app.config['PROFILING_DIR'])
+    sort = request.args.get('sort')
+    if sort == 'duration':
+        profiles.sort(key=lambda p: p['duration_ms'], reverse=True)
+    elif sort == 'endpoint':
+        profiles.sort(key=lambda p: (p['endpoint'], -p['duration_ms']))
+    return render_template('profiling/index.html', profiles=profiles)
+
+
+@bp.route('/<path:name>')
+def download(name):
+    if not name.endswith(('.prof', '.malloc')):
+        abort(404)
+    return send_from_directory(current_app.config['PROFILING_DIR'], name, as_attachment=True)
@@ -0,0 +1,162 @@
+import bisect
+import itertools
+import time
+
+from flask import current_app
+
+from app.accumulators import TenantAccumulator, flush_tenants, init_accumulators, tenant_accumulator, tenant_data_path
+from app.charts import percent
+from app.events import ScoreSaved, subscribe
+from app.storage import file_lock
+
+EXTENSION_KEY = 'mindmoves_quantiles'
+
+
+class ScoreHistogram:
+    """Distribution of normalized scores (0-100%) in fixed-width bins.
+
+    Scores are bounded, so equal-width bins give every rank to within
+    1 / BINS of the range. Histograms merge by adding counts, which lets
+    each worker process keep its own and fold them into one file.
+    """
+    BINS = 1000
+
+    def __init__(self, counts=None):
+        self.counts = [0] * self.BINS
+        for index, count in (counts or {}).items():
+            self.counts[int(index)] = count
+        self.total = sum(self.counts)
+        self._cumulative = None
+
+    def _bin(self, value):
+        return min(max(int(value * self.BINS / 100), 0), self.BINS - 1)
+
+    def add(self, value, count=1):
+        self.counts[self._bin(value)] += count
+        self.total += count
+        self._cumulative = None
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+        self._cumulative = None
+
+    def _cumulative_counts(self):
+        if self._cumulative is None:
+            self._cumulative = list(itertools.accumulate(self.counts))
+        return self._cumulative
+
+    def rank(self, value):
+        """Percentage of recorded scores below `value` (ties count half)"""
+        if not self.total:
+            return None
+        cumulative = self._cumulative_counts()
+        index = self._bin(value)
+        below = cumulative[index - 1] if index else 0
+        return 100.0 * (below + self.counts[index] / 2) / self.total
+
+    def quantile(self, q):
+        """Score at quantile `q` (0-1), to bin resolution"""
+        if not self.total:
+            return None
+        index = bisect.bisect_left(self._cumulative_counts(), q * self.total)
+        return (min(index, self.BINS - 1) + 0.5) * 100 / self.BINS
+
+    def to_stored(self):
+        """Sparse {bin: count} form for persistence"""
+        return {str(index): count for index, count in enumerate(self.counts) if count}
+
+    @classmethod
+    def from_stored(cls, value):
+        return cls(value)
+
+
+class TenantSketches(TenantAccumulator):
+    """Per-game histograms for one tenant: the merged file plus this process's unsaved scores"""
+    entry = ScoreHistogram
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.seeded_at = 0
+        self._views = {}
+
+    def view(self, game_type):
+        """Saved and pending scores for one game, merged once and cached until they change"""
+        with self.lock:
+            histogram = self._views.get(game_type)
+            if histogram is None:
+                histogram = self._views[game_type] = self._combined(game_type)
+        return histogram
+
+    def add(self, game_type, value):
+        with self.lock:
+            self._pending_entry(game_type).add(value)
+            self._views.pop(game_type, None)
+
+    def changed(self):
+        self._views = {}
+
+    def bootstrap(self, users):
+        """Seed the file from stored histories the first time a tenant is used"""
+        with self.lock, file_lock(self.path + '.lock'):
+            try:
+                self.saved = self._read()
+                self.changed()
+                return
+            except FileNotFoundError:
+                pass
+            # Games from this second on arrive as events instead, so none is counted twice
+            self.seeded_at = int(time.time())
+            saved = {}
+            for user in users:
+                for game in user.get('game_history', []):
+                    if game.timestamp < self.seeded_at:
+                        saved.setdefault(game.game_type, ScoreHistogram()).add(percent(game))
+            self._write(saved)
+            self.saved = saved
+            self.changed()
+
+
+def init_quantiles(app):
+    init_accumulators(app, EXTENSION_KEY)
+    subscribe(app, ScoreSaved, record_score)
+
+
+def sketch_path(tenant):
+    return tenant_data_path(tenant, 'sketches')
+
+
+def _load_sketches(tenant):
+    from app.auth import get_store
+
+    sketches = TenantSketches(sketch_path(tenant))
+    sketches.bootstrap(get_store(tenant).iter_users())
+    return sketches
+
+
+def get_sketches(tenant):
+    """Return the tenant's sketches, loading or bootstrapping them on first use"""
+    return tenant_accumulator(EXTENSION_KEY, tenant, _load_sketches)
+
+
+def record_score(event):
+    """Event handler: add a saved score and flush every SKETCH_FLUSH_EVERY scores or SKETCH_FLUSH_SECONDS"""
+    sketches = get_sketches(event.tenant)
+    if event.game.timestamp < sketches.seeded_at:
+        return
+    sketches.add(event.game.game_type, percent(event.game))
+    if sketches.due(current_app.config['SKETCH_FLUSH_EVERY'], current_app.config['SKETCH_FLUSH_SECONDS']):
+        sketches.flush()
+
+
+def flush_all(app):
+    """Save every tenant's pending scores held by this process"""
+    flush_tenants(app, EXTENSION_KEY)
+
+
+def percentile(tenant, game_type, value):
+    """Return (percentage of recorded scores below `value`, number of scores)"""
+    histogram = get_sketches(tenant).view(game_type)
+    return histogram.rank(value), histogram.total
@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, has_app_context, request
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+EXTENSION_KEY = 'mindmoves_ratelimit'
+
+
+class HashingOverloaded(ServiceUnavailable):
+    """Raised when no bcrypt slot frees up within HASH_QUEUE_TIMEOUT"""
+    description = 'The server is busy. Please try again in a moment.'
+
+
+def _refill(tokens, updated, now, rate, burst):
+    """Return the bucket's token count at `now`"""
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class MemoryBuckets:
+    """Token buckets held in this process, least recently used first"""
+
+    def __init__(self, max_keys=10000):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+
+    def take(self, key, rate, burst, now=None):
+        """Take one token; returns seconds to wait, or 0 if allowed"""
+        return self.take_all([(key, rate, burst)], now)
+
+    def take_all(self, checks, now=None):
+        """Take one token from each (key, rate, burst) bucket, or none if any is empty.
+
+        Returns the longest wait, or 0 if allowed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            refilled = []
+            for key, rate, burst in checks:
+                tokens, updated = self._buckets.get(key, (burst, now))
+                refilled.append(_refill(tokens, updated, now, rate, burst))
+            wait = max((1 - tokens) / rate for tokens, (_, rate, _) in zip(refilled, checks))
+            if wait > 0:
+                return wait
+            for tokens, (key, _, _) in zip(refilled, checks):
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+            # Keys include submitted usernames, so cap them by evicting the least recently used
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0
+
+    def prune(self, older_than):
+        """Drop buckets untouched for `older_than` seconds"""
+        cutoff = time.time() - older_than
+        with self._lock:
+            while self._buckets and next(iter(self._buckets.values()))[1] < cutoff:
+                self._buckets.popitem(last=False)
+
+
+class SqliteBuckets:
+    """Token buckets in a local SQLite file shared by every worker process"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets '
+                         '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def take(self, key, rate, burst, now=None):
+        """Take one token; returns seconds to wait, or 0 if allowed"""
+        return self.take_all([(key, rate, burst)], now)
+
+    def take_all(self, checks, now=None):
+        """Take one token from each (key, rate, burst) bucket, or none if any is empty"""
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            refilled = []
+            for key, rate, burst in checks:
+                row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+                refilled.append(_refill(*(row or (burst, now)), now, rate, burst))
+            wait = max((1 - tokens) / rate for tokens, (_, rate, _) in zip(refilled, checks))
+            if wait <= 0:
+                wait = 0
+                conn.executemany('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                                 [(key, tokens - 1, now) for tokens, (key, _, _) in zip(refilled, checks)])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def prune(self, older_than):
+        """Delete buckets untouched for `older_than` seconds"""
+        self._connection().execute('DELETE FROM buckets WHERE updated < ?', (time.time() - older_than,))
+
+
+def parse_rate(value):
+    """Parse 'COUNT/SECONDS' into (tokens per second, burst)"""
+    count, seconds = value.split('/')
+    return int(count) / float(seconds), int(count)
+
+
+def init_rate_limits(app):
+    """Set up the token buckets and the bcrypt concurrency cap for `app`"""
+    storage = app.config.get('RATELIMIT_STORAGE')
+    app.extensions[EXTENSION_KEY] = {
+        'buckets': SqliteBuckets(storage) if storage else MemoryBuckets(),
+        'hash_slots': threading.BoundedSemaphore(app.config['HASH_CONCURRENCY']),
+    }
+
+
+def rate_limited(scope):
+    """Decorator limiting POSTs to a view per client IP and per submitted username"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            config = current_app.config
+            if request.method == 'POST' and config.get('RATELIMIT_ENABLED'):
+                buckets = current_app.extensions[EXTENSION_KEY]['buckets']
+                # Behind TRUSTED_PROXIES, ProxyFix has already set remote_addr to the client's address
+                checks = [(f'{scope}:ip:{request.remote_addr}', *parse_rate(config['RATELIMIT_PER_IP']))]
+                username = request.form.get('username')
+                if username:
+                    checks.append((f'{scope}:user:{username}', *parse_rate(config['RATELIMIT_PER_USERNAME'])))
+                # A request refused by one bucket spends no token from the others
+                wait = buckets.take_all(checks)
+                if wait:
+                    raise TooManyRequests(retry_after=max(1, int(wait + 0.999)))
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+@contextmanager
+def hashing_slot():
+    """Hold one of the HASH_CONCURRENCY bcrypt slots.
+
+    Waits at most HASH_QUEUE_TIMEOUT seconds, then sheds the request with
+    a 503 instead of queueing without limit.
+    """
+    if not has_app_context() or EXTENSION_KEY not in current_app.extensions:
+        yield
+        return
+    slots = current_app.extensions[EXTENSION_KEY]['hash_slots']
+    if not slots.acquire(timeout=current_app.config['HASH_QUEUE_TIMEOUT']):
+        raise HashingOverloaded(retry_after=current_app.config['HASH_RETRY_AFTER'])
+    try:
+        yield
+    finally:
+        slots.release()
@@ -0,0 +1,178 @@
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+# Captured requests that replay cannot or should not repeat: it manages its
+# own logins, and captures never hold passwords
+SKIPPED_ENDPOINTS = ('main.login', 'main.register', 'main.logout', 'main.forgot_password')
+
+REPLAY_PASSWORD = 'replay-password'
+
+_USER_PLACEHOLDER = re.compile(r'\{u:([0-9a-f]+)\}')
+
+
+def replay_username(pseudonym):
+    return f'replay-{pseudonym}'
+
+
+def load_capture(path):
+    """Read a capture file, oldest request first"""
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda record: record['t'])
+
+
+def quantile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class Replayer:
+    """Re-issue captured requests against `target`, `speed` times faster than recorded"""
+
+    def __init__(self, target, speed=1.0, concurrency=16, timeout=10.0):
+        self.target = target.rstrip('/')
+        self.speed = speed
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._openers = {}
+        self._lock = threading.Lock()
+        self._results = []
+
+    def _opener(self, pseudonym):
+        with self._lock:
+            opener = self._openers.get(pseudonym)
+            if opener is None:
+                opener = self._openers[pseudonym] = build_opener(HTTPCookieProcessor(CookieJar()))
+        return opener
+
+    def _post_form(self, opener, path, fields, attempts=5):
+        """POST a form, waiting out rate limits on the target"""
+        for _ in range(attempts):
+            try:
+                opener.open(Request(self.target + path, urlencode(fields).encode('utf-8')),
+                            timeout=self.timeout).read()
+                return
+            except HTTPError as e:
+                if e.code != 429:
+                    return
+                time.sleep(float(e.headers.get('Retry-After') or 1))
+
+    def sign_in(self, pseudonyms):
+        """Register (if needed) and log in one replay account per captured user.
+
+        Replay accounts are ordinary users, so captured admin pages answer 403.
+        """
+        for pseudonym in pseudonyms:
+            opener = self._opener(pseudonym)
+            username = replay_username(pseudonym)
+            self._post_form(opener, '/register', {
+                'first_name': 'Replay', 'username': username, 'password': REPLAY_PASSWORD,
+                'secret_question': 'replay', 'secret_answer': 'replay'})
+            self._post_form(opener, '/login', {'username': username, 'password': REPLAY_PASSWORD})
+
+    def _issue(self, record, due):
+        lag = max(time.perf_counter() - due, 0) * 1000
+        path = _USER_PLACEHOLDER.sub(lambda match: replay_username(match.group(1)), record['p'])
+        body = headers = None
+        if 'b' in record:
+            body = json.dumps(record['b']).encode('utf-8')
+            headers = {'Content-Type': 'application/json'}
+        elif record['m'] in ('POST', 'PUT'):
+            body = b''
+        request = Request(self.target + path, data=body, headers=headers or {}, method=record['m'])
+        opener = self._opener(record['u'])
+        started = time.perf_counter()
+        try:
+            with opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                status = response.status
+        except HTTPError as e:
+            e.read()
+            status = e.code
+        except (URLError, OSError):
+            status = None
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._results.append((record, status, elapsed, lag))
+
+    def run(self, records):
+        """Replay `records` on their original schedule scaled by `speed`; returns a report"""
+        skipped = [record for record in records if record['e'] in SKIPPED_ENDPOINTS]
+        records = [record for record in records if record['e'] not in SKIPPED_ENDPOINTS]
+        if not records:
+            return build_report([], len(skipped))
+        pseudonyms = {record['u'] for record in records if record['u']}
+        pseudonyms.update(match for record in records for match in _USER_PLACEHOLDER.findall(record['p']))
+        self.sign_in(sorted(pseudonyms))
+        self._results = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            for record in records:
+                due = started + (record['t'] - records[0]['t']) / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self._issue, record, due)
+        return build_report(self._results, len(skipped), time.perf_counter() - started)
+
+
+def _is_error(status):
+    return status is None or status >= 500
+
+
+def build_report(results, skipped=0, duration=0.0):
+    """Summarise replayed (record, status, ms, lag_ms) tuples per endpoint"""
+    by_endpoint = defaultdict(list)
+    for result in results:
+        by_endpoint[result[0]['e'] or 'unknown'].append(result)
+    endpoints = {}
+    for endpoint, rows in sorted(by_endpoint.items()):
+        replayed = [ms for _, _, ms, _ in rows]
+        captured = [record['ms'] for record, _, _, _ in rows]
+        endpoints[endpoint] = {
+            'count': len(rows),
+            'errors': sum(1 for _, status, _, _ in rows if _is_error(status)),
+            'captured_errors': sum(1 for record, _, _, _ in rows if _is_error(record['s'])),
+            'status_changed': sum(1 for record, status, _, _ in rows if status != record['s']),
+            **{f'p{q}': quantile(replayed, q / 100) for q in (50, 95, 99)},
+            **{f'captured_p{q}': quantile(captured, q / 100) for q in (50, 95, 99)},
+        }
+    return {
+        'requests': len(results),
+        'skipped': skipped,
+        'duration': round(duration, 3),
+        'errors': sum(row['errors'] for row in endpoints.values()),
+        'captured_errors': sum(row['captured_errors'] for row in endpoints.values()),
+        'max_lag_ms': round(max((lag for _, _, _, lag in results), default=0), 2),
+        'endpoints': endpoints,
+    }
+
+
+def format_report(report, baseline=None):
+    """Render a report as text lines; deltas are against `baseline` or else the captured timings"""
+    against = 'baseline' if baseline else 'captured'
+    lines = [f"{report['requests']} requests in {report['duration']:.1f}s "
+             f"({report['skipped']} auth requests skipped, max dispatch lag {report['max_lag_ms']:.0f} ms)",
+             f"{'endpoint':<28}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+             f"{'Δp95 vs ' + against:>20}{'errors':>8}{'Δerrors':>9}"]
+    for endpoint, row in report['endpoints'].items():
+        if baseline:
+            other = baseline['endpoints'].get(endpoint)
+            reference_p95 = other['p95'] if other else None
+            reference_errors = other['errors'] if other else 0
+        else:
+            reference_p95, reference_errors = row['captured_p95'], row['captured_errors']
+        delta = f"{row['p95'] - reference_p95:+.1f}" if reference_p95 is not None else 'n/a'
+        lines.append(f"{endpoint:<28}{row['count']:>7}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}"
+                     f"{delta:>20}{row['errors']:>8}{row['errors'] - reference_errors:>+9}")
+    return lines
@@ -0,0 +1,145 @@
+import csv
+import hashlib
+import io
+from operator import attrgetter
+
+from flask import Response, current_app, request, stream_with_context
+
+from app.cache import LRUCache
+from app.charts import line_chart, percent, sparkline
+from app.tenants import current_tenant
+
+EXTENSION_KEY = 'mindmoves_reports'
+
+CSV_FIELDS = ['game_type', 'date', 'score', 'total', 'percent']
+
+
+def init_reports(app):
+    app.extensions[EXTENSION_KEY] = LRUCache(app.config['REPORT_CACHE_SIZE'])
+
+
+def history_version(user):
+    """Identify the state of a user's history; changes whenever a score is saved"""
+    history = user.get('game_history', [])
+    return (user.get('history_version', 0), len(history), history[-1].timestamp if history else 0)
+
+
+def group_by_game(history):
+    """Return [(game name, games oldest first)] ordered by game name"""
+    groups = {}
+    for game in history:
+        groups.setdefault(game.game_type, []).append(game)
+    return [(name, sorted(games, key=attrgetter('timestamp'))) for name, games in sorted(groups.items())]
+
+
+def summarize(games):
+    """Count, best, average and first/last percentage for one game type"""
+    percents = [percent(game) for game in games]
+    return {
+        'count': len(games),
+        'best': max(percents),
+        'average': sum(percents) / len(percents),
+        'first': percents[0],
+        'last': percents[-1],
+        'first_date': games[0].date,
+        'last_date': games[-1].date,
+    }
+
+
+def iter_csv_report(user):
+    """Yield the user's history as CSV, grouped by game type"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_FIELDS)
+    for name, games in group_by_game(user.get('game_history', [])):
+        for game in games:
+            writer.writerow([name, game.date, game.score, game.total, f'{percent(game):.1f}'])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_html_report(user):
+    """Yield the printable HTML report section by section"""
+    def sections():
+        for name, games in group_by_game(user.get('game_history', [])):
+            yield {
+                'name': name,
+                'games': games,
+                'summary': summarize(games),
+                'chart': line_chart(games, title=f'{name} (% of total)'),
+            }
+
+    template = current_app.jinja_env.get_template('reports/progress.html')
+    context = {'user': user, 'sections': sections()}
+    current_app.update_template_context(context)
+    return template.generate(context)
+
+
+REPORT_FORMATS = {
+    'html': (iter_html_report, 'text/html'),
+    'csv': (iter_csv_report, 'text/csv'),
+}
+
+
+def _not_modified(etag, headers=None):
+    response = Response(status=304, headers=headers)
+    response.set_etag(etag)
+    return response
+
+
+def report_response(user, fmt):
+    """Stream a report, or serve it from the cache for an unchanged history"""
+    generate, mimetype = REPORT_FORMATS[fmt]
+    key = (current_tenant(), user['username'], fmt, history_version(user))
+    etag = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    headers = {}
+    if fmt == 'csv':
+        headers['Content-Disposition'] = f"attachment; filename={user['username']}-progress.csv"
+
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag, headers)
+
+    cache = current_app.extensions[EXTENSION_KEY]
+    body = cache.get(key)
+    if body is not None:
+        response = Response(body, mimetype=mimetype, headers=headers)
+    else:
+        def stream_and_store():
+            chunks = []
+            for chunk in generate(user):
+                chunks.append(chunk)
+                yield chunk
+            cache.put(key, ''.join(chunks))
+
+        response = Response(stream_with_context(stream_and_store()), mimetype=mimetype, headers=headers)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+CHART_KINDS = {
+    'sparkline': lambda games, name: sparkline(games),
+    'trend': lambda games, name: line_chart(games, title=f'{name} (% of total)', trend=True),
+}
+
+
+def chart_response(user, game_type, kind):
+    """Serve one game's SVG chart, rendering it at most once per history version"""
+    key = (current_tenant(), user['username'], f'chart:{kind}:{game_type.key}', history_version(user))
+    etag = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+
+    cache = current_app.extensions[EXTENSION_KEY]
+    body = cache.get(key)
+    if body is None:
+        games = sorted((game for game in user.get('game_history', []) if game.game == game_type.id),
+                       key=attrgetter('timestamp'))
+        body = CHART_KINDS[kind](games, game_type.name)
+        cache.put(key, body)
+    response = Response(body, mimetype='image/svg+xml')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
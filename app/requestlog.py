@@ -0,0 +1,124 @@
+import json
+import logging
+import re
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request, session
+from jinja2 import Template
+
+logger = logging.getLogger('app.slow_requests')
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Per-request state lives in the WSGI environ rather than `g`, which can be
+# shared between requests when an app context is already pushed.
+_PHASES_KEY = 'mindmoves.phases'
+_STARTED_KEY = 'mindmoves.started'
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block to the current request's `name` phase"""
+    phases = request.environ.get(_PHASES_KEY) if has_request_context() else None
+    if phases is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] += time.perf_counter() - started
+
+
+class TimedTemplate(Template):
+    """Jinja template that records render time in the `template` phase"""
+
+    def render(self, *args, **kwargs):
+        with phase('template'):
+            return super().render(*args, **kwargs)
+
+    def generate(self, *args, **kwargs):
+        iterator = super().generate(*args, **kwargs)
+        while True:
+            with phase('template'):
+                chunk = next(iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+class TimedSessionInterface:
+    """Wrap a session interface so opening the session is timed"""
+
+    def __init__(self, wrapped):
+        self.wrapped = wrapped
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+    def open_session(self, app, request):
+        _begin_request()
+        with phase('session_load'):
+            return self.wrapped.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        return self.wrapped.save_session(app, session, response)
+
+
+def init_request_log(app):
+    """Assign request ids and log requests slower than SLOW_REQUEST_THRESHOLD_MS"""
+    app.session_interface = TimedSessionInterface(app.session_interface)
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(_begin_request)
+    app.after_request(_finish_request)
+
+
+def _begin_request():
+    if _PHASES_KEY in request.environ:
+        return
+    request.environ[_STARTED_KEY] = time.perf_counter()
+    request.environ[_PHASES_KEY] = defaultdict(float)
+    incoming = request.headers.get(REQUEST_ID_HEADER, '')
+    g.request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+
+def _finish_request(response):
+    phases = request.environ.get(_PHASES_KEY)
+    if phases is None:
+        return response
+    response.headers[REQUEST_ID_HEADER] = g.request_id
+    threshold = current_app.config.get('SLOW_REQUEST_THRESHOLD_MS')
+    if threshold is None:
+        return response
+    entry = {
+        'request_id': g.request_id,
+        'method': request.method,
+        'endpoint': request.endpoint,
+        'path': request.path,
+        'status': response.status_code,
+        'user': session.get('username'),
+    }
+    started = request.environ[_STARTED_KEY]
+    if response.is_streamed:
+        # A streamed body renders after this hook, so time it when the server closes the
+        # response; asking for its length here would buffer the whole stream
+        response.call_on_close(lambda: _log_if_slow(entry, started, phases, threshold, None))
+    else:
+        _log_if_slow(entry, started, phases, threshold, response.calculate_content_length())
+    return response
+
+
+def _log_if_slow(entry, started, phases, threshold, response_bytes):
+    total_ms = (time.perf_counter() - started) * 1000
+    if total_ms < threshold:
+        return
+    logger.warning(json.dumps(dict(
+        entry,
+        total_ms=round(total_ms, 2),
+        phases_ms={name: round(seconds * 1000, 2) for name, seconds in phases.items()},
+        response_bytes=response_bytes,
+    ), sort_keys=True))
@@ -0,0 +1,250 @@
+import logging
+import os
+import random
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no fcntl
+    fcntl = None
+
+from app.serializers import JsonSerializer
+from app.storage import FileUserStore
+from app.tenants import tenant_names
+
+EXTENSION_KEY = 'mindmoves_scheduler'
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A function run every `interval` seconds, give or take `jitter` (a fraction).
+
+    `every_process` jobs run in each worker, leader or not, because they act
+    on state held in that process's memory.
+    """
+
+    def __init__(self, name, func, interval, jitter=0.1, every_process=False):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.every_process = every_process
+        self.next_run = None
+        self.runs = 0
+        self.failures = 0
+        self.last_run = None
+        self.last_duration_ms = None
+        self.last_error = None
+
+    def schedule(self, now, first=False):
+        """Set the next run time; the first run is spread over one jitter window"""
+        if first:
+            self.next_run = now + random.uniform(0, self.interval * self.jitter)
+        else:
+            self.next_run = now + self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'every_process': self.every_process,
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_run': self.last_run,
+            'last_duration_ms': self.last_duration_ms,
+            'last_error': self.last_error,
+            'next_run': self.next_run,
+        }
+
+
+class Scheduler:
+    """Runs maintenance jobs on one background thread.
+
+    Only the process holding the leader lock file runs shared jobs, so
+    several workers started from the same app share one schedule. If the
+    leader exits, the OS releases its lock and another worker takes over.
+    Every-process jobs run in all workers.
+    """
+
+    def __init__(self, app, lock_path, tick=5):
+        self.app = app
+        self.lock_path = lock_path
+        self.tick = tick
+        self.jobs = {}
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, func, interval, jitter=0.1, every_process=False):
+        """Register `func(app)` to run every `interval` seconds"""
+        job = self.jobs[name] = Job(name, func, interval, jitter, every_process)
+        job.schedule(time.time(), first=True)
+        return job
+
+    @property
+    def is_leader(self):
+        return self._lock_file is not None
+
+    def try_lead(self):
+        """Take the leader lock if no other process holds it"""
+        if self.is_leader:
+            return True
+        os.makedirs(os.path.dirname(self.lock_path) or '.', exist_ok=True)
+        f = open(self.lock_path, 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False
+        self._lock_file = f
+        return True
+
+    def resign(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def run_job(self, job):
+        """Run one job now inside an app context and record how it went"""
+        started = time.time()
+        try:
+            with self.app.app_context():
+                job.func(self.app)
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f'{type(e).__name__}: {e}'
+            logger.exception('Scheduled job %s failed', job.name)
+        job.runs += 1
+        job.last_run = started
+        job.last_duration_ms = round((time.time() - started) * 1000, 2)
+        job.schedule(time.time())
+
+    def run_pending(self, now=None, leader=True):
+        """Run every job that is due, only every-process ones unless `leader`; returns the names that ran"""
+        now = time.time() if now is None else now
+        due = [job for job in self.jobs.values() if job.next_run <= now and (leader or job.every_process)]
+        for job in due:
+            self.run_job(job)
+        return [job.name for job in due]
+
+    def _loop(self):
+        while not self._stop.wait(self.tick):
+            self.run_pending(leader=self.try_lead())
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='mindmoves-scheduler', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.resign()
+
+    def stats(self):
+        return {'leader': self.is_leader, 'jobs': {name: job.stats() for name, job in self.jobs.items()}}
+
+
+def prune_sessions(app):
+    """Delete session files untouched for longer than the session lifetime"""
+    directory = app.config['SESSION_FILE_DIR']
+    cutoff = time.time() - app.permanent_session_lifetime.total_seconds()
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and not entry.name.startswith('__') and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def backup_users(app):
+    """Write a dated JSON copy of every tenant's users and drop old backups"""
+    from app.auth import get_store
+
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    for tenant in tenant_names():
+        directory = os.path.join(app.config['USERS_BACKUP_DIR'], tenant)
+        users = list(get_store(tenant).iter_users())
+        FileUserStore(os.path.join(directory, f'users-{stamp}.json'), JsonSerializer()).save_all(users)
+        backups = sorted(name for name in os.listdir(directory) if name.startswith('users-'))
+        for name in backups[:-app.config['USERS_BACKUP_KEEP']]:
+            os.remove(os.path.join(directory, name))
+
+
+def snapshot_users(app):
+    """Take a deduplicated snapshot of every tenant's users and apply the retention schedule"""
+    from app.auth import get_store
+    from app.snapshots import create_snapshot, prune_snapshots, snapshot_root
+
+    for tenant in tenant_names():
+        root = snapshot_root(app, tenant)
+        create_snapshot(root, get_store(tenant))
+        prune_snapshots(root, app.config['SNAPSHOT_KEEP_LAST'], app.config['SNAPSHOT_KEEP_DAILY'],
+                        app.config['SNAPSHOT_KEEP_WEEKLY'])
+
+
+def refresh_caches(app):
+    """Re-read changed user data and rebuild the admin search index so requests do not pay for it"""
+    from app.auth import get_store
+    from app.userindex import build_index
+
+    for tenant in tenant_names():
+        get_store(tenant).prime()
+        build_index(tenant)
+
+
+def prune_rate_limits(app):
+    """Drop rate-limit buckets that have been idle for an hour"""
+    from app.ratelimit import EXTENSION_KEY as RATELIMIT_KEY
+
+    app.extensions[RATELIMIT_KEY]['buckets'].prune(older_than=3600)
+
+
+def flush_score_sketches(app):
+    """Save scores this process's percentile sketches have not written out yet"""
+    from app.quantiles import flush_all
+
+    flush_all(app)
+
+
+def flush_engagement_metrics(app):
+    """Save activity this process's engagement counters have not written out yet"""
+    from app.metrics import flush_all
+
+    flush_all(app)
+
+
+DEFAULT_JOBS = {
+    'prune_sessions': prune_sessions,
+    'backup_users': backup_users,
+    'snapshot_users': snapshot_users,
+    'refresh_caches': refresh_caches,
+    'prune_rate_limits': prune_rate_limits,
+    'flush_score_sketches': flush_score_sketches,
+    'flush_engagement_metrics': flush_engagement_metrics,
+}
+
+# Jobs that act on what each worker holds in memory, so every worker runs them
+EVERY_PROCESS_JOBS = ('refresh_caches', 'prune_rate_limits', 'flush_score_sketches', 'flush_engagement_metrics')
+
+
+def init_scheduler(app):
+    """Create the scheduler with the jobs in SCHEDULER_INTERVALS; starts it if enabled"""
+    scheduler = Scheduler(app, app.config['SCHEDULER_LOCK_FILE'], app.config['SCHEDULER_TICK'])
+    for name, interval in app.config['SCHEDULER_INTERVALS'].items():
+        if interval:
+            scheduler.add_job(name, DEFAULT_JOBS[name], interval, app.config['SCHEDULER_JITTER'],
+                              every_process=name in EVERY_PROCESS_JOBS)
+    app.extensions[EXTENSION_KEY] = scheduler
+    if app.config['SCHEDULER_ENABLED']:
+        scheduler.start()
+    return scheduler
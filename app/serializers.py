@@ -0,0 +1,123 @@
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Binary formats start with this header line, e.g. b'MINDMOVES msgpack 1\n'.
+# JSON files have no header and stay readable by a plain json.load().
+MAGIC = b'MINDMOVES '
+
+# Stored in the users document so readers can tell which layout they have
+FORMAT_VERSION = 2
+
+
+class JsonSerializer:
+    """Compact stdlib JSON"""
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+class OrjsonSerializer:
+    """JSON through orjson; the output is ordinary JSON"""
+    name = 'orjson'
+
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+
+class MsgpackSerializer:
+    """MessagePack with a version header line"""
+    name = 'msgpack'
+    version = 1
+
+    def dumps(self, obj):
+        header = MAGIC + f'{self.name} {self.version}\n'.encode('ascii')
+        return header + msgpack.packb(obj, use_bin_type=True)
+
+
+def _json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def loads(data):
+    """Decode bytes written by any serializer (or legacy indented JSON)"""
+    if data.startswith(MAGIC):
+        header, _, body = data.partition(b'\n')
+        codec = header[len(MAGIC):].split(b' ')[0].decode('ascii')
+        if codec == 'msgpack':
+            if msgpack is None:
+                raise ValueError('Data file is msgpack encoded but msgpack is not installed')
+            return msgpack.unpackb(body, raw=False)
+        raise ValueError(f'Unknown data file codec: {codec}')
+    return _json_loads(data)
+
+
+def get_serializer(name):
+    """Return the serializer called `name`, falling back to compact JSON"""
+    if name == 'orjson' and orjson is not None:
+        return OrjsonSerializer()
+    if name == 'msgpack' and msgpack is not None:
+        return MsgpackSerializer()
+    if name not in ('json', None):
+        logger.warning('Serializer %r is not available, falling back to json', name)
+    return JsonSerializer()
+
+
+def _orjson_dumps(obj, default, sort_keys):
+    # Datetimes go through Flask's default() so they keep its HTTP date format
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=default, option=option).decode('utf-8')
+
+
+def init_json_provider(app):
+    """Serve jsonify() responses through orjson.
+
+    Flask 2.2+ takes a JSON provider; older Flask takes an encoder class,
+    which encodes through orjson unless indented output is asked for.
+    """
+    if orjson is None:
+        return
+    try:
+        from flask.json.provider import DefaultJSONProvider
+    except ImportError:
+        from flask.json import JSONEncoder
+
+        class OrjsonEncoder(JSONEncoder):
+            def encode(self, o):
+                if self.indent is not None:
+                    return super().encode(o)
+                try:
+                    return _orjson_dumps(o, self.default, self.sort_keys)
+                except orjson.JSONEncodeError:
+                    # e.g. integers beyond 64 bits, which the stdlib encoder handles
+                    return super().encode(o)
+
+        app.json_encoder = OrjsonEncoder
+        return
+
+    class OrjsonProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            if kwargs:
+                return super().dumps(obj, **kwargs)
+            return _orjson_dumps(obj, self.default, self.sort_keys)
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
@@ -0,0 +1,280 @@
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from werkzeug.serving import BaseWSGIServer
+
+from app.events import EXTENSION_KEY as EVENTS_KEY
+from app.live import EXTENSION_KEY as LIVE_KEY
+from app.scheduler import EXTENSION_KEY as SCHEDULER_KEY
+from app.warmup import EXTENSION_KEY as WARMUP_KEY, warm_up
+
+logger = logging.getLogger(__name__)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles connections on a fixed pool of threads.
+
+    A thread slot is taken before accept(), so a worker whose threads are
+    all busy leaves new connections in the shared listen backlog for idle
+    workers.
+    After `max_requests` connections the server stops accepting, finishes
+    what it has and returns from serve_forever().
+    """
+    multithread = True
+    multiprocess = True
+
+    def __init__(self, app, sock, threads=8, max_requests=0):
+        super().__init__(*sock.getsockname()[:2], app, fd=sock.fileno())
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix='mindmoves-http')
+        self.in_flight = set()
+        self.slots = threading.BoundedSemaphore(threads)
+        self.max_requests = max_requests
+        self.handled = 0
+        self._count_lock = threading.Lock()
+        self._stopping = False
+        # Another worker may win the race for a connection; accept() must not block then
+        self.socket.setblocking(False)
+
+    def get_request(self):
+        # Time out now and then so serve_forever() still notices shutdown()
+        if not self.slots.acquire(timeout=0.5):
+            raise BlockingIOError('no free thread')
+        try:
+            return super().get_request()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def process_request(self, request, client_address):
+        try:
+            future = self.pool.submit(self._process, request, client_address)
+        except BaseException:
+            self.slots.release()
+            raise
+        self.in_flight.add(future)
+        future.add_done_callback(self.in_flight.discard)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+        with self._count_lock:
+            self.handled += 1
+            recycle = self.max_requests and self.handled >= self.max_requests
+        if recycle:
+            self.stop()
+
+    def stop(self):
+        """Stop accepting; safe to call from a request thread or a signal handler"""
+        if not self._stopping:
+            self._stopping = True
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def drain(self, timeout=None):
+        """Wait up to `timeout` seconds for in-flight requests; returns how many are still running"""
+        self.pool.shutdown(wait=False)
+        _, running = wait(list(self.in_flight), timeout)
+        if running:
+            logger.warning('Abandoning %s requests still running after %ss', len(running), timeout)
+        return len(running)
+
+
+def listen(host, port, backlog=128):
+    """Open the listening socket that every worker accepts from"""
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def finish_worker(app):
+    """Deliver queued events and save in-memory sketches and metrics before the process exits"""
+    from app.metrics import flush_all as flush_metrics
+    from app.quantiles import flush_all as flush_sketches
+
+    scheduler = app.extensions.get(SCHEDULER_KEY)
+    if scheduler is not None:
+        scheduler.stop()
+    bus = app.extensions.get(EVENTS_KEY)
+    if bus is not None:
+        bus.drain()
+    with app.app_context():
+        for flush in (flush_sketches, flush_metrics):
+            try:
+                flush(app)
+            except Exception:
+                logger.exception('Flushing %s on worker exit failed', flush.__module__)
+
+
+def run_worker(app, sock, threads, max_requests):
+    """Serve from `sock` until recycled or sent SIGTERM, then flush state and return"""
+    server = PooledWSGIServer(app, sock, threads, max_requests)
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    # Each /live viewer holds a pool thread for as long as it watches, so
+    # keep at least half the threads for ordinary requests
+    hub = app.extensions.get(LIVE_KEY)
+    if hub is not None:
+        hub.max_subscribers = min(hub.max_subscribers, max(1, threads // 2))
+    # Threads do not survive fork(); the scheduler's leader lock picks one worker to run jobs
+    scheduler = app.extensions.get(SCHEDULER_KEY)
+    if scheduler is not None and app.config['SCHEDULER_ENABLED']:
+        scheduler.start()
+    server.serve_forever()
+    # Open /live streams would otherwise keep the worker, and so its generation, alive forever
+    if hub is not None:
+        hub.close()
+    server.drain(app.config['SERVE_DRAIN_SECONDS'])
+    finish_worker(app)
+
+
+class Master:
+    """Warms the app once, then forks workers that inherit the warm state.
+
+    SIGHUP re-reads templates and user data, starts a new generation of
+    workers and then lets the old ones finish their requests and exit.
+    SIGTERM or SIGINT drains every worker and stops. Either way a stopping
+    worker ends its /live streams and gives other requests at most
+    SERVE_DRAIN_SECONDS to finish.
+
+    The master runs no background threads of its own: a thread holding a
+    lock at fork() would leave that lock held forever in the child. The
+    warm-up thread is joined and the scheduler stopped before forking.
+
+    /live streams are per process: a viewer only sees scores saved by the
+    worker serving its stream. Run a single worker where live viewing
+    matters.
+    """
+
+    def __init__(self, app, host, port, workers, threads, max_requests, max_requests_jitter=0):
+        self.app = app
+        self.workers = workers
+        self.threads = threads
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.sock = listen(host, port)
+        self.children = {}
+        self.generation = 0
+        self._reload = False
+        self._stop = False
+
+    def quiesce(self):
+        """Stop the app's background threads so none holds a lock across fork()"""
+        warmup = self.app.extensions.get(WARMUP_KEY, {}).get('thread')
+        if warmup is not None:
+            warmup.join()
+        scheduler = self.app.extensions.get(SCHEDULER_KEY)
+        if scheduler is not None:
+            scheduler.stop()
+        others = [thread.name for thread in threading.enumerate() if thread is not threading.current_thread()]
+        if others:
+            logger.warning('Forking workers while threads are running: %s', ', '.join(others))
+
+    def warm(self):
+        self.quiesce()
+        self.app.jinja_env.cache.clear()
+        state = warm_up(self.app)
+        logger.info('Master warmed up: %s', state['timings'])
+        # Keep the warm objects out of the collector so workers do not copy their pages
+        gc.collect()
+        gc.freeze()
+
+    def spawn(self):
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            # Spread recycling so workers do not all restart together
+            max_requests += random.randint(0, self.max_requests_jitter)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.threads, max_requests)
+            except BaseException:
+                logger.exception('Worker crashed')
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = self.generation
+        return pid
+
+    def _signal(self, pids, signum):
+        for pid in pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        """Collect exited workers; returns how many exited"""
+        exited = 0
+        while self.children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                break
+            if pid == 0:
+                break
+            self.children.pop(pid, None)
+            exited += 1
+        return exited
+
+    def reload(self):
+        old = list(self.children)
+        self.generation += 1
+        self.warm()
+        for _ in range(self.workers):
+            self.spawn()
+        self._signal(old, signal.SIGTERM)
+        logger.info('Reloaded: generation %s, %s workers', self.generation, self.workers)
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda signum, frame: setattr(self, '_reload', True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, '_stop', True))
+        signal.signal(signal.SIGINT, lambda signum, frame: setattr(self, '_stop', True))
+        self.warm()
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info('Serving on %s with %s workers x %s threads', self.sock.getsockname(), self.workers, self.threads)
+
+        while not self._stop:
+            time.sleep(0.2)
+            self.reap()
+            if self._reload:
+                self._reload = False
+                self.reload()
+            current = sum(1 for generation in self.children.values() if generation == self.generation)
+            for _ in range(self.workers - current):
+                self.spawn()
+
+        self._signal(list(self.children), signal.SIGTERM)
+        while self.children:
+            time.sleep(0.1)
+            self.reap()
+        self.sock.close()
+
+
+def serve(app, host='127.0.0.1', port=5002, workers=None, threads=None, max_requests=None):
+    """Run `app` with preforked workers; values left as None come from SERVE_* config"""
+    config = app.config
+    Master(
+        app, host, port,
+        workers or config['SERVE_WORKERS'],
+        threads or config['SERVE_THREADS'],
+        config['SERVE_MAX_REQUESTS'] if max_requests is None else max_requests,
+        config['SERVE_MAX_REQUESTS_JITTER'],
+    ).run()
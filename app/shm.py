@@ -0,0 +1,210 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from stat import S_ISDIR
+
+from app.games import decode_user, encode_user
+from app.serializers import loads
+from app.storage import FileUserStore, atomic_write, file_lock
+
+# Machine-wide directory of users shared by every worker through mmap.
+#
+# Two files live in a private per-user directory in shared memory (/dev/shm
+# where the OS has it), readable only by the user running the app since the
+# records include password hashes:
+#
+#     <name>.gen   8-byte generation counter, bumped after every publish
+#     <name>.img   header | slot table | records
+#
+# The slot table is an open-addressed hash of username -> (offset, length);
+# each record is the username, a NUL and the serialized user. A published
+# image is never modified, only replaced, so readers need no locks: they
+# compare the counter with the generation of the image they have mapped and
+# remap only when another process has published since.
+
+MAGIC = b'MMDIR001'
+HEADER = struct.Struct('<8sQQQQQQ')  # magic, generation, slots, count, source inode/mtime/size
+SLOT = struct.Struct('<QQQ')  # hash (0 = empty), offset, length
+COUNTER = struct.Struct('<Q')
+
+
+def default_directory():
+    """This user's private directory in RAM-backed /dev/shm where available, else the temp directory"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    if not hasattr(os, 'getuid'):
+        return base  # Windows temp directories are already per user
+    path = os.path.join(base, f'mindmoves-{os.getuid()}')
+    os.makedirs(path, 0o700, exist_ok=True)
+    # Everyone can create entries in /dev/shm: refuse a directory someone else made first
+    info = os.lstat(path)
+    if not S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f'{path} must be a directory private to this user')
+    return path
+
+
+def _hash(username):
+    return int.from_bytes(hashlib.sha1(username.encode('utf-8')).digest()[:8], 'little') or 1
+
+
+class SharedDirectory:
+    """Read-mostly username -> record table published to shared memory"""
+
+    def __init__(self, source_path, directory=None):
+        name = 'mindmoves-' + hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:16]
+        directory = directory or default_directory()
+        self.counter_path = os.path.join(directory, name + '.gen')
+        self.image_path = os.path.join(directory, name + '.img')
+        self._lock = threading.Lock()
+        self._counter = None
+        self._image = None  # (generation, header fields, mmap)
+
+    def _counter_map(self):
+        if self._counter is None:
+            with self._lock:
+                if self._counter is None:
+                    fd = os.open(self.counter_path, os.O_RDWR | os.O_CREAT, 0o600)
+                    try:
+                        if os.fstat(fd).st_size < COUNTER.size:
+                            os.ftruncate(fd, COUNTER.size)
+                        self._counter = mmap.mmap(fd, COUNTER.size)
+                    finally:
+                        os.close(fd)
+        return self._counter
+
+    def generation(self):
+        """Current published generation; a single shared-memory read"""
+        return COUNTER.unpack_from(self._counter_map())[0]
+
+    def _mapped(self):
+        """Return (header, mmap) of the latest image, or None if nothing is published"""
+        generation = self.generation()
+        image = self._image
+        if image is not None and image[0] == generation:
+            return image[1], image[2]
+        try:
+            with open(self.image_path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        header = HEADER.unpack_from(mapped)
+        if header[0] != MAGIC:
+            return None
+        # Older mappings are left to the garbage collector; other threads may still be reading them
+        self._image = (generation, header, mapped)
+        return header, mapped
+
+    def source(self):
+        """(inode, mtime_ns, size) of the file the image was built from, or None"""
+        image = self._mapped()
+        return image[0][4:7] if image else None
+
+    def count(self):
+        image = self._mapped()
+        return image[0][3] if image else 0
+
+    def get(self, username):
+        """Return the serialized record for `username`, or None"""
+        image = self._mapped()
+        if image is None:
+            return None
+        header, mapped = image
+        mask = header[2] - 1
+        key = _hash(username)
+        prefix = username.encode('utf-8') + b'\0'
+        index = key & mask
+        while True:
+            slot_hash, offset, length = SLOT.unpack_from(mapped, HEADER.size + index * SLOT.size)
+            if slot_hash == 0:
+                return None
+            if slot_hash == key and mapped[offset:offset + len(prefix)] == prefix:
+                return mapped[offset + len(prefix):offset + length]
+            index = (index + 1) & mask
+
+    def publish(self, records, source):
+        """Replace the image with `records` [(username, bytes)] and bump the generation.
+
+        Callers serialize publishers; readers are never blocked.
+        """
+        records = list(records)
+        slots = 8
+        while slots < 2 * len(records):
+            slots *= 2
+        mask = slots - 1
+        table = bytearray(slots * SLOT.size)
+        body = bytearray()
+        base = HEADER.size + len(table)
+        for username, data in records:
+            key = _hash(username)
+            index = key & mask
+            while SLOT.unpack_from(table, index * SLOT.size)[0]:
+                index = (index + 1) & mask
+            record = username.encode('utf-8') + b'\0' + data
+            SLOT.pack_into(table, index * SLOT.size, key, base + len(body), len(record))
+            body += record
+        generation = self.generation() + 1
+        header = HEADER.pack(MAGIC, generation, slots, len(records), *source)
+        atomic_write(self.image_path, header + bytes(table) + bytes(body), mode=0o600)
+        COUNTER.pack_into(self._counter_map(), 0, generation)
+        return generation
+
+
+class SharedUserStore(FileUserStore):
+    """FileUserStore whose reads go through a SharedDirectory.
+
+    Workers hold no parsed copy of the users: each lookup is one hash probe
+    into the machine-wide image plus decoding that user's record, and the
+    only per-request checks are the generation counter and a stat of the
+    users file.
+    """
+
+    def __init__(self, path, serializer=None, directory=None):
+        super().__init__(path, serializer)
+        self.directory = SharedDirectory(path, directory)
+
+    def _source(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return (0, 0, 0)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _records(self, users):
+        return ((user['username'], self.serializer.dumps(encode_user(user))) for user in users)
+
+    def _publish(self, users, source):
+        with file_lock(self.directory.image_path + '.lock'):
+            self.directory.publish(self._records(users), source)
+
+    def _refresh(self):
+        """Republish the image if the users file no longer matches the one it was built from.
+
+        Costs one os.stat per lookup, and catches files replaced around this
+        store, e.g. by `flask storage migrate` or a restored backup.
+        """
+        if self.directory.source() == self._source():
+            return
+        with self._lock, file_lock(self.directory.image_path + '.lock'):
+            source = self._source()
+            if self.directory.source() != source:
+                self.directory.publish(self._records(self.load_all()), source)
+
+    def save_all(self, users):
+        """Replace the file with `users` and publish them to every worker"""
+        super().save_all(users)
+        self._publish(users, self._source())
+
+    def prime(self):
+        """Map the shared image ahead of the first request and return the user count"""
+        self._refresh()
+        return self.directory.count()
+
+    def get(self, username):
+        """Return the user's record, or None"""
+        if not username:
+            return None
+        self._refresh()
+        data = self.directory.get(username)
+        return decode_user(loads(data)) if data is not None else None
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import time
+import zlib
+
+from app.games import decode_user, encode_user
+from app.storage import ShardedUserStore, atomic_write, file_lock
+
+# Deduplicated point-in-time copies of a user store.
+#
+#     <root>/objects/ab/<sha256>.z   one zlib-compressed user record, named by its hash
+#     <root>/snapshots/<id>.json     manifest: [username, sha256, source signature] per user
+#
+# A record that has not changed since the last snapshot is already stored, so
+# each snapshot writes only the users that changed. Writers are never paused:
+# USERS_FILE is replaced by atomic rename, so reading it sees one consistent
+# version, and sharded users are read one atomically written file at a time.
+
+
+class SnapshotError(Exception):
+    """A snapshot is missing, or its data does not match its checksums"""
+
+
+def snapshot_root(app, tenant):
+    return os.path.join(app.config['SNAPSHOT_DIR'], tenant)
+
+
+def _object_path(root, digest):
+    return os.path.join(root, 'objects', digest[:2], digest + '.z')
+
+
+def _manifest_path(root, snapshot_id):
+    return os.path.join(root, 'snapshots', snapshot_id + '.json')
+
+
+def _signature(path):
+    """(inode, mtime, size) of `path`, or None if it is missing"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+
+def _checksum(users):
+    digest = hashlib.sha256()
+    for username, object_digest, _ in users:
+        digest.update(f'{username}\0{object_digest}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _store_object(root, user, stats):
+    """Write `user` as a compressed object unless an identical one exists; return its hash"""
+    data = json.dumps(encode_user(user), sort_keys=True, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    path = _object_path(root, digest)
+    if not os.path.exists(path):
+        compressed = zlib.compress(data, 6)
+        atomic_write(path, compressed)
+        stats['new_objects'] += 1
+        stats['new_bytes'] += len(compressed)
+    return digest
+
+
+def _read_object(root, digest):
+    """Return the user stored under `digest`, checking the data still hashes to it"""
+    try:
+        with open(_object_path(root, digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+    except FileNotFoundError:
+        raise SnapshotError(f'Missing object {digest}')
+    except zlib.error:
+        raise SnapshotError(f'Corrupt object {digest}')
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise SnapshotError(f'Checksum mismatch for object {digest}')
+    return decode_user(json.loads(data))
+
+
+def list_snapshots(root):
+    """Return snapshot ids, oldest first"""
+    try:
+        names = os.listdir(os.path.join(root, 'snapshots'))
+    except FileNotFoundError:
+        return []
+    return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+
+def load_manifest(root, snapshot_id):
+    """Read a manifest and check its own checksum"""
+    try:
+        with open(_manifest_path(root, snapshot_id)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise SnapshotError(f'No snapshot {snapshot_id}')
+    except ValueError:
+        raise SnapshotError(f'Corrupt manifest for snapshot {snapshot_id}')
+    if _checksum(manifest['users']) != manifest['checksum']:
+        raise SnapshotError(f'Checksum mismatch in manifest {snapshot_id}')
+    return manifest
+
+
+def create_snapshot(root, store, now=None):
+    """Record the store's current users; returns the manifest with write stats"""
+    with file_lock(os.path.join(root, '.lock')):
+        snapshots = list_snapshots(root)
+        previous = load_manifest(root, snapshots[-1]) if snapshots else None
+        stats = {'new_objects': 0, 'new_bytes': 0, 'reused': 0}
+        users = []
+        if isinstance(store, ShardedUserStore):
+            # Users whose file is untouched since the last snapshot are not even read
+            known = {username: (digest, source) for username, digest, source in previous['users']} if previous else {}
+            for username in store.usernames():
+                source = _signature(store._user_path(username))
+                if source is None:
+                    continue
+                if username in known and known[username][1] == source:
+                    users.append([username, known[username][0], source])
+                    stats['reused'] += 1
+                    continue
+                user = store.get(username)
+                if user is not None:
+                    users.append([username, _store_object(root, user, stats), source])
+            source = None
+        else:
+            source = _signature(store.path)
+            if previous and source and previous.get('source') == source:
+                users = previous['users']
+                stats['reused'] = len(users)
+            else:
+                users = [[user['username'], _store_object(root, user, stats), None] for user in store.iter_users()]
+
+        created = time.time() if now is None else now
+        snapshot_id = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(created))
+        suffix = 1
+        while os.path.exists(_manifest_path(root, snapshot_id)):
+            snapshot_id = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(created)) + f'-{suffix}'
+            suffix += 1
+        manifest = {'id': snapshot_id, 'created': created, 'source': source,
+                    'users': users, 'checksum': _checksum(users)}
+        atomic_write(_manifest_path(root, snapshot_id), json.dumps(manifest, separators=(',', ':')))
+        return dict(manifest, **stats)
+
+
+def verify_snapshot(root, snapshot_id):
+    """Check every object of a snapshot and return its users"""
+    manifest = load_manifest(root, snapshot_id)
+    return [_read_object(root, digest) for _, digest, _ in manifest['users']]
+
+
+def restore_snapshot(root, snapshot_id, store):
+    """Replace the store's users with a verified snapshot; nothing is written if any check fails"""
+    users = verify_snapshot(root, snapshot_id)
+    store.save_all(users)
+    return len(users)
+
+
+def prune_snapshots(root, keep_last, keep_daily, keep_weekly):
+    """Keep the newest `keep_last` snapshots plus the newest one per recent day and week.
+
+    Objects no longer referenced by any kept snapshot are deleted. Returns
+    (snapshots removed, objects removed).
+    """
+    with file_lock(os.path.join(root, '.lock')):
+        snapshots = list_snapshots(root)
+        keep = set(snapshots[-keep_last:]) if keep_last else set()
+        days, weeks = set(), set()
+        for snapshot_id in reversed(snapshots):
+            created = time.strptime(snapshot_id[:16], '%Y%m%dT%H%M%SZ')
+            day, week = created[:3], time.strftime('%G-%V', created)
+            if day not in days and len(days) < keep_daily:
+                days.add(day)
+                keep.add(snapshot_id)
+            if week not in weeks and len(weeks) < keep_weekly:
+                weeks.add(week)
+                keep.add(snapshot_id)
+
+        removed = 0
+        for snapshot_id in snapshots:
+            if snapshot_id not in keep:
+                os.remove(_manifest_path(root, snapshot_id))
+                removed += 1
+
+        referenced = set()
+        for snapshot_id in keep:
+            with open(_manifest_path(root, snapshot_id)) as f:
+                referenced.update(digest for _, digest, _ in json.load(f)['users'])
+        removed_objects = 0
+        for directory, _, names in os.walk(os.path.join(root, 'objects')):
+            for name in names:
+                if name.endswith('.z') and name[:-2] not in referenced:
+                    os.remove(os.path.join(directory, name))
+                    removed_objects += 1
+        return removed, removed_objects
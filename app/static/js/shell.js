@@ -0,0 +1,241 @@
+// Single-page shell: swaps <main> between the pages listed in
+// <body data-shell-views> without reloading the document, prefetching on
+// hover/focus. Every page is still a normal server route, so anything the
+// shell cannot handle (forms, redirects, errors) falls back to a full load.
+(function () {
+    'use strict';
+
+    var PREFETCH_TTL = 30000;
+    var nativeSetTimeout = window.setTimeout;
+    var nativeSetInterval = window.setInterval;
+    var nativeRequestAnimationFrame = window.requestAnimationFrame;
+    var nativeAddEventListener = EventTarget.prototype.addEventListener;
+
+    // Timers and window/document listeners created by the current view,
+    // cleared when the shell swaps it out
+    var view = newView();
+    var tracking = true;
+    var readyCallbacks = null;
+    var prefetched = new Map();
+    var views = [];
+
+    function newView() {
+        return {timeouts: new Set(), intervals: new Set(), frames: new Set(), listeners: []};
+    }
+
+    window.setTimeout = function (callback) {
+        var args = Array.prototype.slice.call(arguments);
+        var owner = view;
+        var id;
+        if (tracking && typeof callback === 'function') {
+            args[0] = function () {
+                owner.timeouts.delete(id);
+                return callback.apply(this, arguments);
+            };
+        }
+        id = nativeSetTimeout.apply(window, args);
+        if (tracking) {
+            owner.timeouts.add(id);
+        }
+        return id;
+    };
+
+    window.setInterval = function () {
+        var id = nativeSetInterval.apply(window, arguments);
+        if (tracking) {
+            view.intervals.add(id);
+        }
+        return id;
+    };
+
+    window.requestAnimationFrame = function (callback) {
+        if (!tracking) {
+            return nativeRequestAnimationFrame.call(window, callback);
+        }
+        var owner = view;
+        var id = nativeRequestAnimationFrame.call(window, function (time) {
+            owner.frames.delete(id);
+            callback(time);
+        });
+        owner.frames.add(id);
+        return id;
+    };
+
+    EventTarget.prototype.addEventListener = function (type, listener, options) {
+        if (tracking && (this === window || this === document)) {
+            if (readyCallbacks && (type === 'DOMContentLoaded' || type === 'load')) {
+                // The document is already loaded; run these once the view's scripts have
+                readyCallbacks.push(listener);
+                return;
+            }
+            view.listeners.push([this, type, listener, options]);
+        }
+        return nativeAddEventListener.call(this, type, listener, options);
+    };
+
+    function untracked(fn) {
+        tracking = false;
+        try {
+            fn();
+        } finally {
+            tracking = true;
+        }
+    }
+
+    function teardown(main) {
+        view.timeouts.forEach(function (id) { clearTimeout(id); });
+        view.intervals.forEach(function (id) { clearInterval(id); });
+        view.frames.forEach(function (id) { cancelAnimationFrame(id); });
+        view.listeners.forEach(function (entry) {
+            entry[0].removeEventListener(entry[1], entry[2], entry[3]);
+        });
+        main.querySelectorAll('audio, video').forEach(function (media) { media.pause(); });
+        view = newView();
+    }
+
+    function runScripts(container) {
+        readyCallbacks = [];
+        container.querySelectorAll('script').forEach(function (old) {
+            var script = document.createElement('script');
+            if (old.src) {
+                script.src = old.src;
+                script.async = false;
+            } else {
+                // Each view runs in its own scope so revisiting a page cannot redeclare globals
+                script.text = '(function () {\n' + old.textContent + '\n}).call(window);';
+            }
+            old.replaceWith(script);
+        });
+        var callbacks = readyCallbacks;
+        readyCallbacks = null;
+        callbacks.forEach(function (callback) {
+            try {
+                callback.call(document, new Event('DOMContentLoaded'));
+            } catch (error) {
+                console.error(error);
+            }
+        });
+    }
+
+    function hideFlashMessages(root) {
+        untracked(function () {
+            root.querySelectorAll('.flash-message').forEach(function (message) {
+                setTimeout(function () {
+                    message.style.opacity = '0';
+                    message.style.transform = 'translateY(-100%)';
+                    setTimeout(function () { message.remove(); }, 300);
+                }, 3000);
+            });
+        });
+    }
+
+    function isView(url) {
+        return url.origin === location.origin && views.indexOf(url.pathname) !== -1;
+    }
+
+    function fetchView(href) {
+        var entry = prefetched.get(href);
+        if (entry && Date.now() - entry.time < PREFETCH_TTL) {
+            prefetched.delete(href);
+            return entry.promise;
+        }
+        return request(href);
+    }
+
+    function request(href) {
+        return fetch(href, {credentials: 'same-origin', headers: {'X-MindMoves-Shell': '1'}})
+            .then(function (response) {
+                var type = response.headers.get('Content-Type') || '';
+                if (!response.ok || response.redirected || type.indexOf('text/html') !== 0) {
+                    throw new Error('not a view');
+                }
+                return response.text();
+            });
+    }
+
+    function prefetch(event) {
+        var link = event.target.closest && event.target.closest('a[href]');
+        if (!link || link.target || link.hasAttribute('download')) {
+            return;
+        }
+        var url = new URL(link.href);
+        if (!isView(url) || url.href === location.href) {
+            return;
+        }
+        var entry = prefetched.get(url.href);
+        if (!entry || Date.now() - entry.time >= PREFETCH_TTL) {
+            var promise = request(url.href);
+            promise.catch(function () { prefetched.delete(url.href); });
+            prefetched.set(url.href, {promise: promise, time: Date.now()});
+        }
+    }
+
+    function show(href, html) {
+        var doc = new DOMParser().parseFromString(html, 'text/html');
+        var source = doc.querySelector('main') || doc.body;
+        var main = document.querySelector('main');
+        teardown(main);
+        document.title = doc.title;
+        main.innerHTML = source.innerHTML;
+        window.scrollTo(0, 0);
+        hideFlashMessages(main);
+        runScripts(main);
+    }
+
+    function navigate(href, push) {
+        return fetchView(href).then(function (html) {
+            if (push) {
+                history.pushState({shell: true}, '', href);
+            }
+            show(href, html);
+        }).catch(function () {
+            location.href = href;
+        });
+    }
+
+    function onClick(event) {
+        if (event.defaultPrevented || event.button !== 0 ||
+                event.metaKey || event.ctrlKey || event.shiftKey || event.altKey) {
+            return;
+        }
+        var link = event.target.closest && event.target.closest('a[href]');
+        if (!link || link.target || link.hasAttribute('download')) {
+            return;
+        }
+        var url = new URL(link.href);
+        if (!isView(url) || (url.hash && url.pathname === location.pathname)) {
+            return;
+        }
+        event.preventDefault();
+        navigate(url.href, true);
+    }
+
+    // Page chrome (menu, flash messages) set up by base.html lives as long as
+    // the document, so it is never torn down with a view
+    window.MindMovesShell = {
+        chrome: function (init) {
+            nativeAddEventListener.call(document, 'DOMContentLoaded', function () {
+                untracked(init);
+            });
+        }
+    };
+
+    nativeAddEventListener.call(document, 'DOMContentLoaded', function () {
+        untracked(function () {
+            views = (document.body.dataset.shellViews || '').split(' ').filter(Boolean);
+            if (!views.length || !window.fetch || !window.history.pushState) {
+                return;
+            }
+            history.replaceState({shell: true}, '');
+            document.addEventListener('click', onClick);
+            document.addEventListener('mouseover', prefetch);
+            document.addEventListener('focusin', prefetch);
+            document.addEventListener('touchstart', prefetch, {passive: true});
+            window.addEventListener('popstate', function (event) {
+                if (event.state && event.state.shell) {
+                    navigate(location.href, false);
+                }
+            });
+        });
+    });
+}());
@@ -0,0 +1,319 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no fcntl
+    fcntl = None
+
+from app.games import decode_user, encode_user
+from app.requestlog import phase
+from app.serializers import FORMAT_VERSION, JsonSerializer, MAGIC, loads
+
+_USERS_ARRAY_START = re.compile(r'"users"\s*:\s*\[')
+
+
+class UnreadableStoreError(Exception):
+    """User data exists but cannot be decoded; it must not be overwritten"""
+
+
+def atomic_write(path, data, mode=0o644):
+    """Write `data` (str or bytes) to `path` through a temp file and rename.
+
+    Readers see either the old or the new file, never a partial one.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on `path` (created if missing)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class FileUserStore:
+    """All users in a single document: {"format_version": 2, "users": [...]}"""
+
+    def __init__(self, path, serializer=None):
+        self.path = path
+        self.serializer = serializer or JsonSerializer()
+        self._lock = threading.RLock()
+        self._cache_key = None
+        self._by_name = {}
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock, file_lock(self.path + '.lock'):
+            yield
+
+    def load_all(self):
+        """Load every user from the file; a missing file is an empty store"""
+        try:
+            with phase('users_load'), open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        try:
+            return [decode_user(user) for user in loads(data)['users']]
+        except (ValueError, KeyError, TypeError) as e:
+            # Returning [] here would let the next add/update replace every user
+            raise UnreadableStoreError(f'Cannot read {self.path}: {e}') from e
+
+    def save_all(self, users):
+        """Replace the file with `users`"""
+        with phase('users_save'):
+            atomic_write(self.path, self.serializer.dumps({'format_version': FORMAT_VERSION,
+                                                           'users': [encode_user(u) for u in users]}))
+        self._cache_key = None
+
+    def iter_users(self, chunk_size=65536):
+        """Yield users one at a time without loading the whole file into memory"""
+        decoder = json.JSONDecoder()
+        try:
+            with open(self.path, 'rb') as f:
+                binary = f.read(len(MAGIC)) == MAGIC
+            f = open(self.path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        if binary:
+            # Binary formats cannot be decoded incrementally
+            f.close()
+            yield from self.load_all()
+            return
+        with f:
+            buffer = ''
+            start = None
+            while start is None:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                buffer += chunk
+                match = _USERS_ARRAY_START.search(buffer)
+                if match:
+                    start = match.end()
+            buffer = buffer[start:]
+            position = 0
+            eof = False
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position < len(buffer) and buffer[position] == ']':
+                    return
+                try:
+                    if position == len(buffer):
+                        raise ValueError('need more data')
+                    user, position = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    if eof:
+                        return
+                    chunk = f.read(chunk_size)
+                    eof = not chunk
+                    buffer = buffer[position:] + chunk
+                    position = 0
+                    continue
+                yield decode_user(user)
+
+    def _users_by_name(self):
+        """Return a username -> user mapping, re-parsing only when the file changes"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._cache_key == key:
+                return self._by_name
+        by_name = {user['username']: user for user in self.load_all()}
+        with self._lock:
+            self._cache_key = key
+            self._by_name = by_name
+        return by_name
+
+    def prime(self):
+        """Parse the file ahead of the first request and return the user count"""
+        return len(self._users_by_name())
+
+    def get(self, username):
+        """Return a copy of the user's record, or None"""
+        user = self._users_by_name().get(username)
+        # Callers may modify the returned dict, so never hand out the cached one
+        return copy.deepcopy(user) if user else None
+
+    def add(self, user):
+        """Store a new user; returns False if the username is taken"""
+        with self._write_lock():
+            users = self.load_all()
+            if any(u['username'] == user['username'] for u in users):
+                return False
+            users.append(user)
+            self.save_all(users)
+            return True
+
+    def update(self, username, mutate):
+        """Apply `mutate(user)` to one user and save; returns False if not found"""
+        with self._write_lock():
+            users = self.load_all()
+            user = next((u for u in users if u['username'] == username), None)
+            if user is None:
+                return False
+            mutate(user)
+            self.save_all(users)
+            return True
+
+
+class ShardedUserStore:
+    """One small JSON file per user under hashed subdirectories.
+
+    Layout::
+
+        <root>/index          one JSON-encoded username per line
+        <root>/ab/<sha1>.json the user's record
+        <root>/ab/<sha1>.lock per-user lock file
+
+    Writes take only the owning user's lock and rewrite only that user's
+    file, so concurrent saves for different users never contend.
+    """
+
+    def __init__(self, root, serializer=None):
+        self.root = root
+        self.serializer = serializer or JsonSerializer()
+        self.index_path = os.path.join(root, 'index')
+        self._index_lock = threading.Lock()
+        # username -> [lock, holders + waiters]; dropped when the last one leaves
+        self._user_locks = {}
+        self._user_locks_guard = threading.Lock()
+
+    def _user_path(self, username, ext='.json'):
+        digest = hashlib.sha1(username.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, digest[:2], digest + ext)
+
+    @contextmanager
+    def _user_lock(self, username):
+        """Hold the user's own lock: a thread lock for this process, the lock file for others"""
+        with self._user_locks_guard:
+            entry = self._user_locks.setdefault(username, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0], file_lock(self._user_path(username, '.lock')):
+                yield
+        finally:
+            with self._user_locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._user_locks[username]
+
+    def _read(self, username):
+        try:
+            with phase('users_load'), open(self._user_path(username), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            return decode_user(loads(data))
+        except (ValueError, TypeError) as e:
+            raise UnreadableStoreError(f'Cannot read {self._user_path(username)}: {e}') from e
+
+    def _write(self, user):
+        with phase('users_save'):
+            atomic_write(self._user_path(user['username']), self.serializer.dumps(encode_user(user)))
+
+    def usernames(self):
+        """Yield every username from the index"""
+        try:
+            with open(self.index_path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except FileNotFoundError:
+            return
+
+    def iter_users(self):
+        """Yield users one at a time in registration order"""
+        for username in self.usernames():
+            user = self._read(username)
+            if user is not None:
+                yield user
+
+    def load_all(self):
+        """Load every user"""
+        return list(self.iter_users())
+
+    def save_all(self, users):
+        """Replace the whole store with `users`"""
+        with self._index_lock, file_lock(self.index_path + '.lock'):
+            previous = set(self.usernames())
+            names = []
+            for user in users:
+                with self._user_lock(user['username']):
+                    self._write(user)
+                names.append(user['username'])
+            atomic_write(self.index_path, ''.join(json.dumps(name) + '\n' for name in names))
+            for username in previous.difference(names):
+                with self._user_lock(username):
+                    try:
+                        os.remove(self._user_path(username))
+                    except FileNotFoundError:
+                        pass
+
+    def prime(self):
+        """Read the index ahead of the first request and return the user count"""
+        return sum(1 for _ in self.usernames())
+
+    def get(self, username):
+        """Return the user's record, or None"""
+        if not username:
+            return None
+        return self._read(username)
+
+    def add(self, user):
+        """Store a new user; returns False if the username is taken"""
+        username = user['username']
+        with self._index_lock, file_lock(self.index_path + '.lock'):
+            with self._user_lock(username):
+                if os.path.exists(self._user_path(username)):
+                    return False
+                self._write(user)
+            with open(self.index_path, 'a') as f:
+                f.write(json.dumps(username) + '\n')
+        return True
+
+    def update(self, username, mutate):
+        """Apply `mutate(user)` to one user and save; returns False if not found"""
+        with self._user_lock(username):
+            user = self._read(username)
+            if user is None:
+                return False
+            mutate(user)
+            self._write(user)
+            return True
+
+
+def copy_users(source, target):
+    """Copy every user from one store to another, returning the count"""
+    users = list(source.iter_users())
+    target.save_all(users)
+    return len(users)
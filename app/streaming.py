@@ -0,0 +1,39 @@
+from flask import Response, current_app, get_flashed_messages, render_template, session, stream_with_context
+
+# Jinja yields a chunk per template fragment; group them so the server does
+# not issue a write for every few bytes
+BUFFER_SIZE = 8192
+
+
+def iter_flushed(chunks, flush_after='</head>', buffer_size=BUFFER_SIZE):
+    """Send everything up to `flush_after` at once, then the rest in buffer_size pieces"""
+    pending = []
+    size = 0
+    head_sent = False
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if (not head_sent and flush_after in chunk) or size >= buffer_size:
+            head_sent = head_sent or flush_after in chunk
+            yield ''.join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield ''.join(pending)
+
+
+def stream_page(template_name, **context):
+    """Render a page as a stream so the browser can fetch <head> assets while the body renders.
+
+    Anonymous pages are identical for every visitor and stay buffered, so
+    compression can cache them; STREAM_PAGES turns streaming off entirely.
+    """
+    if not current_app.config['STREAM_PAGES'] or not session.get('username'):
+        return render_template(template_name, **context)
+    # The session is saved before the body streams, so pop flashed messages now;
+    # the template then reads them from the request context
+    get_flashed_messages()
+    template = current_app.jinja_env.get_template(template_name)
+    current_app.update_template_context(context)
+    return Response(stream_with_context(iter_flushed(template.generate(context))), mimetype='text/html',
+                    headers={'X-Accel-Buffering': 'no'})
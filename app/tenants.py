@@ -0,0 +1,59 @@
+import threading
+
+from flask import current_app, has_request_context, request
+
+EXTENSION_KEY = 'mindmoves_tenants'
+
+DEFAULT_TENANT = 'default'
+
+# Settings a TENANTS entry may override; everything else is shared by all tenants
+TENANT_KEYS = ('USERS_STORAGE', 'USERS_FILE', 'USERS_DIR', 'USERS_SERIALIZER', 'ADMIN_USERS')
+
+
+def init_tenants(app):
+    """Create the app's store registry; each tenant's stores keep their own cache and locks"""
+    unknown = {key for settings in app.config['TENANTS'].values() for key in settings} - set(TENANT_KEYS) - {'hosts'}
+    if unknown:
+        raise ValueError(f'Unsupported tenant settings: {", ".join(sorted(unknown))}')
+    app.extensions[EXTENSION_KEY] = {'stores': {}, 'lock': threading.Lock()}
+
+
+def tenant_for_host(host):
+    """Return the tenant serving `host` (port ignored), or the default tenant"""
+    host = host.split(':')[0].lower()
+    for name, settings in current_app.config['TENANTS'].items():
+        if host in (h.lower() for h in settings.get('hosts', ())):
+            return name
+    return DEFAULT_TENANT
+
+
+def current_tenant():
+    """Return the tenant for the current request, or the default outside requests"""
+    if not has_request_context():
+        return DEFAULT_TENANT
+    tenant = request.environ.get('mindmoves.tenant')
+    if tenant is None:
+        tenant = request.environ['mindmoves.tenant'] = tenant_for_host(request.host)
+    return tenant
+
+
+def tenant_names():
+    """Return the default tenant followed by every configured one"""
+    return [DEFAULT_TENANT] + [name for name in current_app.config['TENANTS'] if name != DEFAULT_TENANT]
+
+
+def tenant_setting(key, tenant=None):
+    """Return a setting for `tenant` (default: the current one), falling back to app config"""
+    tenant = current_tenant() if tenant is None else tenant
+    settings = current_app.config['TENANTS'].get(tenant, {})
+    return settings[key] if key in settings else current_app.config.get(key)
+
+
+def tenant_store(tenant, key, factory):
+    """Return the store registered under (tenant, key), creating it with `factory()`"""
+    registry = current_app.extensions[EXTENSION_KEY]
+    with registry['lock']:
+        store = registry['stores'].get((tenant, key))
+        if store is None:
+            store = registry['stores'][(tenant, key)] = factory()
+    return store
@@ -0,0 +1,131 @@
+import bisect
+import threading
+import time
+
+from flask import current_app
+
+from app.events import UserRegistered, subscribe
+from app.tenants import current_tenant
+
+EXTENSION_KEY = 'mindmoves_user_index'
+
+# Sorts after any character a prefix can continue with
+_PREFIX_END = '\U0010ffff'
+
+FIELDS = ('username', 'first_name')
+
+
+class UserIndex:
+    """Sorted (casefolded key, username) lists for prefix search on each field.
+
+    Only names are held, so a page of results never touches the user files.
+    """
+
+    building = False
+
+    def __init__(self, users=()):
+        self.built_at = time.time()
+        self._keys = {field: [] for field in FIELDS}
+        self._names = {}
+        self._lock = threading.Lock()
+        for user in users:
+            self._insert(user)
+        for keys in self._keys.values():
+            keys.sort()
+
+    def _insert(self, user, sort=False):
+        username = user['username']
+        if username in self._names:
+            return
+        self._names[username] = user.get('first_name') or ''
+        for field in FIELDS:
+            entry = ((user.get(field) or '').casefold(), username)
+            if sort:
+                bisect.insort(self._keys[field], entry)
+            else:
+                self._keys[field].append(entry)
+
+    def add(self, user):
+        """Index a newly registered user"""
+        with self._lock:
+            self._insert(user, sort=True)
+
+    def __len__(self):
+        return len(self._names)
+
+    def search(self, prefix='', field='username', offset=0, limit=50):
+        """Return (total matches, [(username, first_name)]) for one page"""
+        keys = self._keys[field]
+        prefix = prefix.casefold()
+        with self._lock:
+            lo = bisect.bisect_left(keys, (prefix,))
+            hi = bisect.bisect_left(keys, (prefix + _PREFIX_END,))
+            page = keys[lo + offset:min(hi, lo + offset + limit)]
+            return hi - lo, [(username, self._names[username]) for _, username in page]
+
+
+def init_user_index(app):
+    app.extensions[EXTENSION_KEY] = {'indexes': {}, 'building': set(), 'lock': threading.Lock()}
+    subscribe(app, UserRegistered, index_user)
+
+
+def build_index(tenant=None):
+    """Scan the tenant's users into a fresh index and install it"""
+    from app.auth import get_store
+
+    tenant = current_tenant() if tenant is None else tenant
+    index = UserIndex(get_store(tenant).iter_users())
+    state = current_app.extensions[EXTENSION_KEY]
+    with state['lock']:
+        state['indexes'][tenant] = index
+    return index
+
+
+def _build_in_background(app, tenant):
+    try:
+        with app.app_context():
+            build_index(tenant)
+    except Exception:
+        app.logger.exception('Rebuilding the user index for %s failed', tenant)
+    finally:
+        state = app.extensions[EXTENSION_KEY]
+        with state['lock']:
+            state['building'].discard(tenant)
+
+
+def start_rebuild(app, tenant):
+    """Rebuild the tenant's index on a background thread unless one is already running"""
+    state = app.extensions[EXTENSION_KEY]
+    with state['lock']:
+        if tenant in state['building']:
+            return None
+        state['building'].add(tenant)
+    thread = threading.Thread(target=_build_in_background, args=(app, tenant),
+                              name=f'mindmoves-user-index-{tenant}', daemon=True)
+    thread.start()
+    return thread
+
+
+def get_index(tenant=None):
+    """Return the tenant's index, rebuilding it in the background once older than USER_INDEX_MAX_AGE.
+
+    Requests never scan the users: the old index is served until the new
+    one is installed, and before the first build (normally done by warm-up)
+    an empty index with `building` set. Users registered by this process
+    are added as they register; the rebuild picks up other workers' ones.
+    """
+    tenant = current_tenant() if tenant is None else tenant
+    index = current_app.extensions[EXTENSION_KEY]['indexes'].get(tenant)
+    if index is None or time.time() - index.built_at > current_app.config['USER_INDEX_MAX_AGE']:
+        start_rebuild(current_app._get_current_object(), tenant)
+    if index is None:
+        index = UserIndex()
+        index.building = True
+    return index
+
+
+def index_user(event):
+    """Add a newly registered user to their tenant's index, if it is built"""
+    index = current_app.extensions[EXTENSION_KEY]['indexes'].get(event.tenant)
+    if index is not None:
+        index.add({'username': event.username, 'first_name': event.first_name})
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from flask import request
+
+from app.auth import get_store
+from app.tenants import tenant_names
+from app.userindex import build_index
+
+EXTENSION_KEY = 'mindmoves_warmup'
+
+_start_lock = threading.Lock()
+
+
+def warm_up(app):
+    """Compile templates, parse and index every tenant's users and open a session once.
+
+    Returns the time in milliseconds spent on each step and marks the app
+    ready for the /healthz readiness check.
+    """
+    state = app.extensions.setdefault(EXTENSION_KEY, {'ready': False, 'timings': {}})
+    timings = {}
+
+    started = time.perf_counter()
+    templates = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in templates:
+        app.jinja_env.get_template(name)
+    timings['templates'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with app.app_context():
+        for tenant in tenant_names():
+            get_store(tenant).prime()
+            build_index(tenant)
+    timings['users'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with app.test_request_context('/'):
+        app.session_interface.open_session(app, request)
+    timings['session'] = (time.perf_counter() - started) * 1000
+
+    state['timings'] = {name: round(ms, 2) for name, ms in timings.items()}
+    state['templates'] = len(templates)
+    state['ready'] = True
+    app.logger.info('Warm-up finished: %s', state['timings'])
+    return state
+
+
+def start_warm_up(app):
+    """Warm the app on a background thread so startup is not blocked; only the first call starts one"""
+    with _start_lock:
+        state = app.extensions.setdefault(EXTENSION_KEY, {'ready': False, 'timings': {}})
+        thread = state.get('thread')
+        if thread is None:
+            thread = state['thread'] = threading.Thread(target=warm_up, args=(app,), name='mindmoves-warmup',
+                                                        daemon=True)
+            thread.start()
+    return thread
+
+
+def is_ready(app):
+    """Return True once warm-up has completed for this app"""
+    return app.extensions.get(EXTENSION_KEY, {}).get('ready', False)
@@ -1,6 +1,6 @@
 from app import create_app
 
-app = create_app()
+app = create_app({'WARMUP_ON_START': True})
 
 if __name__ == "__main__":
     app.run(debug=False, port=5002)
\ No newline at end of file
@@ -70,6 +70,14 @@ def logged_in_client(client, test_user):
         sess['user'] = test_user['username']
     return client
 
+@pytest.fixture
+def login(client):
+    """Log the test client in as a user (testuser by default)."""
+    def login(username='testuser'):
+        with client.session_transaction() as sess:
+            sess['username'] = username
+    return login
+
 @pytest.fixture
 def mock_session():
     """Create a mock session for testing."""
@@ -0,0 +1,93 @@
+import time
+
+from app.auth import register_user, save_game_score
+from app.events import EXTENSION_KEY as EVENTS_KEY
+from app.userindex import EXTENSION_KEY as INDEX_KEY, UserIndex, build_index, get_index
+
+
+def login_admin(app, client):
+    app.config['ADMIN_USERS'] = ['testuser']
+    with app.app_context():
+        build_index()
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+
+
+def test_index_prefix_search_is_case_insensitive():
+    """Test prefix search on both fields, with totals and paging."""
+    index = UserIndex([
+        {'username': 'alice', 'first_name': 'Alice'},
+        {'username': 'alfred', 'first_name': 'Bob'},
+        {'username': 'bert', 'first_name': 'Albert'},
+    ])
+    assert index.search('AL') == (2, [('alfred', 'Bob'), ('alice', 'Alice')])
+    assert index.search('al', 'first_name') == (2, [('bert', 'Albert'), ('alice', 'Alice')])
+    assert index.search('', offset=1, limit=1) == (3, [('alice', 'Alice')])
+    index.add({'username': 'alma', 'first_name': 'Alma'})
+    assert index.search('al') == (3, [('alfred', 'Bob'), ('alice', 'Alice'), ('alma', 'Alma')])
+
+
+def test_registered_users_are_searchable(app, client):
+    """Test the console finds users registered after the index was built."""
+    login_admin(app, client)
+    assert b'testuser' in client.get('/admin/users?q=test').data
+    with app.test_request_context():
+        register_user('Zelda', 'zed', 'TestPass123!', 'Q?', 'a')
+    app.extensions[EVENTS_KEY].drain()
+    html = client.get('/admin/users?q=z').data.decode()
+    assert 'zed' in html and 'Zelda' in html
+    assert 'zed' in client.get('/admin/users?q=zel&by=first_name').data.decode()
+
+
+def test_stale_index_is_served_while_rebuilding(app):
+    """Test requests get the old index and a background thread replaces it."""
+    with app.app_context():
+        stale = build_index()
+        stale.built_at -= app.config['USER_INDEX_MAX_AGE'] + 1
+        register_user('Zelda', 'zed', 'TestPass123!', 'Q?', 'a')
+        assert get_index() is stale
+        state = app.extensions[INDEX_KEY]
+        while state['building']:
+            time.sleep(0.01)
+        fresh = get_index()
+    assert fresh is not stale and fresh.search('z') == (1, [('zed', 'Zelda')])
+
+
+def test_console_says_when_the_index_is_not_built_yet(app, client):
+    """Test the first request does not wait for the scan."""
+    login_admin(app, client)
+    app.extensions[INDEX_KEY]['indexes'].clear()
+    assert b'still being loaded' in client.get('/admin/users').data
+    while app.extensions[INDEX_KEY]['building']:
+        time.sleep(0.01)
+    html = client.get('/admin/users').data.decode()
+    assert 'testuser' in html and 'still being loaded' not in html
+
+
+def test_users_are_paginated(app, client):
+    """Test the listing shows ADMIN_PAGE_SIZE users per page."""
+    login_admin(app, client)
+    app.config['ADMIN_PAGE_SIZE'] = 1
+    with app.test_request_context():
+        register_user('Zelda', 'zed', 'TestPass123!', 'Q?', 'a')
+    app.extensions[EVENTS_KEY].drain()
+    first = client.get('/admin/users').data.decode()
+    assert 'Page 1 of 2' in first and 'testuser' in first and 'zed' not in first
+    assert 'zed' in client.get('/admin/users?page=2').data.decode()
+
+
+def test_user_drill_down(app, client):
+    """Test an admin can see a patient's history."""
+    save_game_score('testuser', 'Speed Game', 20, 25)
+    login_admin(app, client)
+    html = client.get('/admin/users/testuser').data.decode()
+    assert 'Speed Game' in html and '20 / 25' in html
+    assert client.get('/admin/users/nobody').status_code == 404
+
+
+def test_console_is_admin_only(client):
+    """Test patients cannot open the admin console."""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    assert client.get('/admin/users').status_code == 403
+    assert client.get('/admin/users/testuser').status_code == 403
@@ -0,0 +1,98 @@
+import json
+import threading
+from app.capture import anonymize, init_capture
+from app.replay import Replayer, build_report, format_report, load_capture
+from app.server import PooledWSGIServer, listen
+
+
+def capture_app(app, tmp_path):
+    app.config['CAPTURE_FILE'] = str(tmp_path / 'capture.ndjson')
+    init_capture(app)
+    return app.config['CAPTURE_FILE']
+
+
+def test_requests_are_captured_anonymously(app, client, tmp_path):
+    """Test each request is logged with a pseudonym instead of the username."""
+    path = capture_app(app, tmp_path)
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    response = client.get('/speed')
+    assert 'Content-Length' not in response.headers
+    response.get_data()
+    response.close()
+    client.post('/save_score', json={'game_type': 'Speed Game', 'score': 20, 'total': 25})
+    client.get('/reports/testuser/progress.csv').close()
+
+    with app.test_request_context():
+        pseudonym = anonymize('testuser')
+    records = load_capture(path)
+    assert [record['e'] for record in records] == ['main.speed', 'main.save_score', 'main.progress_report_csv']
+    assert all(record['u'] == pseudonym for record in records)
+    assert records[1]['b'] == {'game_type': 'Speed Game', 'score': 20, 'total': 25}
+    assert 'b' not in records[0]
+    assert records[2]['p'] == f'/reports/{{u:{pseudonym}}}/progress.csv'
+    assert records[0]['sb'] is None and records[0]['ms'] > 0
+    assert 'testuser' not in open(path).read()
+
+
+def test_capture_replaces_only_the_username_segment(app, client, tmp_path):
+    """Test a username that also occurs earlier in the path is replaced only where it is the argument."""
+    path = capture_app(app, tmp_path)
+    with client.session_transaction() as sess:
+        sess['username'] = 're'
+    client.get('/reports/re/progress.csv?username=re&days=7').close()
+
+    with app.test_request_context():
+        pseudonym = anonymize('re')
+    assert load_capture(path)[0]['p'] == f'/reports/{{u:{pseudonym}}}/progress.csv?days=7'
+
+
+def test_capture_skips_unsampled_requests(app, client, tmp_path):
+    """Test CAPTURE_SAMPLE_RATE=0 records nothing."""
+    path = capture_app(app, tmp_path)
+    app.config['CAPTURE_SAMPLE_RATE'] = 0
+    client.get('/about')
+    assert not (tmp_path / 'capture.ndjson').exists() or load_capture(path) == []
+
+
+def test_replay_against_a_live_server(app, tmp_path):
+    """Test captured traffic replays with replay accounts and reports per endpoint."""
+    capture = tmp_path / 'capture.ndjson'
+    records = [
+        {'t': 0.0, 'm': 'GET', 'p': '/about', 'e': 'main.about', 'u': None, 'rb': 0, 's': 200, 'sb': 1, 'ms': 5},
+        {'t': 0.1, 'm': 'POST', 'p': '/login', 'e': 'main.login', 'u': None, 'rb': 9, 's': 302, 'sb': 1, 'ms': 90},
+        {'t': 0.2, 'm': 'POST', 'p': '/save_score', 'e': 'main.save_score', 'u': 'abc123', 'rb': 50, 's': 200,
+         'sb': 1, 'ms': 8, 'b': {'game_type': 'Speed Game', 'score': 20, 'total': 25}},
+        {'t': 0.3, 'm': 'GET', 'p': '/reports/{u:abc123}/progress.csv', 'e': 'main.progress_report_csv',
+         'u': 'abc123', 'rb': 0, 's': 200, 'sb': 1, 'ms': 4},
+    ]
+    capture.write_text(''.join(json.dumps(record) + '\n' for record in records))
+
+    sock = listen('127.0.0.1', 0)
+    server = PooledWSGIServer(app, sock, threads=4, max_requests=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        report = Replayer(f'http://127.0.0.1:{sock.getsockname()[1]}', speed=10).run(load_capture(capture))
+    finally:
+        server.stop()
+        thread.join(timeout=5)
+        sock.close()
+
+    assert report['requests'] == 3 and report['skipped'] == 1
+    assert report['errors'] == 0
+    assert report['endpoints']['main.save_score']['status_changed'] == 0
+    assert report['endpoints']['main.progress_report_csv']['status_changed'] == 0
+    with app.app_context():
+        from app.auth import get_user
+        assert get_user('replay-abc123')['game_history'][0]['score'] == 20
+
+
+def test_report_deltas_against_baseline():
+    """Test the text report shows p95 and error deltas against an earlier run."""
+    record = {'e': 'main.about', 's': 200, 'ms': 5}
+    baseline = build_report([(record, 200, 10.0, 0)])
+    report = build_report([(record, 500, 25.0, 0)])
+    line = format_report(report, baseline)[-1]
+    assert line.split()[0] == 'main.about'
+    assert '+15.0' in line and line.rstrip().endswith('+1')
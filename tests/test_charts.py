@@ -0,0 +1,71 @@
+import re
+import time
+from app import charts, reports
+from app.auth import save_game_score
+from app.games import GameRecord
+
+
+def test_sparkline_is_served_and_cached(client, monkeypatch, login):
+    """Test charts render once per history version and revalidate with ETags."""
+    save_game_score('testuser', 'Speed Game', 20, 25)
+    login()
+    calls = []
+    original = reports.CHART_KINDS['sparkline']
+    monkeypatch.setitem(reports.CHART_KINDS, 'sparkline',
+                        lambda games, name: calls.append(1) or original(games, name))
+
+    first = client.get('/charts/testuser/speed/sparkline.svg')
+    assert first.status_code == 200
+    assert first.mimetype == 'image/svg+xml'
+    assert first.data.startswith(b'<svg')
+    assert client.get('/charts/testuser/speed/sparkline.svg').data == first.data
+    assert len(calls) == 1
+    assert client.get('/charts/testuser/speed/sparkline.svg',
+                      headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    save_game_score('testuser', 'Speed Game', 25, 25)
+    second = client.get('/charts/testuser/speed/sparkline.svg')
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert len(calls) == 2
+
+
+def test_trend_chart_and_access(client, login):
+    """Test the trend chart draws a trend line and is private to its owner."""
+    save_game_score('testuser', 'Memory Master', 2, 8)
+    save_game_score('testuser', 'Memory Master', 6, 8)
+    login()
+    assert client.get('/charts/testuser/memory/trend.svg').data.startswith(b'<svg')
+    assert client.get('/charts/testuser/nosuchgame/trend.svg').status_code == 404
+    assert client.get('/charts/testuser/memory/pie.svg').status_code == 404
+    login('someoneelse')
+    assert client.get('/charts/testuser/memory/trend.svg').status_code == 403
+
+
+def test_profile_links_sparklines(client, login):
+    """Test the profile shows a sparkline for each game played."""
+    save_game_score('testuser', 'Speed Game', 20, 25)
+    login()
+    html = client.get('/profile').data.decode()
+    assert '/charts/testuser/speed/sparkline.svg' in html
+
+
+def test_trend_line_follows_scores():
+    """Test the trend line slopes upward for improving scores."""
+    games = [GameRecord.create('Memory Master', score, 8, 1700000000 + day * 86400)
+             for day, score in enumerate([2, 3, 5, 6])]
+    svg = charts.line_chart(games, trend=True)
+    y1, y2 = re.search(r'y1="([\d.]+)" y2="([\d.]+)" stroke="#F472B6"', svg).groups()
+    assert float(y2) < float(y1)
+
+
+def test_long_histories_are_downsampled():
+    """Test charts keep at most two points per pixel column, peaks included."""
+    now = int(time.time())
+    games = [GameRecord.create('Speed Game', i % 101, 100, now + i) for i in range(20000)]
+    started = time.perf_counter()
+    svg = charts.sparkline(games)
+    assert time.perf_counter() - started < 1
+    points = re.search(r'points="([^"]*)"', svg).group(1).split()
+    assert len(points) <= 2 * 120
+    ys = [float(point.split(',')[1]) for point in points]
+    assert min(ys) == 2.0
@@ -0,0 +1,58 @@
+import gzip
+from app import compression
+
+
+def test_large_html_is_gzipped(client):
+    """Test game pages are gzip-encoded when the client accepts it."""
+    response = client.get('/speed', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'MindMoves' in gzip.decompress(response.data)
+    assert int(response.headers['Content-Length']) == len(response.data)
+
+
+def test_no_compression_without_accept_encoding(client):
+    """Test clients that do not accept gzip get the plain body."""
+    response = client.get('/speed')
+    assert 'Content-Encoding' not in response.headers
+    assert b'MindMoves' in response.data
+
+
+def test_small_responses_are_not_compressed(client):
+    """Test bodies under COMPRESS_MIN_SIZE are left alone."""
+    response = client.get('/healthz', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_anonymous_pages_reuse_cached_compression(app, client, monkeypatch):
+    """Test identical anonymous pages are compressed only once."""
+    calls = []
+    original = compression.compress
+    monkeypatch.setattr(compression, 'compress', lambda data, enc: calls.append(enc) or original(data, enc))
+    first = client.get('/speed', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/speed', headers={'Accept-Encoding': 'gzip'})
+    assert first.data == second.data
+    assert calls == ['gzip']
+
+
+def test_logged_in_pages_are_not_cached(app, client, monkeypatch):
+    """Test per-user pages are compressed fresh each time."""
+    app.config['STREAM_PAGES'] = False
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    calls = []
+    original = compression.compress
+    monkeypatch.setattr(compression, 'compress', lambda data, enc: calls.append(enc) or original(data, enc))
+    client.get('/speed', headers={'Accept-Encoding': 'gzip'})
+    client.get('/speed', headers={'Accept-Encoding': 'gzip'})
+    assert calls == ['gzip', 'gzip']
+
+
+def test_streamed_pages_are_compressed_incrementally(client):
+    """Test streamed pages are gzipped as they stream, without a Content-Length."""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    response = client.get('/speed', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert b'MindMoves' in gzip.decompress(response.data)
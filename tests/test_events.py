@@ -0,0 +1,54 @@
+import threading
+from app.auth import register_user, save_game_score, update_user_avatar, update_user_password
+from app.events import EXTENSION_KEY, AvatarChanged, EventBus, PasswordChanged, ScoreSaved, UserRegistered
+
+
+def record(app, *event_types):
+    seen = []
+    bus = app.extensions[EXTENSION_KEY]
+    for event_type in event_types:
+        bus.subscribe(event_type, seen.append)
+    return bus, seen
+
+
+def test_writes_publish_events(app):
+    """Test account and score writes publish their events after saving."""
+    bus, seen = record(app, ScoreSaved, UserRegistered, PasswordChanged, AvatarChanged)
+    with app.test_request_context():
+        save_game_score('testuser', 'Speed Game', 20, 25)
+        register_user('Zelda', 'zed', 'TestPass123!', 'Q?', 'a')
+        update_user_password('testuser', 'NewPass123!')
+        update_user_avatar('testuser', 'cat.png')
+        save_game_score('nobody', 'Speed Game', 1, 2)
+    bus.drain()
+    assert [type(event) for event in seen] == [ScoreSaved, UserRegistered, PasswordChanged, AvatarChanged]
+    assert seen[0].tenant == 'default' and seen[0].game.score == 20
+    assert seen[1].first_name == 'Zelda'
+
+
+def test_failing_handler_is_isolated(app):
+    """Test one handler raising does not stop the others."""
+    bus = EventBus(app, workers=1)
+    seen = []
+
+    def broken(event):
+        raise RuntimeError('boom')
+
+    bus.subscribe(PasswordChanged, broken)
+    bus.subscribe(PasswordChanged, seen.append)
+    bus.publish(PasswordChanged('default', 'testuser'))
+    bus.drain()
+    assert len(seen) == 1
+    assert bus.stats()['failed'] == 1 and bus.stats()['delivered'] == 1
+
+
+def test_full_queue_drops_instead_of_blocking(app):
+    """Test publishers give up after publish_timeout when handlers fall behind."""
+    bus = EventBus(app, workers=1, queue_size=1, publish_timeout=0.01)
+    release = threading.Event()
+    bus.subscribe(PasswordChanged, lambda event: release.wait(5))
+    for _ in range(4):
+        bus.publish(PasswordChanged('default', 'testuser'))
+    assert bus.stats()['dropped'] >= 1
+    release.set()
+    bus.drain()
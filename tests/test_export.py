@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+import pytest
+from app.auth import get_store, load_users, save_users
+
+
+@pytest.fixture
+def history_users(app):
+    """Store two users with game history in the test users file."""
+    users = load_users()
+    users[0]['game_history'] = [
+        {'game_type': 'Speed Game', 'score': 20, 'total': 25, 'date': '2025-04-01 10:00:00'},
+        {'game_type': 'Memory Master', 'score': 8, 'total': 10, 'date': '2025-04-03 10:00:00'},
+    ]
+    users.append({
+        'username': 'otheruser',
+        'first_name': 'Other',
+        'password': 'x',
+        'secret_question': 'q',
+        'secret_answer': 'y',
+        'game_history': [
+            {'game_type': 'Speed Game', 'score': 5, 'total': 9, 'date': '2025-05-01 09:00:00'},
+        ],
+    })
+    save_users(users)
+    return users
+
+
+@pytest.fixture
+def admin_client(app, client):
+    """Create a test client logged in as an admin."""
+    app.config['ADMIN_USERS'] = ['testuser']
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    return client
+
+
+def test_iter_users_streams_all_users(history_users):
+    """Test that the incremental reader yields every stored user."""
+    assert list(get_store().iter_users(chunk_size=16)) == load_users()
+
+
+def test_export_requires_admin(app, client):
+    """Test that non-admin users cannot export."""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    assert client.get('/admin/export').status_code == 403
+
+
+def test_export_ndjson_excludes_secrets(history_users, admin_client):
+    """Test the NDJSON export has one line per user and no credentials."""
+    response = admin_client.get('/admin/export?format=ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [line['username'] for line in lines] == ['testuser', 'otheruser']
+    assert 'password' not in lines[0]
+    assert 'secret_answer' not in lines[0]
+
+
+def test_export_csv_filters_by_date_and_game(history_users, admin_client):
+    """Test CSV export filters by date range and game type."""
+    response = admin_client.get('/admin/export?format=csv&since=2025-04-02&game_type=Speed+Game')
+    rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+    assert [(row['username'], row['score']) for row in rows] == [('otheruser', '5')]
+
+
+def test_export_rejects_bad_dates(admin_client):
+    """Test that malformed dates are rejected."""
+    assert admin_client.get('/admin/export?since=April').status_code == 400
+
+
+def test_export_command(history_users, runner):
+    """Test the flask export command writes CSV rows."""
+    result = runner.invoke(args=['export', '--format', 'csv', '--until', '2025-04-02'])
+    assert result.exit_code == 0
+    assert result.output.splitlines()[1].startswith('testuser,Test,Speed Game,20,25')
+    assert len(result.output.splitlines()) == 2
@@ -0,0 +1,103 @@
+import copy
+import json
+from app.auth import get_user, load_users, save_game_score
+from app.games import GameRecord, decode_user, encode_user, resolve_game_type
+
+
+def test_registry_resolves_names_and_aliases():
+    """Test display names, keys and legacy aliases map to one interned id."""
+    assert resolve_game_type('Line Balance Master').id == 3
+    assert resolve_game_type('balance').id == 3
+    assert resolve_game_type('Line Balance').id == 3
+    assert resolve_game_type('speed game').name == 'Speed Game'
+    assert resolve_game_type('Test Game 7') is None
+
+
+def test_legacy_dict_records_are_compacted():
+    """Test legacy dict history decodes and re-encodes as compact lists."""
+    user = {'username': 'u', 'game_history': [
+        {'game_type': 'balance', 'score': 90, 'total': 100, 'date': '2025-04-03 19:16:07'},
+        {'game_type': 'Test Game 9', 'score': 9, 'total': 100, 'date': '2025-04-03 19:17:00'},
+    ]}
+    decoded = decode_user(copy.deepcopy(user))
+    first, second = decoded['game_history']
+    assert first.game_type == 'Line Balance Master'
+    assert first['date'] == '2025-04-03 19:16:07'
+    assert second.game_type == 'Test Game 9'
+
+    stored = encode_user(decoded)['game_history']
+    assert stored[0] == [3, 90, 100, first.timestamp]
+    assert stored[1][0] == 'Test Game 9'
+    assert len(json.dumps(stored)) < len(json.dumps(user['game_history'])) / 2
+
+
+def test_records_are_immutable_and_shared_by_copies():
+    """Test records cannot be changed and are not duplicated on deepcopy."""
+    record = GameRecord.create('Speed Game', 5, 6)
+    assert copy.deepcopy(record) is record
+    try:
+        record.score = 10
+    except AttributeError:
+        pass
+    assert record.score == 5
+
+
+def test_saved_scores_use_interned_ids(app):
+    """Test saved scores are stored compactly with integer timestamps."""
+    save_game_score('testuser', 'Memory Master', 7, 8)
+    with open(app.config['USERS_FILE']) as f:
+        stored = json.load(f)['users'][0]['game_history']
+    assert stored[0][:3] == [2, 7, 8]
+    assert isinstance(stored[0][3], int)
+    assert get_user('testuser')['game_history'][0].game_type == 'Memory Master'
+
+
+def test_save_score_rejects_unknown_game_type(client):
+    """Test /save_score validates game types against the registry."""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    response = client.post('/save_score', json={'game_type': 'Made Up', 'score': 1, 'total': 2})
+    assert response.status_code == 400
+    response = client.post('/save_score', json={'game_type': 'balance', 'score': 1, 'total': 2})
+    assert response.status_code == 200
+    assert load_users()[0]['game_history'][0].game_type == 'Line Balance Master'
+
+
+def test_save_score_rejects_impossible_scores(client):
+    """Test /save_score only accepts whole, non-negative scores against a positive total."""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    for score, total in ((-1, 10), (0, 0), (5, -1), (1.5, 10), ('5', 10), (True, 10), (5, None)):
+        response = client.post('/save_score', json={'game_type': 'Speed Game', 'score': score, 'total': total})
+        assert response.status_code == 400
+    assert load_users()[0].get('game_history', []) == []
+    response = client.post('/save_score', json={'game_type': 'Speed Game', 'score': 10, 'total': 10})
+    assert response.status_code == 200
+
+
+def test_save_score_accepts_what_the_games_send(client):
+    """Test the payloads the game pages post, including scores above their total, are saved."""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    payloads = [
+        {'game_type': 'Speed Game', 'score': 1430, 'total': 12},  # points against hits + misses
+        {'game_type': 'Line Balance Master', 'score': 165, 'total': 100},  # level bonus + time bonus
+        {'game_type': 'Memory Master', 'score': 0, 'total': 100},
+    ]
+    for payload in payloads:
+        assert client.post('/save_score', json=payload).status_code == 200
+    assert [game.score for game in load_users()[0]['game_history']] == [1430, 165, 0]
+
+
+def test_profile_sorts_by_timestamp(client):
+    """Test the profile lists the newest game first."""
+    save_game_score('testuser', 'Speed Game', 1, 2)
+    user_history = get_user('testuser')['game_history']
+    older = GameRecord(1, 11, 12, user_history[0].timestamp - 3600)
+    from app.auth import get_store
+    get_store().update('testuser', lambda user: user['game_history'].insert(0, older))
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    response = client.get('/profile')
+    html = response.data.decode()
+    assert html.index('<td>1</td>') < html.index('<td>11</td>')
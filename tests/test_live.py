@@ -0,0 +1,86 @@
+import json
+from app.live import EXTENSION_KEY, LiveHub, TooManySubscribers, event_stream
+from app.auth import save_game_score
+
+
+def test_slow_subscriber_drops_oldest_events():
+    """Test a full subscriber queue keeps the newest events."""
+    hub = LiveHub(queue_size=2, max_subscribers=10)
+    subscription = hub.subscribe('testuser')
+    for n in range(5):
+        hub.publish('testuser', ('score', n))
+    assert subscription.dropped == 3
+    assert [subscription.get(0), subscription.get(0), subscription.get(0)] == [('score', 3), ('score', 4), None]
+
+
+def test_subscriber_cap():
+    """Test the hub refuses subscribers beyond its cap and frees slots."""
+    hub = LiveHub(queue_size=2, max_subscribers=1)
+    subscription = hub.subscribe('a')
+    try:
+        hub.subscribe('b')
+        assert False, 'expected TooManySubscribers'
+    except TooManySubscribers:
+        pass
+    hub.unsubscribe(subscription)
+    assert hub.subscriber_count() == 0
+    hub.subscribe('b')
+
+
+def test_closing_the_hub_ends_open_streams():
+    """Test a stopping worker's streams return instead of holding their threads forever."""
+    hub = LiveHub(queue_size=2, max_subscribers=10)
+    stream = event_stream(hub, hub.subscribe('a'), heartbeat=60)
+    assert next(stream).startswith('retry:')
+    hub.close()
+    assert list(stream) == []
+    assert hub.subscriber_count() == 0
+    try:
+        hub.subscribe('b')
+        assert False, 'expected TooManySubscribers'
+    except TooManySubscribers:
+        pass
+
+
+def test_live_stream_receives_saved_scores(app, client, login):
+    """Test a saved score is pushed to the user's live stream."""
+    login()
+    response = client.get('/live/testuser', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    hub = app.extensions[EXTENSION_KEY]
+    assert hub.subscriber_count() == 1
+
+    save_game_score('testuser', 'Speed Game', 20, 25)
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    event = next(chunks).decode()
+    assert event.startswith('event: score\n')
+    data = json.loads(event.split('data: ', 1)[1])
+    assert data['username'] == 'testuser'
+    assert data['game_type'] == 'Speed Game'
+    assert data['score'] == 20
+
+    response.close()
+    assert hub.subscriber_count() == 0
+
+
+def test_live_stream_sends_heartbeats(app, client, login):
+    """Test an idle stream emits heartbeat comments."""
+    app.config['LIVE_HEARTBEAT_SECONDS'] = 0.01
+    login()
+    response = client.get('/live/testuser', buffered=False)
+    chunks = iter(response.response)
+    next(chunks)
+    assert next(chunks) == b': heartbeat\n\n'
+    response.close()
+
+
+def test_live_stream_is_owner_or_admin_only(app, client, login):
+    """Test other patients cannot watch someone's live stream."""
+    login('someoneelse')
+    assert client.get('/live/testuser').status_code == 403
+    app.config['ADMIN_USERS'] = ['someoneelse']
+    response = client.get('/live/testuser', buffered=False)
+    assert response.status_code == 200
+    response.close()
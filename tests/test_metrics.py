@@ -0,0 +1,52 @@
+import os
+from datetime import date, timedelta
+from app.auth import save_game_score
+from app.events import EXTENSION_KEY as EVENTS_KEY
+from app.metrics import HyperLogLog, get_metrics, metrics_path, summary
+
+
+def test_hyperloglog_estimates_distinct_counts():
+    """Test small and large cardinalities are estimated closely."""
+    small = HyperLogLog()
+    for n in range(50):
+        small.add(f'user{n % 10}')
+    assert small.count() == 10
+    large = HyperLogLog()
+    for n in range(20000):
+        large.add(f'user{n}')
+    assert abs(large.count() - 20000) < 20000 * 0.05
+    assert HyperLogLog.from_stored(large.to_stored()).registers == large.registers
+
+
+def test_summary_counts_active_users_plays_and_retention(app):
+    """Test DAU/WAU, plays per game and week-over-week retention."""
+    today = date(2024, 3, 14)
+    with app.app_context():
+        metrics = get_metrics('default')
+        last_week = (today - timedelta(days=8)).isoformat()
+        for name in ('ann', 'bob', 'cy', 'dee'):
+            metrics.record(last_week, name, 'Speed Game')
+        metrics.record(today.isoformat(), 'ann', 'Speed Game')
+        metrics.record(today.isoformat(), 'ann', 'Memory Master')
+        metrics.record((today - timedelta(days=1)).isoformat(), 'bob', None)
+        data = summary('default', today)
+    assert data['dau'] == 1
+    assert data['wau'] == 2
+    assert data['plays_per_game'] == {'Speed Game': 1, 'Memory Master': 1}
+    assert data['daily'][-2]['logins'] == 1
+    assert data['retention'] == 0.5
+
+
+def test_scores_and_logins_are_recorded_and_persisted(app, client, test_user):
+    """Test the event handlers feed the counters and flush them to disk."""
+    app.config['METRICS_FLUSH_EVERY'] = 2
+    client.post('/login', data={'username': test_user['username'], 'password': test_user['password']})
+    save_game_score('testuser', 'Speed Game', 5, 10)
+    app.extensions[EVENTS_KEY].drain()
+    with app.app_context():
+        assert os.path.exists(metrics_path('default'))
+    app.config['ADMIN_USERS'] = ['testuser']
+    data = client.get('/admin/metrics').get_json()
+    assert data['dau'] == 1
+    assert data['daily'][-1]['logins'] == 1
+    assert data['plays_per_game'] == {'Speed Game': 1}
@@ -0,0 +1,77 @@
+import os
+import pytest
+from app import create_app
+
+
+@pytest.fixture
+def profiling_app(tmp_path):
+    """Create an app with profiling enabled and a secret configured."""
+    return create_app({
+        'TESTING': True,
+        'PROFILING_ENABLED': True,
+        'PROFILING_SECRET': 'letmein',
+        'PROFILING_DIR': str(tmp_path / 'profiles'),
+        'PROFILING_MAX_FILES': 2,
+    })
+
+
+def test_profiling_disabled_installs_nothing():
+    """Test that a disabled profiler adds no request hooks or routes."""
+    app = create_app({'TESTING': True, 'PROFILING_ENABLED': False})
+    assert 'profiling' not in app.blueprints
+    assert not app.teardown_request_funcs
+
+
+def test_request_without_secret_is_not_profiled(profiling_app):
+    """Test that ordinary requests are not captured."""
+    response = profiling_app.test_client().get('/about')
+    assert response.status_code == 200
+    assert os.listdir(profiling_app.config['PROFILING_DIR']) == []
+
+
+def test_request_with_secret_header_is_profiled(profiling_app):
+    """Test that the secret header captures a .prof file listed on the index."""
+    client = profiling_app.test_client()
+    client.get('/about', headers={'X-MindMoves-Profile': 'letmein'})
+    files = os.listdir(profiling_app.config['PROFILING_DIR'])
+    assert len(files) == 1
+    assert files[0].endswith('.prof')
+    assert '-main.about-' in files[0]
+
+    response = client.get('/_profiles/', headers={'X-MindMoves-Profile': 'letmein'})
+    assert response.status_code == 200
+    assert b'main.about' in response.data
+
+
+def test_profiles_rotate(profiling_app):
+    """Test that only the newest PROFILING_MAX_FILES captures are kept."""
+    client = profiling_app.test_client()
+    for _ in range(4):
+        client.get('/about', headers={'X-MindMoves-Profile': 'letmein'})
+    assert len(os.listdir(profiling_app.config['PROFILING_DIR'])) == 2
+
+
+def test_profile_index_requires_admin_or_secret(profiling_app):
+    """Test that the index needs an admin session or the secret header."""
+    client = profiling_app.test_client()
+    assert client.get('/_profiles/').status_code == 302
+    assert client.get('/_profiles/', headers={'X-MindMoves-Profile': 'wrong'}).status_code == 302
+    # The secret is never taken from the query string, which ends up in logs and history
+    assert client.get('/_profiles/?secret=letmein').status_code == 302
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    assert client.get('/_profiles/').status_code == 403
+
+
+def test_admin_can_browse_and_download_profiles(profiling_app):
+    """Test that an admin opens the index and downloads a capture without the header."""
+    client = profiling_app.test_client()
+    client.get('/about', headers={'X-MindMoves-Profile': 'letmein'})
+    name = os.listdir(profiling_app.config['PROFILING_DIR'])[0]
+    profiling_app.config['ADMIN_USERS'] = ['testuser']
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    assert name.encode() in client.get('/_profiles/').data
+    response = client.get('/_profiles/' + name)
+    assert response.status_code == 200
+    assert 'attachment' in response.headers['Content-Disposition']
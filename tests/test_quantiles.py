@@ -0,0 +1,59 @@
+import json
+import os
+from app.auth import save_game_score
+from app.events import EXTENSION_KEY as EVENTS_KEY
+from app.quantiles import ScoreHistogram, get_sketches, sketch_path
+
+
+def test_histogram_rank_and_quantile():
+    """Test ranks and quantiles are accurate to the bin width."""
+    histogram = ScoreHistogram()
+    for value in range(100):
+        histogram.add(value)
+    assert abs(histogram.rank(50) - 50) < 1
+    assert abs(histogram.quantile(0.9) - 90) < 1
+    assert ScoreHistogram().rank(50) is None
+
+
+def test_histograms_merge_and_round_trip():
+    """Test merged histograms equal one fed every value, and survive storage."""
+    a, b, both = ScoreHistogram(), ScoreHistogram(), ScoreHistogram()
+    for value in (10, 20, 30):
+        a.add(value)
+        both.add(value)
+    for value in (40, 100, 120):
+        b.add(value)
+        both.add(value)
+    a.merge(b)
+    assert a.counts == both.counts and a.total == 6
+    assert ScoreHistogram(json.loads(json.dumps(a.to_stored()))).counts == a.counts
+
+
+def test_percentile_endpoint(app, client, login):
+    """Test the endpoint ranks a score against saved scores for that game."""
+    for score in (10, 20, 30, 40):
+        save_game_score('testuser', 'Line Balance', score, 100)
+    app.extensions[EVENTS_KEY].drain()
+    login()
+    data = client.get('/percentile?game_type=balance&score=35&total=100').get_json()
+    assert data['game_type'] == 'Line Balance Master'
+    assert data['count'] == 4 and data['percentile'] == 75.0
+    assert client.get('/percentile?game_type=nope&score=1&total=2').status_code == 400
+    assert client.get('/percentile?game_type=balance&score=1&total=0').status_code == 400
+    for score, total in (('nan', '1'), ('inf', '1'), ('1', 'nan'), ('1e308', '1e-308')):
+        assert client.get(f'/percentile?game_type=memory&score={score}&total={total}').status_code == 400
+
+
+def test_sketches_are_persisted_and_bootstrapped(app):
+    """Test pending scores flush to disk and a new process loads them."""
+    app.config['SKETCH_FLUSH_EVERY'] = 2
+    for score in (5, 6):
+        save_game_score('testuser', 'Speed Game', score, 10)
+    app.extensions[EVENTS_KEY].drain()
+    with app.app_context():
+        path = sketch_path('default')
+        assert os.path.exists(path)
+        with open(path) as f:
+            assert sum(json.load(f)['Speed Game'].values()) == 2
+        app.extensions['mindmoves_quantiles']['tenants'].clear()
+        assert get_sketches('default').view('Speed Game').total == 2
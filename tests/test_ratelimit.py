@@ -0,0 +1,100 @@
+import threading
+import pytest
+from app import create_app
+from app.ratelimit import MemoryBuckets, SqliteBuckets, hashing_slot, HashingOverloaded
+
+
+def test_memory_bucket_refills():
+    """Test a bucket allows its burst, then refills at the configured rate."""
+    buckets = MemoryBuckets()
+    assert buckets.take('k', rate=1, burst=2, now=100) == 0
+    assert buckets.take('k', rate=1, burst=2, now=100) == 0
+    assert buckets.take('k', rate=1, burst=2, now=100) == pytest.approx(1)
+    assert buckets.take('k', rate=1, burst=2, now=101.5) == 0
+
+
+@pytest.mark.parametrize('storage', ['memory', 'sqlite'])
+def test_refused_request_spends_no_tokens(storage, tmp_path):
+    """Test a request refused by one bucket leaves the other buckets untouched."""
+    buckets = MemoryBuckets() if storage == 'memory' else SqliteBuckets(str(tmp_path / 'limits.sqlite'))
+    assert buckets.take('user', rate=0.1, burst=1, now=100) == 0
+    assert buckets.take_all([('ip', 0.1, 1), ('user', 0.1, 1)], now=100) == pytest.approx(10)
+    assert buckets.take('ip', rate=0.1, burst=1, now=100) == 0
+
+
+def test_memory_buckets_evict_least_recently_used():
+    """Test the key cap drops the oldest buckets, not ones still in use."""
+    buckets = MemoryBuckets(max_keys=2)
+    buckets.take('a', rate=0.1, burst=1, now=100)
+    buckets.take('b', rate=0.1, burst=1, now=101)
+    buckets.take('c', rate=0.1, burst=1, now=102)
+    assert buckets.take('b', rate=0.1, burst=1, now=103) > 0
+    assert buckets.take('a', rate=0.1, burst=1, now=103) == 0
+    buckets.prune(older_than=0)
+    assert buckets.take('c', rate=0.1, burst=1, now=103) == 0
+
+
+def test_sqlite_buckets_shared_between_instances(tmp_path):
+    """Test two limiter instances (as in two workers) share one bucket."""
+    path = str(tmp_path / 'limits.sqlite')
+    first, second = SqliteBuckets(path), SqliteBuckets(path)
+    assert first.take('k', rate=0.1, burst=1, now=100) == 0
+    assert second.take('k', rate=0.1, burst=1, now=100) == pytest.approx(10)
+
+
+def test_login_limited_per_username(app, client, test_user):
+    """Test repeated logins for one username get 429 with Retry-After."""
+    app.config['RATELIMIT_PER_USERNAME'] = '2/60'
+    for _ in range(2):
+        response = client.post('/login', data={'username': 'nobody', 'password': 'x'})
+        assert response.status_code == 200
+    response = client.post('/login', data={'username': 'nobody', 'password': 'x'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+
+    # Other usernames from the same IP are unaffected
+    response = client.post('/login', data={'username': test_user['username'], 'password': 'x'})
+    assert response.status_code == 200
+
+
+def test_client_address_comes_from_trusted_proxies_only():
+    """Test X-Forwarded-For is ignored unless TRUSTED_PROXIES says a proxy sets it."""
+    for trusted, limited in ((0, True), (1, False)):
+        app = create_app({'TESTING': True, 'TRUSTED_PROXIES': trusted, 'RATELIMIT_PER_IP': '1/60'})
+        client = app.test_client()
+        statuses = [client.post('/login', data={'username': 'nobody', 'password': 'x'},
+                                headers={'X-Forwarded-For': f'10.0.0.{n}'}).status_code for n in range(2)]
+        assert (statuses[1] == 429) is limited
+
+
+def test_login_page_get_is_not_limited(app, client):
+    """Test that only form submissions consume tokens."""
+    app.config['RATELIMIT_PER_IP'] = '1/60'
+    for _ in range(3):
+        assert client.get('/login').status_code == 200
+
+
+def test_hashing_slot_sheds_load(app):
+    """Test that hashing beyond the concurrency cap fails fast with 503."""
+    app.config['HASH_QUEUE_TIMEOUT'] = 0.05
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold_slots():
+        with app.app_context(), hashing_slot():
+            with hashing_slot():
+                held.set()
+                release.wait(5)
+
+    thread = threading.Thread(target=hold_slots)
+    thread.start()
+    held.wait(5)
+    try:
+        with app.app_context():
+            with pytest.raises(HashingOverloaded) as excinfo:
+                with hashing_slot():
+                    pass
+        assert excinfo.value.code == 503
+    finally:
+        release.set()
+        thread.join()
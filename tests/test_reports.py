@@ -0,0 +1,63 @@
+import csv
+import io
+from app import reports
+from app.auth import save_game_score
+
+
+def test_csv_report_groups_by_game(client, login):
+    """Test the CSV report lists each game type's history with percentages."""
+    save_game_score('testuser', 'Speed Game', 20, 25)
+    save_game_score('testuser', 'Memory Master', 4, 8)
+    save_game_score('testuser', 'Speed Game', 24, 25)
+    login()
+    response = client.get('/reports/testuser/progress.csv')
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+    assert [(row['game_type'], row['percent']) for row in rows] == [
+        ('Memory Master', '50.0'), ('Speed Game', '80.0'), ('Speed Game', '96.0')]
+
+
+def test_html_report_has_charts(client, login):
+    """Test the printable report has a summary and chart per game type."""
+    save_game_score('testuser', 'Speed Game', 20, 25)
+    save_game_score('testuser', 'Speed Game', 24, 25)
+    login()
+    response = client.get('/reports/testuser/progress')
+    assert response.status_code == 200
+    assert response.is_streamed
+    html = response.data.decode()
+    assert '<h2>Speed Game</h2>' in html
+    assert html.count('<svg') == 1
+    assert 'Print / Save as PDF' in html
+
+
+def test_reports_are_cached_until_history_changes(app, client, monkeypatch, login):
+    """Test repeat downloads reuse the cached report until a new score."""
+    save_game_score('testuser', 'Speed Game', 20, 25)
+    login()
+    calls = []
+    original = reports.iter_csv_report
+    monkeypatch.setitem(reports.REPORT_FORMATS, 'csv',
+                        (lambda user: calls.append(1) or original(user), 'text/csv'))
+
+    first = client.get('/reports/testuser/progress.csv').data
+    second = client.get('/reports/testuser/progress.csv')
+    assert second.data == first
+    assert len(calls) == 1
+    assert client.get('/reports/testuser/progress.csv',
+                      headers={'If-None-Match': second.headers['ETag']}).status_code == 304
+
+    save_game_score('testuser', 'Speed Game', 25, 25)
+    third = client.get('/reports/testuser/progress.csv')
+    assert b'100.0' in third.data
+    assert len(calls) == 2
+    assert third.headers['ETag'] != second.headers['ETag']
+
+
+def test_reports_restricted_to_owner_or_admin(app, client, login):
+    """Test other users cannot read a patient's report but admins can."""
+    login('someoneelse')
+    assert client.get('/reports/testuser/progress').status_code == 403
+    app.config['ADMIN_USERS'] = ['someoneelse']
+    assert client.get('/reports/testuser/progress').status_code == 200
+    assert client.get('/reports/nobody/progress').status_code == 404
@@ -0,0 +1,75 @@
+import json
+import logging
+import pytest
+from app import create_app
+
+
+def test_response_carries_request_id(client):
+    """Test that every response gets a generated request id header."""
+    response = client.get('/about')
+    assert len(response.headers['X-Request-ID']) == 32
+
+
+def test_incoming_request_id_is_propagated(client):
+    """Test that a client supplied request id is echoed back."""
+    response = client.get('/about', headers={'X-Request-ID': 'client-abc.123'})
+    assert response.headers['X-Request-ID'] == 'client-abc.123'
+
+
+def test_invalid_request_id_is_replaced(client):
+    """Test that unsafe request ids are not echoed."""
+    response = client.get('/about', headers={'X-Request-ID': 'bad id!'})
+    assert response.headers['X-Request-ID'] != 'bad id!'
+
+
+def test_slow_request_logs_phase_breakdown(app, client, test_user, caplog):
+    """Test that requests over the threshold log one JSON line with phases."""
+    app.config['SLOW_REQUEST_THRESHOLD_MS'] = 0
+    with caplog.at_level(logging.WARNING, logger='app.slow_requests'):
+        response = client.post('/login', data={
+            'username': test_user['username'],
+            'password': test_user['password']
+        })
+
+    records = [r for r in caplog.records if r.name == 'app.slow_requests']
+    assert len(records) == 1
+    entry = json.loads(records[0].getMessage())
+    assert entry['endpoint'] == 'main.login'
+    assert entry['request_id'] == response.headers['X-Request-ID']
+    assert entry['phases_ms']['bcrypt'] > 0
+    assert 'users_load' in entry['phases_ms']
+    assert 'session_load' in entry['phases_ms']
+
+
+def test_fast_request_is_not_logged(app, client, caplog):
+    """Test that requests under the threshold are not logged."""
+    app.config['SLOW_REQUEST_THRESHOLD_MS'] = 60000
+    with caplog.at_level(logging.WARNING, logger='app.slow_requests'):
+        client.get('/about')
+    assert not [r for r in caplog.records if r.name == 'app.slow_requests']
+
+
+@pytest.mark.parametrize('value, expected', [('250', 250.0), ('off', None), ('', None)])
+def test_threshold_from_environment(monkeypatch, value, expected):
+    """Test SLOW_REQUEST_THRESHOLD_MS=off or empty turns slow-request logging off."""
+    monkeypatch.setenv('SLOW_REQUEST_THRESHOLD_MS', value)
+    assert create_app({'TESTING': True}).config['SLOW_REQUEST_THRESHOLD_MS'] == expected
+
+
+def test_streamed_page_is_logged_after_its_body(app, client, caplog):
+    """Test streamed pages keep streaming and are timed once the body has rendered."""
+    app.config['SLOW_REQUEST_THRESHOLD_MS'] = 0
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    with caplog.at_level(logging.WARNING, logger='app.slow_requests'):
+        response = client.get('/speed')
+        assert 'Content-Length' not in response.headers
+        response.get_data()
+        response.close()
+
+    records = [r for r in caplog.records if r.name == 'app.slow_requests']
+    assert len(records) == 1
+    entry = json.loads(records[0].getMessage())
+    assert entry['endpoint'] == 'main.speed'
+    assert entry['phases_ms']['template'] > 0
+    assert entry['response_bytes'] is None
@@ -82,4 +82,14 @@ def test_navigation_links_when_logged_in(logged_in_client):
     assert b'Home' in response.data
     assert b'About' in response.data
     assert b'Logout' in response.data
-    assert b'Profile' in response.data 
\ No newline at end of file
+    assert b'Profile' in response.data 
+
+def test_shell_fragment(client):
+    """Test the shell gets only the page body and full pages list the shell views."""
+    full = client.get('/about')
+    assert b'<nav' in full.data and b'data-shell-views="/ /about' in full.data
+    assert 'X-MindMoves-Shell' in full.headers['Vary']
+    fragment = client.get('/about', headers={'X-MindMoves-Shell': '1'})
+    assert fragment.status_code == 200
+    assert b'<nav' not in fragment.data and b'<footer' not in fragment.data
+    assert b'<title>' in fragment.data
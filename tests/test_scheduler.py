@@ -0,0 +1,98 @@
+import json
+import os
+import time
+from app.scheduler import EXTENSION_KEY, Scheduler, backup_users, prune_sessions
+
+
+def test_jobs_run_when_due_and_record_failures(app, tmp_path):
+    """Test due jobs run, failures are recorded and both are rescheduled."""
+    scheduler = Scheduler(app, str(tmp_path / 'scheduler.lock'))
+    calls = []
+    scheduler.add_job('ok', calls.append, interval=60, jitter=0)
+    scheduler.add_job('broken', lambda app: 1 / 0, interval=60, jitter=0)
+
+    assert sorted(scheduler.run_pending()) == ['broken', 'ok']
+    assert calls == [app]
+    assert scheduler.run_pending() == []
+    stats = scheduler.stats()['jobs']
+    assert stats['ok']['runs'] == 1 and stats['ok']['failures'] == 0
+    assert stats['broken']['failures'] == 1
+    assert stats['broken']['last_error'].startswith('ZeroDivisionError')
+    assert stats['ok']['next_run'] > time.time() + 59
+
+
+def test_jitter_spreads_runs(app, tmp_path):
+    """Test jitter keeps the next run within the allowed window."""
+    scheduler = Scheduler(app, str(tmp_path / 'scheduler.lock'))
+    job = scheduler.add_job('job', lambda app: None, interval=100, jitter=0.2)
+    for _ in range(20):
+        job.schedule(0)
+        assert 80 <= job.next_run <= 120
+
+
+def test_only_one_leader(app, tmp_path):
+    """Test a second scheduler cannot lead until the first resigns."""
+    lock = str(tmp_path / 'scheduler.lock')
+    first, second = Scheduler(app, lock), Scheduler(app, lock)
+    assert first.try_lead()
+    assert not second.try_lead()
+    first.resign()
+    assert second.try_lead()
+    second.resign()
+
+
+def test_every_process_jobs_run_without_leading(app, tmp_path):
+    """Test a worker that is not the leader still flushes its own in-memory state."""
+    lock = str(tmp_path / 'scheduler.lock')
+    leader, worker = Scheduler(app, lock), Scheduler(app, lock)
+    assert leader.try_lead()
+    for scheduler in (leader, worker):
+        scheduler.add_job('shared', lambda app: None, interval=60, jitter=0)
+        scheduler.add_job('local', lambda app: None, interval=60, jitter=0, every_process=True)
+    assert worker.run_pending(leader=worker.try_lead()) == ['local']
+    assert sorted(leader.run_pending(leader=leader.try_lead())) == ['local', 'shared']
+    leader.resign()
+
+
+def test_per_process_jobs_run_in_every_process(app):
+    """Test jobs acting on per-process caches and counters are registered as every-process jobs."""
+    jobs = app.extensions[EXTENSION_KEY].jobs
+    for name in ('refresh_caches', 'prune_rate_limits', 'flush_score_sketches', 'flush_engagement_metrics'):
+        assert jobs[name].every_process
+    assert not jobs['backup_users'].every_process
+
+
+def test_prune_sessions_removes_expired_files(app, tmp_path):
+    """Test only session files older than the session lifetime are deleted."""
+    app.config['SESSION_FILE_DIR'] = str(tmp_path)
+    old, fresh = tmp_path / 'old', tmp_path / 'fresh'
+    old.write_text('x')
+    fresh.write_text('x')
+    long_ago = time.time() - app.permanent_session_lifetime.total_seconds() - 60
+    os.utime(old, (long_ago, long_ago))
+    assert prune_sessions(app) == 1
+    assert sorted(os.listdir(tmp_path)) == ['fresh']
+
+
+def test_backup_users_keeps_latest(app, tmp_path, monkeypatch):
+    """Test backups are readable JSON and rotated to USERS_BACKUP_KEEP."""
+    app.config['USERS_BACKUP_DIR'] = str(tmp_path)
+    app.config['USERS_BACKUP_KEEP'] = 2
+    for n in range(3):
+        monkeypatch.setattr(time, 'strftime', lambda fmt, n=n: f'2024010{n}-000000')
+        backup_users(app)
+    backups = sorted(os.listdir(tmp_path / 'default'))
+    assert backups == ['users-20240101-000000.json', 'users-20240102-000000.json']
+    with open(tmp_path / 'default' / backups[-1]) as f:
+        assert [u['username'] for u in json.load(f)['users']] == ['testuser']
+
+
+def test_scheduler_status_is_admin_only(app, client):
+    """Test the job status endpoint requires an admin."""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    assert client.get('/admin/scheduler').status_code == 403
+    app.config['ADMIN_USERS'] = ['testuser']
+    data = client.get('/admin/scheduler').get_json()
+    assert data['enabled'] is False
+    assert set(data['jobs']) == set(app.extensions[EXTENSION_KEY].jobs)
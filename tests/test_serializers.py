@@ -0,0 +1,83 @@
+import copy
+import json
+import pytest
+from app import serializers
+from app.games import decode_user, encode_user
+from app.serializers import get_serializer, loads
+from app.storage import FileUserStore, ShardedUserStore
+
+USERS = [{'username': 'alice', 'first_name': 'Alïce', 'game_history': [
+    {'game_type': 'Speed Game', 'score': 20, 'total': 25, 'date': '2025-04-01 10:00:00'}]}]
+DECODED = [decode_user(copy.deepcopy(user)) for user in USERS]
+
+
+def test_default_file_is_compact_json_readable_by_legacy_loader(tmp_path):
+    """Test the default format is compact JSON that json.load still reads."""
+    store = FileUserStore(str(tmp_path / 'users.json'))
+    store.save_all(USERS)
+    with open(store.path) as f:
+        text = f.read()
+    assert '\n' not in text
+    assert json.loads(text)['users'] == [encode_user(user) for user in DECODED]
+    assert json.loads(text)['format_version'] == serializers.FORMAT_VERSION
+
+
+def test_legacy_indented_file_is_readable(tmp_path):
+    """Test files written by the old indent=4 writer still load."""
+    path = tmp_path / 'users.json'
+    path.write_text(json.dumps({'users': USERS}, indent=4))
+    store = FileUserStore(str(path))
+    assert store.load_all() == DECODED
+    assert list(store.iter_users()) == DECODED
+
+
+@pytest.mark.parametrize('name', ['orjson', 'msgpack'])
+def test_fast_serializers_round_trip(tmp_path, name):
+    """Test the optional codecs round-trip through both store layouts."""
+    pytest.importorskip(name)
+    serializer = get_serializer(name)
+    assert serializer.name == name
+
+    store = FileUserStore(str(tmp_path / 'users.json'), serializer)
+    store.save_all(USERS)
+    assert store.load_all() == DECODED
+    assert list(store.iter_users()) == DECODED
+
+    sharded = ShardedUserStore(str(tmp_path / 'shards'), serializer)
+    sharded.save_all(USERS)
+    assert sharded.get('alice') == DECODED[0]
+
+
+def test_msgpack_file_has_version_header(tmp_path):
+    """Test binary data files start with a codec and version header."""
+    pytest.importorskip('msgpack')
+    data = get_serializer('msgpack').dumps({'users': USERS})
+    assert data.startswith(b'MINDMOVES msgpack 1\n')
+    assert loads(data) == {'users': USERS}
+
+
+def test_missing_codec_falls_back_to_json(monkeypatch):
+    """Test an unavailable codec falls back to compact JSON."""
+    monkeypatch.setattr(serializers, 'msgpack', None)
+    assert get_serializer('msgpack').name == 'json'
+
+
+def test_rewrite_command(app, runner):
+    """Test the rewrite command re-encodes the configured store."""
+    app.config['USERS_SERIALIZER'] = 'json'
+    result = runner.invoke(args=['storage', 'rewrite'])
+    assert result.exit_code == 0
+    assert 'Rewrote 1 users with json' in result.output
+
+
+def test_jsonify_goes_through_orjson(app, monkeypatch):
+    """Test jsonify() output comes from orjson on this Flask version too."""
+    pytest.importorskip('orjson')
+    calls = []
+    real_dumps = serializers.orjson.dumps
+    monkeypatch.setattr(serializers.orjson, 'dumps', lambda *args, **kwargs: calls.append(args) or real_dumps(*args, **kwargs))
+    with app.test_request_context():
+        from flask import jsonify
+        response = jsonify(b=1, a=[1, 2])
+    assert calls
+    assert response.get_data() == b'{"a":[1,2],"b":1}\n'
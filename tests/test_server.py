@@ -0,0 +1,97 @@
+import threading
+import time
+import urllib.request
+import os
+import pytest
+from app.auth import save_game_score
+from app.quantiles import sketch_path
+from app.scheduler import EXTENSION_KEY as SCHEDULER_KEY
+from app.server import Master, PooledWSGIServer, finish_worker, listen
+
+
+def test_worker_serves_then_recycles(app):
+    """Test a pooled worker stops by itself after max_requests."""
+    sock = listen('127.0.0.1', 0)
+    port = sock.getsockname()[1]
+    server = PooledWSGIServer(app, sock, threads=2, max_requests=2)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        for _ in range(2):
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/about', timeout=5) as response:
+                assert response.status == 200
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+        server.drain()
+        assert server.handled == 2
+    finally:
+        server.stop()
+        thread.join(timeout=5)
+        sock.close()
+
+
+def test_drain_gives_up_on_requests_that_never_finish():
+    """Test a stopping worker is not held forever by a request that does not return."""
+    release = threading.Event()
+
+    def endless(environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        release.wait(10)
+        return [b'done']
+
+    sock = listen('127.0.0.1', 0)
+    server = PooledWSGIServer(endless, sock, threads=2)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    client = threading.Thread(target=lambda: urllib.request.urlopen(
+        f'http://127.0.0.1:{sock.getsockname()[1]}/', timeout=10).read())
+    client.start()
+    try:
+        while not server.in_flight:
+            time.sleep(0.01)
+        server.stop()
+        thread.join(timeout=5)
+        assert server.drain(timeout=0.2) == 1
+    finally:
+        release.set()
+        client.join(timeout=10)
+        server.server_close()
+        sock.close()
+
+
+def test_no_connection_is_accepted_without_a_free_thread(app):
+    """Test the thread slot is taken before accept(), leaving the connection queued."""
+    sock = listen('127.0.0.1', 0)
+    server = PooledWSGIServer(app, sock, threads=1)
+    try:
+        server.slots.acquire()
+        with pytest.raises(OSError):
+            server.get_request()
+        server.slots.release()
+        with pytest.raises(BlockingIOError):
+            server.get_request()  # nothing waiting, and accept() must not block
+        assert server.slots.acquire(blocking=False)
+    finally:
+        server.server_close()
+        sock.close()
+
+
+def test_finishing_a_worker_flushes_pending_state(app):
+    """Test a recycled worker delivers queued events and saves sketches before exiting."""
+    with app.test_request_context('/'):
+        save_game_score('testuser', 'Speed Game', 20, 25)
+        path = sketch_path('default')
+    finish_worker(app)
+    assert os.path.exists(path)
+
+
+def test_master_stops_background_threads_before_forking(app):
+    """Test the scheduler is stopped so no thread holds a lock across fork()."""
+    scheduler = app.extensions[SCHEDULER_KEY]
+    scheduler.start()
+    master = Master(app, '127.0.0.1', 0, workers=1, threads=1, max_requests=0)
+    try:
+        master.quiesce()
+        assert scheduler._thread is None
+    finally:
+        master.sock.close()
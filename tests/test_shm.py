@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import pytest
+from app.auth import score_recorder
+from app.shm import SharedUserStore, default_directory
+from app.storage import FileUserStore
+
+
+def make_user(username):
+    return {'username': username, 'first_name': username.title(), 'password': 'x',
+            'secret_question': 'q', 'secret_answer': 'y', 'game_history': []}
+
+
+@pytest.fixture
+def users_path(tmp_path):
+    return str(tmp_path / 'users.json')
+
+
+def shared(users_path, tmp_path):
+    return SharedUserStore(users_path, directory=str(tmp_path))
+
+
+def test_lookups_come_from_the_shared_image(users_path, tmp_path):
+    """Test users are published once and found by name from the image."""
+    store = shared(users_path, tmp_path)
+    for name in ('alice', 'bob', 'carol'):
+        assert store.add(make_user(name))
+    assert store.prime() == 3
+    assert store.get('bob')['first_name'] == 'Bob'
+    assert store.get('nobody') is None
+    assert store.directory.generation() == 3
+
+
+def test_workers_see_each_others_writes(users_path, tmp_path):
+    """Test a second store on the same file picks up writes via the generation counter."""
+    writer = shared(users_path, tmp_path)
+    writer.add(make_user('alice'))
+    reader = shared(users_path, tmp_path)
+    assert reader.get('alice')['game_history'] == []
+
+    writer.update('alice', score_recorder('Speed Game', 20, 25))
+    assert reader.get('alice')['game_history'][0]['score'] == 20
+
+
+def _play(users_path, directory):
+    SharedUserStore(users_path, directory=directory).update('alice', score_recorder('Memory Master', 4, 8))
+
+
+def test_forked_writer_is_visible(users_path, tmp_path):
+    """Test a write from another process is seen without re-reading the users file."""
+    store = shared(users_path, tmp_path)
+    store.add(make_user('alice'))
+    assert store.get('alice')['game_history'] == []
+
+    process = multiprocessing.get_context('fork').Process(target=_play, args=(users_path, str(tmp_path)))
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0
+    assert store.get('alice')['game_history'][0]['game_type'] == 'Memory Master'
+
+
+def test_stale_image_is_rebuilt_on_attach(users_path, tmp_path):
+    """Test a users file changed behind the image's back is republished at startup."""
+    shared(users_path, tmp_path).add(make_user('alice'))
+    FileUserStore(users_path).save_all([make_user('alice'), make_user('bob')])
+    assert shared(users_path, tmp_path).get('bob') is not None
+
+
+def test_file_replaced_while_attached_is_republished(users_path, tmp_path):
+    """Test a worker that is already serving notices the users file changing under it."""
+    store = shared(users_path, tmp_path)
+    store.add(make_user('alice'))
+    assert store.get('bob') is None
+    FileUserStore(users_path).save_all([make_user('bob')])
+    assert store.get('bob') is not None and store.get('alice') is None
+
+
+def test_image_is_private_to_its_user(users_path, tmp_path):
+    """Test password hashes in the image are readable by the owning user only."""
+    store = shared(users_path, tmp_path)
+    store.add(make_user('alice'))
+    assert os.stat(store.directory.image_path).st_mode & 0o777 == 0o600
+    assert os.stat(store.directory.counter_path).st_mode & 0o777 == 0o600
+    directory = default_directory()
+    if hasattr(os, 'getuid'):
+        assert directory.endswith(f'mindmoves-{os.getuid()}')
+        assert os.stat(directory).st_mode & 0o777 == 0o700
+
+
+def test_shared_app_storage(app):
+    """Test the app serves users through the shared store."""
+    app.config['USERS_STORAGE'] = 'shared'
+    with app.app_context():
+        from app.auth import get_store, get_user
+        assert isinstance(get_store(), SharedUserStore)
+        assert get_user('testuser')['username'] == 'testuser'
+        directory = get_store().directory
+        for path in (directory.image_path, directory.image_path + '.lock', directory.counter_path):
+            os.remove(path)
@@ -0,0 +1,102 @@
+import os
+import time
+import pytest
+from app.auth import score_recorder
+from app.snapshots import (SnapshotError, create_snapshot, list_snapshots, prune_snapshots, restore_snapshot,
+                           verify_snapshot)
+from app.storage import FileUserStore, ShardedUserStore
+
+
+def make_user(username):
+    return {'username': username, 'first_name': username.title(), 'password': 'x',
+            'secret_question': 'q', 'secret_answer': 'y', 'game_history': []}
+
+
+def objects(root):
+    return sorted(name for _, _, names in os.walk(os.path.join(root, 'objects')) for name in names)
+
+
+def test_snapshots_only_store_changed_users(tmp_path):
+    """Test a second snapshot writes just the user that changed."""
+    root = str(tmp_path / 'snapshots')
+    store = FileUserStore(str(tmp_path / 'users.json'))
+    store.save_all([make_user('alice'), make_user('bob')])
+    first = create_snapshot(root, store, now=1700000000)
+    assert first['new_objects'] == 2
+
+    unchanged = create_snapshot(root, store, now=1700000001)
+    assert unchanged['new_objects'] == 0 and unchanged['reused'] == 2
+
+    store.update('alice', score_recorder('Speed Game', 20, 25))
+    changed = create_snapshot(root, store, now=1700000002)
+    assert changed['new_objects'] == 1
+    assert len(objects(root)) == 3
+    assert list_snapshots(root) == [first['id'], unchanged['id'], changed['id']]
+
+
+def test_sharded_snapshots_skip_untouched_files(tmp_path):
+    """Test sharded users whose file has not changed are not re-read."""
+    root = str(tmp_path / 'snapshots')
+    store = ShardedUserStore(str(tmp_path / 'users'))
+    store.add(make_user('alice'))
+    store.add(make_user('bob'))
+    create_snapshot(root, store, now=1700000000)
+    store.update('bob', score_recorder('Memory Master', 4, 8))
+    second = create_snapshot(root, store, now=1700000001)
+    assert second['reused'] == 1 and second['new_objects'] == 1
+
+
+def test_restore_verifies_checksums(tmp_path):
+    """Test restore brings back old data and refuses a corrupted snapshot."""
+    root = str(tmp_path / 'snapshots')
+    store = FileUserStore(str(tmp_path / 'users.json'))
+    store.save_all([make_user('alice')])
+    snapshot = create_snapshot(root, store, now=1700000000)
+    store.update('alice', score_recorder('Speed Game', 20, 25))
+
+    assert restore_snapshot(root, snapshot['id'], store) == 1
+    assert store.get('alice')['game_history'] == []
+
+    object_path = os.path.join(root, 'objects', objects(root)[0][:2], objects(root)[0])
+    with open(object_path, 'wb') as f:
+        f.write(b'garbage')
+    with pytest.raises(SnapshotError):
+        verify_snapshot(root, snapshot['id'])
+    with pytest.raises(SnapshotError):
+        restore_snapshot(root, 'missing', store)
+
+
+def test_prune_keeps_recent_daily_and_weekly(tmp_path):
+    """Test retention keeps the newest snapshots and one per day, dropping unreferenced data."""
+    root = str(tmp_path / 'snapshots')
+    store = FileUserStore(str(tmp_path / 'users.json'))
+    day = 86400
+    start = 1700006400
+    for n in range(10):
+        store.save_all([make_user(f'user{n}')])
+        create_snapshot(root, store, now=start + n * day)
+        create_snapshot(root, store, now=start + n * day + 60)
+
+    removed, removed_objects = prune_snapshots(root, keep_last=2, keep_daily=3, keep_weekly=0)
+    kept = list_snapshots(root)
+    # Both of the last day's snapshots, plus the newest of each of the two days before
+    assert kept == [time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(stamp)) for stamp in
+                    (start + 7 * day + 60, start + 8 * day + 60, start + 9 * day, start + 9 * day + 60)]
+    assert removed == 16
+    assert removed_objects == 7
+    for snapshot_id in kept:
+        verify_snapshot(root, snapshot_id)
+
+
+def test_snapshot_commands(app, runner, tmp_path):
+    """Test the CLI creates, verifies and restores snapshots."""
+    app.config['SNAPSHOT_DIR'] = str(tmp_path / 'snapshots')
+    result = runner.invoke(args=['snapshot', 'create'])
+    assert result.exit_code == 0 and '1 users' in result.output
+    snapshot_id = result.output.split()[1].rstrip(':')
+
+    assert snapshot_id in runner.invoke(args=['snapshot', 'list']).output
+    assert 'intact' in runner.invoke(args=['snapshot', 'verify', snapshot_id]).output
+    result = runner.invoke(args=['snapshot', 'restore', snapshot_id, '--yes'])
+    assert result.exit_code == 0 and 'Restored 1 users' in result.output
+    assert runner.invoke(args=['snapshot', '--tenant', 'nope', 'list']).exit_code != 0
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import pytest
+from app.auth import get_user, save_game_score, score_recorder
+from app.storage import FileUserStore, ShardedUserStore, UnreadableStoreError, copy_users
+
+
+def make_user(username):
+    return {'username': username, 'first_name': username.title(), 'password': 'x',
+            'secret_question': 'q', 'secret_answer': 'y', 'game_history': []}
+
+
+@pytest.fixture
+def sharded(tmp_path):
+    return ShardedUserStore(str(tmp_path / 'users'))
+
+
+def test_sharded_add_and_get(sharded):
+    """Test users are stored one file each and read back by name."""
+    assert sharded.add(make_user('alice'))
+    assert not sharded.add(make_user('alice'))
+    assert sharded.get('alice')['first_name'] == 'Alice'
+    assert sharded.get('nobody') is None
+    assert list(sharded.usernames()) == ['alice']
+
+
+def test_sharded_update_rewrites_only_that_user(sharded):
+    """Test an update changes one small per-user file."""
+    sharded.add(make_user('alice'))
+    sharded.add(make_user('bob'))
+    bob_path = sharded._user_path('bob')
+    bob_mtime = os.stat(bob_path).st_mtime_ns
+
+    assert sharded.update('alice', lambda user: user.update(avatar='Dragon.jpg'))
+    assert sharded.get('alice')['avatar'] == 'Dragon.jpg'
+    assert os.stat(bob_path).st_mtime_ns == bob_mtime
+    assert os.path.getsize(sharded._user_path('alice')) < 300
+    assert not sharded.update('nobody', lambda user: None)
+
+
+def test_sharded_concurrent_updates(sharded):
+    """Test concurrent updates to different users are all kept."""
+    names = [f'user{i}' for i in range(8)]
+    for name in names:
+        sharded.add(make_user(name))
+
+    def play(name):
+        for i in range(5):
+            sharded.update(name, score_recorder('Speed Game', i, 10))
+
+    threads = [threading.Thread(target=play, args=(name,)) for name in names]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(len(sharded.get(name)['game_history']) == 5 for name in names)
+
+
+def test_sharded_user_locks_are_per_user(sharded):
+    """Test a slow update for one user never holds up another, and idle locks are dropped."""
+    sharded.add(make_user('alice'))
+    sharded.add(make_user('bob'))
+    inside, release = threading.Event(), threading.Event()
+
+    def slow(user):
+        inside.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=sharded.update, args=('alice', slow))
+    thread.start()
+    assert inside.wait(5)
+    done = threading.Thread(target=sharded.update, args=('bob', lambda user: None))
+    done.start()
+    done.join(2)
+    assert not done.is_alive()
+    release.set()
+    thread.join()
+    assert sharded._user_locks == {}
+
+
+def test_migration_round_trip(tmp_path, sharded):
+    """Test converting the single file to shards and back keeps every user."""
+    source = FileUserStore(str(tmp_path / 'users.json'))
+    source.save_all([make_user('alice'), make_user('bob')])
+
+    assert copy_users(source, sharded) == 2
+    back = FileUserStore(str(tmp_path / 'back.json'))
+    copy_users(sharded, back)
+    assert back.load_all() == source.load_all()
+    with open(back.path) as f:
+        assert [u['username'] for u in json.load(f)['users']] == ['alice', 'bob']
+
+
+def test_migrate_command_and_sharded_app(app, runner, tmp_path):
+    """Test the migrate command and serving scores from the sharded layout."""
+    app.config['USERS_DIR'] = str(tmp_path / 'shards')
+    result = runner.invoke(args=['storage', 'migrate', '--to', 'sharded'])
+    assert result.exit_code == 0
+    assert 'Copied 1 users' in result.output
+
+    app.config['USERS_STORAGE'] = 'sharded'
+    with app.app_context():
+        assert save_game_score('testuser', 'Speed Game', 20, 25)
+        assert get_user('testuser')['game_history'][0]['score'] == 20
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    response = client.post('/update_avatar', json={'avatar_name': 'Unicorn.jpg'})
+    assert response.status_code == 200
+    with app.app_context():
+        assert get_user('testuser')['avatar'] == 'Unicorn.jpg'
+
+
+def test_unreadable_file_is_never_overwritten(tmp_path):
+    """Test a file that cannot be decoded raises instead of being replaced by a write."""
+    path = tmp_path / 'users.json'
+    path.write_bytes(b'{"format_version": 2, "users": [{"username": "ali')
+    store = FileUserStore(str(path))
+    with pytest.raises(UnreadableStoreError):
+        store.add(make_user('bob'))
+    assert path.read_bytes().endswith(b'"ali')
+    assert FileUserStore(str(tmp_path / 'missing.json')).load_all() == []
@@ -0,0 +1,46 @@
+from app.streaming import iter_flushed
+
+
+def test_head_is_flushed_before_the_body(client, login):
+    """Test the first streamed chunk ends with the asset-bearing <head>."""
+    login()
+    response = client.get('/speed')
+    assert 'Content-Length' not in response.headers
+    chunks = list(response.response)
+    head = chunks[0].decode()
+    assert '</head>' in head and 'css/style.css' in head
+    assert '<main' not in head
+    assert len(chunks) > 1
+    assert b'Speed Game' in b''.join(chunks)
+
+
+def test_profile_streams_and_anonymous_pages_do_not(client, login):
+    """Test logged-in pages stream while anonymous ones stay buffered."""
+    assert 'Content-Length' in client.get('/speed').headers
+    login()
+    response = client.get('/profile')
+    assert response.status_code == 200
+    assert 'Content-Length' not in response.headers
+    assert b'Game History' in response.data
+
+
+def test_streaming_can_be_disabled(app, client, login):
+    """Test STREAM_PAGES=False renders pages in one piece."""
+    app.config['STREAM_PAGES'] = False
+    login()
+    assert 'Content-Length' in client.get('/speed').headers
+
+
+def test_flashes_are_consumed_by_streamed_pages(app, client, login):
+    """Test a flashed message shows once even though the session is saved before the body."""
+    login()
+    with client.session_transaction() as sess:
+        sess['_flashes'] = [('info', 'Saved your settings')]
+    assert b'Saved your settings' in client.get('/speed').data
+    assert b'Saved your settings' not in client.get('/speed').data
+
+
+def test_iter_flushed_groups_small_chunks():
+    """Test chunks are joined up to </head> and then into buffer-sized pieces."""
+    chunks = ['<head>', 'x', '</head>'] + ['y'] * 10
+    assert list(iter_flushed(chunks, buffer_size=8)) == ['<head>x</head>', 'yyyyyyyy', 'yy']
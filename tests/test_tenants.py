@@ -0,0 +1,76 @@
+import json
+import pytest
+from app import create_app
+from app.auth import get_store, is_admin, save_game_score
+from app.tenants import current_tenant
+
+
+@pytest.fixture
+def tenant_app(app, tmp_path):
+    app.config['TENANTS'] = {
+        'north': {'hosts': ['north.example.org'], 'USERS_FILE': str(tmp_path / 'north.json'),
+                  'ADMIN_USERS': ['northadmin']},
+        'south': {'hosts': ['south.example.org'], 'USERS_STORAGE': 'sharded',
+                  'USERS_DIR': str(tmp_path / 'south')},
+    }
+    return app
+
+
+def register(client, host, username):
+    return client.post('/register', base_url=f'http://{host}', data={
+        'first_name': 'Pat', 'username': username, 'password': 'TestPass123!',
+        'confirm_password': 'TestPass123!', 'secret_question': 'Q?', 'secret_answer': 'a'})
+
+
+def test_host_selects_tenant(tenant_app):
+    """Test the request host picks the tenant, ignoring case and port."""
+    with tenant_app.test_request_context('/', base_url='http://NORTH.example.org:8000'):
+        assert current_tenant() == 'north'
+    with tenant_app.test_request_context('/', base_url='http://other.example.org'):
+        assert current_tenant() == 'default'
+
+
+def test_tenants_have_isolated_stores(tenant_app, tmp_path):
+    """Test users and scores stay within their own tenant's storage."""
+    client = tenant_app.test_client()
+    register(client, 'north.example.org', 'pat')
+    with tenant_app.app_context():
+        assert get_store('north').get('pat') is not None
+        assert get_store('south').get('pat') is None
+        assert get_store().get('pat') is None
+        assert get_store('north') is not get_store('default')
+    with tenant_app.test_request_context('/', base_url='http://north.example.org'):
+        save_game_score('pat', 'Speed Game', 5, 10)
+    with open(tmp_path / 'north.json') as f:
+        assert len(json.load(f)['users'][0]['game_history']) == 1
+
+    register(client, 'south.example.org', 'pat')
+    with tenant_app.app_context():
+        assert get_store('south').get('pat')['game_history'] == []
+
+
+def test_admins_are_per_tenant(tenant_app):
+    """Test a tenant's ADMIN_USERS only applies on that tenant's host."""
+    with tenant_app.test_request_context('/', base_url='http://north.example.org'):
+        assert is_admin('northadmin')
+    with tenant_app.test_request_context('/', base_url='http://south.example.org'):
+        assert not is_admin('northadmin')
+
+
+def test_unknown_tenant_setting_is_rejected():
+    """Test a misspelt tenant setting fails at startup."""
+    with pytest.raises(ValueError):
+        create_app({'TENANTS': {'north': {'USER_FILE': 'x.json'}}})
+
+
+def test_session_does_not_cross_tenants(tenant_app):
+    """Test a login on one tenant's host is not honoured on another's."""
+    client = tenant_app.test_client()
+    register(client, 'north.example.org', 'alice')
+    register(client, 'south.example.org', 'alice')
+    client.post('/login', base_url='http://north.example.org',
+                data={'username': 'alice', 'password': 'TestPass123!'})
+    percentile = '/percentile?game_type=memory&score=1&total=2'
+    assert client.get(percentile, base_url='http://north.example.org').status_code == 200
+    assert client.get(percentile, base_url='http://south.example.org').status_code == 401
+    assert client.get('/profile', base_url='http://north.example.org').status_code == 302
@@ -0,0 +1,58 @@
+import os
+from app.auth import get_user, load_users, save_users
+from app.warmup import EXTENSION_KEY, warm_up
+
+
+def test_healthz_not_ready_before_warm_up(app, client):
+    """Test that readiness is red until warm-up completes, and the first check starts it."""
+    response = client.get('/healthz')
+    assert response.status_code == 503
+    thread = app.extensions[EXTENSION_KEY]['thread']
+    assert client.get('/healthz').status_code in (200, 503)
+    assert app.extensions[EXTENSION_KEY]['thread'] is thread
+    thread.join(30)
+    assert client.get('/healthz').status_code == 200
+
+
+def test_healthz_ready_after_warm_up(app, client):
+    """Test that warm-up compiles templates and turns readiness green."""
+    state = warm_up(app)
+    assert state['templates'] > 10
+    assert set(state['timings']) == {'templates', 'users', 'session'}
+
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'ok'}
+
+
+def test_bytecode_cache_is_written(tmp_path):
+    """Test that compiled templates are persisted to the bytecode cache."""
+    from app import create_app
+    cache_dir = tmp_path / 'jinja'
+    app = create_app({'TESTING': True, 'JINJA_CACHE_DIR': str(cache_dir)})
+    warm_up(app)
+    assert len(os.listdir(cache_dir)) > 10
+
+
+def test_warmup_command(runner):
+    """Test the flask warmup command reports timings."""
+    result = runner.invoke(args=['warmup'])
+    assert result.exit_code == 0
+    assert 'Compiled' in result.output
+    assert 'templates:' in result.output
+
+
+def test_get_user_returns_copy(app):
+    """Test that cached users cannot be modified through get_user."""
+    user = get_user('testuser')
+    user['avatar'] = 'Dragon.jpg'
+    assert 'avatar' not in get_user('testuser')
+
+
+def test_get_user_sees_saved_changes(app):
+    """Test that saving users invalidates the cached lookup."""
+    assert get_user('testuser')['first_name'] == 'Test'
+    users = load_users()
+    users[0]['first_name'] = 'Changed'
+    save_users(users)
+    assert get_user('testuser')['first_name'] == 'Changed'
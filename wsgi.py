@@ -17,7 +17,7 @@ os.chdir(path)
 from app import create_app
 
 # Create the application instance
-application = create_app()
+application = create_app({'WARMUP_ON_START': True})
 
 # Set a secure secret key (you'll set this via environment variable on PythonAnywhere)
 if __name__ == "__main__":